@@ -0,0 +1,252 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : batch.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/15 14:26
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 多账单并行导入
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import os
+import glob
+import logging
+import numpy as np
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from tool import BillFormat
+from rule import RuleIndex
+from id_index import TransactionIdIndex
+from conversion import BeancountHelper, TransactionBatch
+from dedup import create_deduplicator
+from mapper import AccountMapper, BeancountMapper
+from profiler import PROFILER
+
+# 工作进程内的共享状态，由 _init_worker 在进程启动时设置一次
+_worker_state: Dict = {}
+
+
+def collect_bill_files(pattern: str) -> List[str]:
+    """
+    收集待导入的账单文件。
+
+    Args:
+        pattern (str): 目录（取其中所有 csv 文件）或 glob 通配符。
+
+    Returns:
+        List[str]: 按路径排序的账单文件列表。
+    """
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.csv")
+    return sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+
+
+def _init_worker(
+    sources: Dict[str, Tuple[Dict, Tuple[RuleIndex, RuleIndex], TransactionIdIndex]],
+    profile: bool = False,
+) -> None:
+    """
+    工作进程初始化函数，保存所有账单共用的规则和已导入交易单号索引。
+
+    Args:
+        sources (Dict[str, Tuple[Dict, Tuple[RuleIndex, RuleIndex], TransactionIdIndex]]):
+            数据源到（规则配置, 已编译的规则, 已导入交易单号索引）的映射。
+        profile (bool): 是否在工作进程中统计各阶段性能。
+    """
+    _worker_state["sources"] = sources
+    if profile:
+        PROFILER.enable()
+
+
+def _map_bill(
+    bill: Tuple[str, BillFormat],
+) -> Tuple[TransactionBatch, Optional[Dict], Dict[str, np.ndarray]]:
+    """
+    在工作进程中映射并渲染单个账单。
+
+    Args:
+        bill (Tuple[str, BillFormat]): 账单文件路径及其格式。
+
+    Returns:
+        Tuple[TransactionBatch, Optional[Dict], Dict[str, np.ndarray]]: 已渲染的交易批次
+            （已跳过导入过的交易）、该账单的性能统计（未启用时为 None），以及各匹配类型
+            按规则位置的命中次数。
+    """
+    target_file, bill_format = bill
+    rules, compiled_rules, id_index = _worker_state["sources"][bill_format.source]
+    account_mapper = AccountMapper(
+        target_file=target_file,
+        map=rules,
+        output_file=None,
+        compiled_rules=compiled_rules,
+        encoding=bill_format.encoding,
+        skiprows=bill_format.skiprows,
+    )
+    beancount_mapper = BeancountMapper(
+        account_mapper.iter_mapped_chunks(),
+        rules["pipeline"],
+        id_index=id_index,
+        source=bill_format.source,
+    )
+    batch = beancount_mapper.map_to_batch()
+    with PROFILER.stage("render"):
+        batch.prerender()
+
+    if not PROFILER.enabled:
+        return batch, None, account_mapper.hits
+    report = PROFILER.report()
+    PROFILER.reset()
+    return batch, report, account_mapper.hits
+
+
+def merge_batches(batches: List[TransactionBatch]) -> List[TransactionBatch]:
+    """
+    按文件顺序合并同一数据源各账单的批次，去除不同账单之间重复的交易单号（保留先出现的）。
+
+    Args:
+        batches (List[TransactionBatch]): 按文件顺序排列的交易批次。
+
+    Returns:
+        List[TransactionBatch]: 去重后的交易批次。
+    """
+    seen = set()
+    merged = []
+    for batch in batches:
+        mask = []
+        for index in batch.columns["index"]:
+            mask.append(not index or index not in seen)
+            if index:
+                seen.add(index)
+        merged.append(batch if all(mask) else batch.select(mask))
+    return merged
+
+
+def import_bills(
+    bills: List[Tuple[str, BillFormat]],
+    rules: Dict[str, Dict],
+    bean_path: Path,
+    out_bean_path: Path,
+    log_obj: logging.Logger,
+    cache_dir: Path,
+    id_index_path: Path,
+    workers: int = None,
+    stats_dir: Path = None,
+    layout: str = "file",
+    dedup_config: Dict = None,
+) -> bool:
+    """
+    使用进程池并行映射多个账单，合并后一次性校验并写入账本。
+
+    各数据源的规则只编译一次并在进程启动时分发给各工作进程；结果按文件路径顺序合并，
+    与进程调度顺序无关。不同数据源的账单可以混合导入，交易单号索引按数据源分别更新。
+    任一账单映射失败（如金额无法解析）时记录出错的文件，不写入任何内容并返回 False。
+
+    Args:
+        bills (List[Tuple[str, BillFormat]]): 账单文件路径及其格式（由 tool.sniff_bill 识别）。
+        rules (Dict[str, Dict]): 全部数据源的规则配置。
+        bean_path (Path): Beancount 文件路径。
+        out_bean_path (Path): 输出 Beancount 文件路径。
+        log_obj (logging.Logger): 日志对象。
+        cache_dir (Path): 已编译规则的缓存目录。
+        id_index_path (Path): 已导入交易单号索引目录。
+        workers (int): 工作进程数（同时用于加载和校验账本），默认为 CPU 核数。
+        stats_dir (Path): 规则命中统计目录，各工作进程的命中次数汇总后按数据源记录
+            （只在写入成功后记录）。
+        layout (str): 账本写入布局（"file" 或 "monthly"）。
+        dedup_config (Dict): 跨数据源重复交易检测的配置，各数据源的交易按数据源顺序检测。
+
+    Returns:
+        bool: 写入成功返回 True，否则返回 False。
+    """
+    sources = {}
+    mappers: Dict[str, AccountMapper] = {}
+    for source in dict.fromkeys(bill_format.source for _, bill_format in bills):
+        mappers[source] = AccountMapper(
+            target_file=None,
+            map=rules[source],
+            output_file=None,
+            cache_dir=cache_dir,
+            log_obj=log_obj,
+            stats_dir=stats_dir,
+        )
+        compiled_rules = mappers[source].load_rules()
+        sources[source] = (
+            rules[source],
+            compiled_rules,
+            TransactionIdIndex(id_index_path, source),
+        )
+
+    max_workers = min(workers or os.cpu_count() or 1, len(bills))
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_init_worker,
+        initargs=(sources, PROFILER.enabled),
+    ) as executor:
+        # 每个账单单独提交，某个账单出错时能指出是哪个文件，并继续检查其余账单
+        futures = [executor.submit(_map_bill, bill) for bill in bills]
+        batches = []
+        failed = []
+        for (target_file, bill_format), future in zip(bills, futures):
+            try:
+                batch, report, hits = future.result()
+            except Exception as e:
+                log_obj.error(f"账单映射失败: {target_file}: {type(e).__name__}: {e}")
+                failed.append(target_file)
+                continue
+            batches.append(batch)
+            if report is not None:
+                PROFILER.merge(report)
+            source_hits = mappers[bill_format.source].hits
+            for mapping_type, counts in hits.items():
+                if mapping_type in source_hits:
+                    counts = source_hits[mapping_type] + counts
+                source_hits[mapping_type] = counts
+
+    # 任一账单失败时不写入任何内容，修正账单后可以整批重新导入
+    if failed:
+        log_obj.error(f"{len(failed)} 个账单映射失败，未写入任何交易")
+        return False
+
+    grouped: Dict[str, List[TransactionBatch]] = {source: [] for source in sources}
+    for (target_file, bill_format), batch in zip(bills, batches):
+        log_obj.debug(f"{target_file}: {bill_format.source} {len(batch)} 条交易")
+        grouped[bill_format.source].append(batch)
+    merged = {source: merge_batches(grouped[source]) for source in sources}
+
+    # 查重在写入前完成，交易单号索引只记录实际写入的交易
+    dedup = create_deduplicator(dedup_config, log_obj)
+    if dedup is not None:
+        merged = {
+            source: [dedup.filter(batch) for batch in merged[source]]
+            for source in sources
+        }
+
+    beancount_helper = BeancountHelper(
+        bean_path, out_bean_path, log_obj, layout, workers
+    )
+    if not beancount_helper.write_transaction_list(
+        [batch for source in sources for batch in merged[source]]
+    ):
+        return False
+    if dedup is not None:
+        added = dedup.commit()
+        log_obj.debug(f"查重记录新增 {added} 条: {dedup.history.path}")
+
+    for source, (_, _, id_index) in sources.items():
+        added = id_index.commit(
+            index for batch in merged[source] for index in batch.columns["index"]
+        )
+        log_obj.debug(f"交易单号索引新增 {added} 条: {id_index.path}")
+
+    # 命中次数只在写入成功后记录，被拒绝的导入不计入
+    for source, account_mapper in mappers.items():
+        account_mapper.save_rule_stats(
+            sources[source][1],
+            sum(bill_format.source == source for _, bill_format in bills),
+        )
+    return True
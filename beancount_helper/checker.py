@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : checker.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/08 16:05
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 增量格式检查
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+from typing import Dict, List, Tuple
+from beancount.core import data, getters
+from beancount.ops import balance, validation
+from beancount.parser import booking, parser
+
+
+class LedgerChecker:
+    """增量格式检查器
+
+    复用已加载账本的条目、选项和账户开闭信息，只解析和检查新生成的交易文件，
+    不必像 bean-check 那样重新解析整个账本。检查内容与 bean-check 对这批交易
+    会报告的错误一致：语法与插值错误、未知或已关闭的账户、账户币种限制、
+    交易不平衡，以及受新交易影响的余额断言。
+
+    账本启用了自定义插件，或受影响的余额断言之前有 pad 条目时，新交易可能改变
+    插件或 pad 的结果，此时 can_check 返回 False，应改用完整检查。
+    """
+
+    def __init__(self, entries: List, options_map: Dict) -> None:
+        """
+        初始化增量格式检查器。
+
+        Args:
+            entries (List): 已加载账本的条目（loader.load_file 的结果）。
+            options_map (Dict): 已加载账本的选项。
+        """
+        self.entries = list(entries)
+        self.options_map = options_map
+        self.open_close = getters.get_account_open_close(self.entries)
+
+    @property
+    def has_plugins(self) -> bool:
+        """账本是否启用了自定义插件。"""
+        return bool(self.options_map.get("plugin"))
+
+    def parse(self, file_path: str) -> Tuple[List, List]:
+        """
+        解析并插值新生成的交易文件。
+
+        Args:
+            file_path (str): 交易文件路径。
+
+        Returns:
+            Tuple[List, List]: (条目列表, 错误列表)
+        """
+        new_entries, errors, _ = parser.parse_file(file_path)
+        new_entries.sort(key=data.entry_sortkey)
+        new_entries, booking_errors = booking.book(new_entries, self.options_map)
+        return new_entries, errors + booking_errors
+
+    def can_check(self, new_entries: List) -> bool:
+        """
+        判断这批条目能否只做增量检查。
+
+        Args:
+            new_entries (List): 新条目。
+
+        Returns:
+            bool: 可以增量检查返回 True。
+        """
+        if self.has_plugins:
+            return False
+        roots = self._balance_roots(new_entries)
+        return not any(
+            isinstance(entry, data.Pad) and self._under(entry.account, roots)
+            for entry in self.entries
+        )
+
+    def check(self, new_entries: List) -> List:
+        """
+        检查新条目。
+
+        Args:
+            new_entries (List): 已解析和插值的新条目。
+
+        Returns:
+            List: 错误列表，为空表示通过。
+        """
+        errors = []
+        errors.extend(self._check_accounts(new_entries))
+        errors.extend(
+            validation.validate_check_transaction_balances(
+                new_entries, self.options_map
+            )
+        )
+        errors.extend(self._check_balances(new_entries))
+        return errors
+
+    def commit(self, new_entries: List) -> None:
+        """
+        将已通过检查并写入账本的条目并入检查器，供同一进程中的后续批次使用。
+
+        Args:
+            new_entries (List): 新条目。
+        """
+        self.entries.extend(new_entries)
+        for entry in new_entries:
+            if isinstance(entry, data.Open):
+                self.open_close[entry.account] = (entry, None)
+            elif isinstance(entry, data.Close) and entry.account in self.open_close:
+                self.open_close[entry.account] = (
+                    self.open_close[entry.account][0],
+                    entry,
+                )
+
+    def _check_accounts(self, new_entries: List) -> List:
+        """检查账户是否存在、是否处于开启状态，以及币种限制。"""
+        errors = []
+        for entry in new_entries:
+            if isinstance(entry, (data.Open, data.Close)):
+                continue
+
+            for account in getters.get_entry_accounts(entry):
+                open_entry, close_entry = self.open_close.get(account, (None, None))
+                if open_entry is None:
+                    message = f"Invalid reference to unknown account '{account}'"
+                elif entry.date < open_entry.date or (
+                    close_entry is not None and entry.date > close_entry.date
+                ):
+                    message = f"Invalid reference to inactive account '{account}'"
+                else:
+                    continue
+                errors.append(validation.ValidationError(entry.meta, message, entry))
+
+            if not isinstance(entry, data.Transaction):
+                continue
+            for posting in entry.postings:
+                open_entry, _ = self.open_close.get(posting.account, (None, None))
+                if open_entry is None or not open_entry.currencies:
+                    continue
+                if posting.units.currency not in open_entry.currencies:
+                    message = (
+                        f"Invalid currency {posting.units.currency} "
+                        f"for account '{posting.account}'"
+                    )
+                    errors.append(
+                        validation.ValidationError(entry.meta, message, entry)
+                    )
+        return errors
+
+    def _balance_roots(self, new_entries: List) -> set:
+        """找出新条目涉及账户（含其上级账户）上、日期不早于新条目的余额断言账户。"""
+        touched = set()
+        for entry in new_entries:
+            touched.update(getters.get_entry_accounts(entry))
+        if not touched:
+            return set()
+
+        start = min(entry.date for entry in new_entries)
+        return {
+            entry.account
+            for entry in self.entries
+            if isinstance(entry, data.Balance)
+            and entry.date >= start
+            and any(self._under(account, {entry.account}) for account in touched)
+        }
+
+    @staticmethod
+    def _under(account: str, roots: set) -> bool:
+        """账户是否为 roots 中某个账户或其子账户。"""
+        return any(account == root or account.startswith(root + ":") for root in roots)
+
+    def _check_balances(self, new_entries: List) -> List:
+        """只对受影响的账户重新计算余额断言。"""
+        roots = self._balance_roots(new_entries)
+        if not roots:
+            return []
+
+        subset = [
+            entry
+            for entry in self.entries
+            if isinstance(entry, data.Open)
+            or (
+                isinstance(entry, data.Balance)
+                and self._under(entry.account, roots)
+            )
+            or (
+                isinstance(entry, data.Transaction)
+                and any(
+                    self._under(posting.account, roots) for posting in entry.postings
+                )
+            )
+        ]
+        subset.extend(new_entries)
+        subset.sort(key=data.entry_sortkey)
+        _, errors = balance.check(subset, self.options_map)
+        return errors
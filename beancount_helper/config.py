@@ -22,10 +22,26 @@ temp_format = (
 configs = {
     "app": {
         "name": "beancount_helper",
-        "data_subdirectory": ["bean", "rule", "logs", "temp"],
+        "data_subdirectory": [
+            "bean",
+            "rule",
+            "logs",
+            "temp",
+            "cache",
+            "index",
+            "stats",
+            "dedup",
+        ],
         "bean_path": "data/bean/moneybook.bean",
         "out_bean": f"data/bean/{temp_format}.bean",
         "temp_csv": f"data/temp/{temp_format}.csv",
+        "temp_data": f"data/temp/{temp_format}.feather",
+        "rule_cache": "data/cache",
+        "id_index": "data/index",
+        "rule_stats": "data/stats",
+        "bean_layout": "file",
+        "dedup": {"path": "data/dedup", "mode": "report", "window": 120},
+        "fava_state": "data/cache/fava.json",
         "log": {
             "path": "data/logs",
             "level": "DEBUG",
@@ -46,20 +62,40 @@ configs = {
             "match_columns": {
                 "expenses": {
                     "columns": ["交易类型", "交易对方", "商品"],
+                    "pattern_columns": ["交易对方", "商品"],
                     "default": "Expenses:Node",
                 },
                 "assets": {"columns": ["支付方式"], "default": "Assets:Node"},
             },
+            "pipeline": [
+                {"step": "to_data", "args": ["交易时间", "%Y-%m-%d %H:%M:%S"]},
+                {"step": "to_amount", "args": ["金额(元)"]},
+                {"step": "to_remark", "args": [["备注", "交易单号"], "wechat"]},
+                {"step": "to_description", "args": ["交易对方"]},
+                {"step": "to_status", "args": ["*"]},
+                {"step": "to_currency", "args": ["CNY"]},
+                {"step": "to_index", "args": ["交易单号"]},
+            ],
         },
         "alipay": {
             "mapping_file": "data/rule/alipay_rule.xlsx",
             "match_columns": {
                 "expenses": {
                     "columns": ["交易分类", "交易对方", "商品说明"],
+                    "pattern_columns": ["交易对方", "商品说明"],
                     "default": "Expenses:Node",
                 },
                 "assets": {"columns": ["收/付款方式"], "default": "Assets:Node"},
             },
+            "pipeline": [
+                {"step": "to_data", "args": ["交易时间", "%Y-%m-%d %H:%M:%S"]},
+                {"step": "to_amount", "args": ["金额"]},
+                {"step": "to_remark", "args": [["备注", "交易订单号"], "alipay"]},
+                {"step": "to_description", "args": ["交易对方"]},
+                {"step": "to_status", "args": ["*"]},
+                {"step": "to_currency", "args": ["CNY"]},
+                {"step": "to_index", "args": ["交易订单号"]},
+            ],
         },
     },
 }
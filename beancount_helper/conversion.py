@@ -15,13 +15,30 @@ __license__ = None
 import os
 import logging
 import tempfile
-import subprocess
-from beancount import loader
-from typing import NoReturn, List, Tuple
+import itertools
+import pandas as pd
+from decimal import Decimal
+from beancount.parser import printer
+from checker import LedgerChecker
+from shard import split_by_month, write_shards
+from validator import load_ledger
+from id_index import TransactionIdIndex
+from profiler import PROFILER
 from dataclasses import dataclass, fields
+from typing import NoReturn, Iterable, Iterator, Tuple, Dict, Sequence, TextIO, Union
 
 
-@dataclass
+_TRANSACTION_TEMPLATE = (
+    '\n{0} {1} "{2}" "{3}"\n{8}\t{4}\t\t\t{5} {6}\n\t{7}\t\t\t-{5} {6}\n'
+)
+# 交易单号和数据源写为交易的元数据，重建交易单号索引时直接读取，不解析描述文本
+_INDEX_META = '\tindex: "{0}"\n'
+_SOURCE_META = '\tsource: "{0}"\n'
+# 临时交易文件的写缓冲大小，逐笔写入时也能以大块落盘
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+@dataclass(slots=True)
 class Transaction:
     """Beancount 交易数据类"""
 
@@ -30,10 +47,13 @@ class Transaction:
     description: str = None
     debit: str = None
     credit: str = None
-    amount: float = None
+    amount: Decimal = None
     currency: str = None
     remark: str = None
     index: str = None
+    time: int = None
+    direction: str = None
+    source: str = None
 
     def __str__(self) -> str:
         return self.get_str()
@@ -44,10 +64,22 @@ class Transaction:
         Returns:
             str: 转换后的字符串
         """
-        one = f'\n{self.date} {self.status} "{self.description}" "{self.remark}"\n'
-        two = f"\t{self.debit}\t\t\t{self.amount} {self.currency}\n"
-        three = f"\t{self.credit}\t\t\t-{self.amount} {self.currency}\n"
-        return one + two + three
+        return (
+            f'\n{self.date} {self.status} "{self.description}" "{self.remark}"\n'
+            f"{_metadata(self.index, self.source)}"
+            f"\t{self.debit}\t\t\t{self.amount} {self.currency}\n"
+            f"\t{self.credit}\t\t\t-{self.amount} {self.currency}\n"
+        )
+
+    @classmethod
+    def field_names(cls) -> Tuple[str, ...]:
+        """
+        Transaction 的字段名。
+
+        Returns:
+            Tuple[str, ...]: 字段名元组。
+        """
+        return _TRANSACTION_FIELDS
 
     @classmethod
     def from_dict(cls, data: dict) -> "Transaction":
@@ -60,21 +92,275 @@ class Transaction:
         Returns:
             Transaction: 初始化的 Transaction 对象。
         """
-        field_set = {f.name for f in fields(cls)}
-        filtered_data = {k: v for k, v in data.items() if k in field_set}
+        filtered_data = {k: v for k, v in data.items() if k in _TRANSACTION_FIELD_SET}
         return cls(**filtered_data)
 
 
+def _metadata(index: str, source: str = None) -> str:
+    """交易的元数据行，没有交易单号时为空。"""
+    if not index:
+        return ""
+    if not source:
+        return _INDEX_META.format(index)
+    return _INDEX_META.format(index) + _SOURCE_META.format(source)
+
+
+_TRANSACTION_FIELDS = tuple(f.name for f in fields(Transaction))
+_TRANSACTION_FIELD_SET = frozenset(_TRANSACTION_FIELDS)
+
+
+class TransactionBatch:
+    """按列存储的交易批次
+
+    每个字段保存为一个列表，不为每笔交易创建对象；渲染时一次遍历生成整段 Beancount 文本。
+    """
+
+    __slots__ = ("columns", "source", "_size", "_rendered")
+
+    def __init__(self, columns: Dict[str, Sequence], source: str = None) -> None:
+        """
+        初始化交易批次。
+
+        Args:
+            columns (Dict[str, Sequence]): 字段名到列值的映射，缺少的字段填 None。
+            source (str): 交易的数据源（如 "wechat"），指定时覆盖各交易的 source 字段；
+                写入交易的元数据，并用于跨数据源查找重复交易。
+        """
+        sizes = {len(values) for values in columns.values()}
+        if len(sizes) > 1:
+            raise ValueError("交易批次各列长度不一致")
+
+        self._size = sizes.pop() if sizes else 0
+        self._rendered = None
+        self.source = source
+        self.columns = {
+            name: list(columns.get(name, [None] * self._size))
+            for name in _TRANSACTION_FIELDS
+        }
+        if source is not None:
+            self.columns["source"] = [source] * self._size
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, source: str = None) -> "TransactionBatch":
+        """
+        从 DataFrame 创建交易批次，只取 Transaction 的字段列。
+
+        Args:
+            frame (pd.DataFrame): 管道处理后的数据。
+            source (str): 交易的数据源。
+
+        Returns:
+            TransactionBatch: 交易批次。
+        """
+        return cls(
+            {
+                name: frame[name].tolist()
+                for name in _TRANSACTION_FIELDS
+                if name in frame
+            }
+            or {"date": []},
+            source,
+        )
+
+    @classmethod
+    def from_transactions(
+        cls, transactions: Iterable[Transaction], source: str = None
+    ) -> "TransactionBatch":
+        """
+        从 Transaction 对象创建交易批次。
+
+        Args:
+            transactions (Iterable[Transaction]): 交易数据类。
+            source (str): 交易的数据源。
+
+        Returns:
+            TransactionBatch: 交易批次。
+        """
+        columns = {name: [] for name in _TRANSACTION_FIELDS}
+        for transaction in transactions:
+            for name in _TRANSACTION_FIELDS:
+                columns[name].append(getattr(transaction, name))
+        return cls(columns, source)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __iter__(self) -> Iterator[Transaction]:
+        for values in zip(*(self.columns[name] for name in _TRANSACTION_FIELDS)):
+            yield Transaction(*values)
+
+    def _rows(self) -> Iterator[tuple]:
+        columns = self.columns
+        return zip(
+            columns["date"],
+            columns["status"],
+            columns["description"],
+            columns["remark"],
+            columns["debit"],
+            columns["amount"],
+            columns["currency"],
+            columns["credit"],
+            map(_metadata, columns["index"], columns["source"]),
+        )
+
+    def _texts(self) -> Iterator[str]:
+        if self._rendered is not None:
+            return iter(self._rendered)
+        return itertools.starmap(_TRANSACTION_TEMPLATE.format, self._rows())
+
+    def prerender(self) -> "TransactionBatch":
+        """
+        预先渲染每笔交易的文本并随批次保存，供多进程导入时在工作进程中完成渲染。
+
+        Returns:
+            TransactionBatch: 当前批次。
+        """
+        self._rendered = list(self._texts())
+        return self
+
+    def select(self, mask: Sequence[bool]) -> "TransactionBatch":
+        """
+        按掩码筛选交易，保留已渲染的文本。
+
+        Args:
+            mask (Sequence[bool]): 与批次等长的布尔序列。
+
+        Returns:
+            TransactionBatch: 筛选后的新批次。
+        """
+        batch = TransactionBatch(
+            {
+                name: list(itertools.compress(values, mask))
+                for name, values in self.columns.items()
+            },
+            self.source,
+        )
+        if self._rendered is not None:
+            batch._rendered = list(itertools.compress(self._rendered, mask))
+        return batch
+
+    def write_to(self, sink: TextIO, rows_per_write: int = 4096) -> None:
+        """
+        将交易批次渲染并写入文本流，每次写入一段以限制中间字符串的大小。
+
+        Args:
+            sink (TextIO): 文本流（文件或 io.StringIO）。
+            rows_per_write (int): 每次写入的交易数。
+        """
+        texts = self._texts()
+        while True:
+            block = "".join(itertools.islice(texts, rows_per_write))
+            if not block:
+                return
+            sink.write(block)
+
+    def render(self) -> str:
+        """
+        渲染整段 Beancount 文本。
+
+        Returns:
+            str: 与逐笔调用 Transaction.get_str 拼接的结果相同。
+        """
+        return "".join(self._texts())
+
+
+class TransactionWriter:
+    """将交易逐个写入账本目录下的临时文件
+
+    只依赖账本所在的目录，不需要先加载账本，因此可以在加载账本的同时写入；
+    写入完成后交给 BeancountHelper.commit_written 检查并写入账本。
+    写入的交易不会被保留，经过 WRITE_BUFFER_SIZE 大小的缓冲写入文件，
+    内存占用与交易总数无关（只保留交易单号）。
+    """
+
+    def __init__(
+        self,
+        beancount_dir: str,
+        dedup=None,
+        buffer_size: int = WRITE_BUFFER_SIZE,
+    ) -> None:
+        """
+        创建临时交易文件。
+
+        Args:
+            beancount_dir (str): 账本所在目录。
+            dedup (dedup.Deduplicator): 跨数据源重复交易检测，指定后各交易批次写入前先经过检测。
+            buffer_size (int): 写缓冲大小（字节）。
+        """
+        self.dedup = dedup
+        self.transaction_ids = []
+        self._file = tempfile.NamedTemporaryFile(
+            mode="w",
+            buffering=buffer_size,
+            delete=False,
+            suffix=".bean",
+            dir=beancount_dir,
+            encoding="utf-8",
+        )
+        self.path = self._file.name
+
+    def __enter__(self) -> "TransactionWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+        if exc_type is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def write(self, transaction: Union[Transaction, TransactionBatch]) -> None:
+        """
+        写入一笔交易或一个交易批次。
+
+        Args:
+            transaction (Union[Transaction, TransactionBatch]): 交易数据类或交易批次。
+        """
+        with PROFILER.stage("render_write"):
+            if isinstance(transaction, TransactionBatch):
+                if self.dedup is not None:
+                    transaction = self.dedup.filter(transaction)
+                transaction.write_to(self._file)
+                self.transaction_ids.extend(transaction.columns["index"])
+            else:
+                self._file.write(transaction.get_str())
+                self.transaction_ids.append(transaction.index)
+
+    def close(self) -> None:
+        """关闭临时文件。"""
+        if not self._file.closed:
+            self._file.close()
+            PROFILER.count("transactions_written", len(self.transaction_ids))
+
+
 class BeancountHelper:
     """Beancount 工具类"""
 
     def __init__(
-        self, file_path: str, out_path: str, log_obj: logging.Logger
+        self,
+        file_path: str,
+        out_path: str,
+        log_obj: logging.Logger,
+        layout: str = "file",
+        workers: int = None,
     ) -> NoReturn:
+        """
+        初始化并加载账本。
+
+        Args:
+            file_path (str): 主账本路径。
+            out_path (str): 按文件布局写入时，本次交易文件的路径。
+            log_obj (logging.Logger): 日志对象。
+            layout (str): 写入布局，"file" 每次导入生成一个带时间戳的文件并在主账本中引入，
+                "monthly" 按交易日期追加到 YYYY/YYYY-MM.bean 月度分片，每个分片只引入一次。
+            workers (int): 加载和完整检查账本时的工作进程数，默认为 CPU 核数。
+        """
         self._file_path = file_path
+        self.beancount_dir = os.path.dirname(os.path.abspath(file_path))
         self.log_obj = log_obj
         self.out_path = out_path
+        self.layout = layout
+        self.workers = workers
         self._entries, self._errors, self._options_map = self._load(file_path)
+        self._checker = LedgerChecker(self._entries, self._options_map)
 
     def _load(self, file_path: str) -> tuple:
         """加载文件 Beancount
@@ -91,7 +377,8 @@ class BeancountHelper:
             errors 生成的错误对象列表
             options_map 对象的字典
         """
-        entries, errors, options_map = loader.load_file(file_path)
+        with PROFILER.stage("ledger_load"):
+            entries, errors, options_map = load_ledger(file_path, workers=self.workers)
 
         if errors:
             for error in errors:
@@ -99,50 +386,84 @@ class BeancountHelper:
             raise ValueError(file_path, "Invalid file format")
         return entries, errors, options_map
 
-    def write_transaction_list(self, transaction_list: List[Transaction]) -> bool:
+    def write_transaction_list(
+        self,
+        transaction_list: Union[
+            TransactionBatch, Iterable[Union[Transaction, TransactionBatch]]
+        ],
+        id_index: TransactionIdIndex = None,
+        dedup=None,
+    ) -> bool:
         """
         向 Beancount 文件写入 Transaction 列表，并进行格式验证和回滚。
 
+        交易按迭代顺序边生成边写入临时文件，不会先收集为列表；传入生成器（如
+        BeancountMapper.iter_batches() 或 iter_transactions()）时内存占用与交易总数无关。
+
         Args:
-            transaction_list (List[Transaction]): 交易数据类列表。
+            transaction_list (Union[TransactionBatch, Iterable[Union[Transaction, TransactionBatch]]]):
+                交易批次，或由交易数据类/交易批次组成的任意可迭代对象，逐个写入临时文件。
+            id_index (TransactionIdIndex): 已导入交易单号索引，写入成功后记录本批交易单号。
+            dedup (dedup.Deduplicator): 跨数据源重复交易检测，指定后各交易批次写入前先经过检测，
+                写入成功后记录已写入的交易。
 
         Returns:
             bool: 写入成功返回 True，否则返回 False。
         """
         try:
-            beancount_dir = os.path.dirname(os.path.abspath(self._file_path))
-            with tempfile.NamedTemporaryFile(
-                mode="w+",
-                delete=False,
-                suffix=".bean",
-                dir=beancount_dir,
-                encoding="utf-8",
-            ) as temp_file:
-                temp_file_path = temp_file.name
-
+            if isinstance(transaction_list, TransactionBatch):
+                transaction_list = (transaction_list,)
+            with TransactionWriter(self.beancount_dir, dedup) as writer:
                 for transaction in transaction_list:
-                    temp_file.write(transaction.get_str())
+                    writer.write(transaction)
+        except Exception as e:
+            self.log_obj.error(f"写入交易记录时发生错误: {e}")
+            return False
+        return self.commit_written(writer, id_index)
+
+    def commit_written(
+        self, writer: TransactionWriter, id_index: TransactionIdIndex = None
+    ) -> bool:
+        """
+        检查已写完的临时交易文件，通过后写入账本，否则回滚。
+
+        Args:
+            writer (TransactionWriter): 已关闭的临时交易文件。
+            id_index (TransactionIdIndex): 已导入交易单号索引，写入成功后记录本批交易单号。
+
+        Returns:
+            bool: 写入成功返回 True，否则返回 False。
+        """
+        temp_file_path = writer.path
+        transaction_ids = writer.transaction_ids
+        dedup = writer.dedup
+        beancount_dir = self.beancount_dir
+        try:
+            if not transaction_ids:
+                os.remove(temp_file_path)
+                self.log_obj.info("没有新的交易记录需要写入")
+                return True
 
-            is_valid, _ = self._check_syntax()
+            is_valid, new_entries = self._check_batch(temp_file_path)
             if not is_valid:
                 self.log_obj.error("写入的交易记录导致文件格式无效，正在进行回滚...")
                 self._rollback_include(temp_file_path)
                 return False
 
-            new_file_path = self.out_path
             self.log_obj.debug(f"Beancount 目录: {beancount_dir}")
             self.log_obj.debug(f"临时文件路径: {temp_file_path}")
-            self.log_obj.debug(f"新文件路径: {new_file_path}")
-
-            os.rename(temp_file_path, new_file_path)
-
-            include_line = (
-                f'include "{os.path.relpath(new_file_path, start=beancount_dir)}"\n'
-            )
-            with open(self._file_path, "a", encoding="utf-8") as main_file:
-                main_file.write("\n;【新增交易记录】\n")
-                main_file.write(include_line)
-
+            if self.layout == "monthly":
+                self._write_shards(temp_file_path, new_entries)
+            else:
+                self._write_file(temp_file_path, beancount_dir)
+
+            self._checker.commit(new_entries)
+            if id_index is not None:
+                added = id_index.commit(transaction_ids)
+                self.log_obj.debug(f"交易单号索引新增 {added} 条: {id_index.path}")
+            if dedup is not None:
+                added = dedup.commit()
+                self.log_obj.debug(f"查重记录新增 {added} 条: {dedup.history.path}")
             self.log_obj.info("交易记录写入成功！")
             return True
 
@@ -150,6 +471,30 @@ class BeancountHelper:
             self.log_obj.error(f"写入交易记录时发生错误: {e}")
             return False
 
+    def _write_file(self, temp_file_path: str, beancount_dir: str) -> None:
+        """将已通过检查的临时文件改名为本次的交易文件，并在主账本中引入。"""
+        new_file_path = self.out_path
+        self.log_obj.debug(f"新文件路径: {new_file_path}")
+
+        os.rename(temp_file_path, new_file_path)
+
+        include_line = (
+            f'include "{os.path.relpath(new_file_path, start=beancount_dir)}"\n'
+        )
+        with open(self._file_path, "a", encoding="utf-8") as main_file:
+            main_file.write("\n;【新增交易记录】\n")
+            main_file.write(include_line)
+
+    def _write_shards(self, temp_file_path: str, new_entries: list) -> None:
+        """将已通过检查的临时文件按月追加到分片文件，然后删除临时文件。"""
+        with PROFILER.stage("shard_write"):
+            months = split_by_month(temp_file_path, new_entries)
+            added = write_shards(self._file_path, months)
+        os.remove(temp_file_path)
+        self.log_obj.debug(f"写入月度分片: {', '.join(sorted(months))}")
+        if added:
+            self.log_obj.debug(f"新增分片: {', '.join(added)}")
+
     def _rollback_include(self, temp_file_path: str) -> None:
         """
         回滚 include 引入的临时文件。
@@ -173,20 +518,55 @@ class BeancountHelper:
 
         self.log_obj.info("回滚完成！")
 
-    def _check_syntax(self) -> Tuple[bool, str]:
+    def _check_batch(self, temp_file_path: str) -> Tuple[bool, list]:
+        """在进程内增量检查新写入的交易文件。
+
+        复用已加载的条目，只解析临时文件；账本启用插件等无法增量检查的情况下，
+        退回到完整检查。
+
+        Args:
+            temp_file_path (str): 临时交易文件路径。
+
+        Returns:
+            Tuple[bool, list]: (是否有效, 解析得到的新条目)
+        """
+        with PROFILER.stage("validation_parse"):
+            new_entries, errors = self._checker.parse(temp_file_path)
+        if not errors and not self._checker.can_check(new_entries):
+            self.log_obj.debug("无法增量检查，使用完整检查")
+            is_valid, _ = self._check_syntax(temp_file_path)
+            return is_valid, new_entries
+
+        with PROFILER.stage("validation_check"):
+            errors.extend(self._checker.check(new_entries))
+        if errors:
+            for error in errors:
+                self.log_obj.error(f"格式检查失败: {printer.format_error(error)}")
+            return False, new_entries
+
+        self.log_obj.info("格式检查成功！")
+        return True, new_entries
+
+    def _check_syntax(self, temp_file_path: str = None) -> Tuple[bool, str]:
         """检查 Beancount 文件格式。
 
+        各引入文件在工作进程中并行解析和检查，再统一执行跨文件的检查，
+        结果与 bean-check 一致。
+
+        Args:
+            temp_file_path (str): 尚未引入账本的临时交易文件，指定时在账本末尾引入该文件后一起检查。
+
         Returns:
             Tuple[bool, str]: (是否有效, 错误信息或 "Successful")
         """
-        command = ["bean-check", self._file_path]
-        result = subprocess.run(
-            command, capture_output=True, text=True, encoding="utf-8"
-        )
+        extra_files = (temp_file_path,) if temp_file_path else ()
+        with PROFILER.stage("full_check"):
+            _, errors, _ = load_ledger(self._file_path, extra_files, self.workers)
 
-        if result.stderr:
-            self.log_obj.error(f"格式检查失败: {result.stderr}")
-            return False, result.stderr
+        if errors:
+            message = "".join(printer.format_error(error) for error in errors)
+            self.log_obj.error(f"格式检查失败: {message}")
+            return False, message
         else:
             self.log_obj.info("格式检查成功！")
             return True, "Successful"
@@ -0,0 +1,409 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : dedup.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/23 16:40
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 跨数据源重复交易检测
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import logging
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from conversion import TransactionBatch
+from profiler import PROFILER
+
+DEDUP_MODES = ("off", "report", "suppress")
+_COLUMNS = ["source", "time", "amount", "direction", "index"]
+_DTYPES = {
+    "source": str,
+    "time": str,
+    "amount": "int64",
+    "direction": str,
+    "index": str,
+}
+_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+# 收/支 列中收入和支出以外的取值（如 "/"、"不计收支"）统一为不计收支
+_DIRECTIONS = ("收入", "支出")
+_NEUTRAL = "不计收支"
+
+
+def _cents(amounts) -> np.ndarray:
+    """金额（Decimal）换算为整数分，作为按金额分组的键。"""
+    return np.array(
+        [-1 if amount is None else int(amount * 100) for amount in amounts],
+        dtype="int64",
+    )
+
+
+def _directions(values) -> List[str]:
+    """收/支 取值统一为 收入、支出 或 不计收支，与金额一起作为分组的键。"""
+    return [value if value in _DIRECTIONS else _NEUTRAL for value in values]
+
+
+def _empty() -> pd.DataFrame:
+    """空的交易记录表。"""
+    return pd.DataFrame(
+        {
+            "source": pd.Series(dtype=object),
+            "time": pd.Series(dtype="int64"),
+            "amount": pd.Series(dtype="int64"),
+            "direction": pd.Series(dtype=object),
+            "index": pd.Series(dtype=object),
+        }
+    )
+
+
+def _unused(frame: pd.DataFrame, used: pd.DataFrame) -> pd.DataFrame:
+    """按全部列做反连接，去除 used 中出现过的交易。"""
+    if not len(frame) or not len(used):
+        return frame.reset_index(drop=True)
+    merged = frame.merge(
+        used.drop_duplicates(), on=_COLUMNS, how="left", indicator=True
+    )
+    return merged.loc[merged["_merge"] == "left_only", _COLUMNS].reset_index(drop=True)
+
+
+def _append_csv(path: Path, frame: pd.DataFrame) -> None:
+    """将交易（时间为 Unix 秒）追加到 CSV 文件，文件不存在时写入表头。"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    exists = path.exists()
+    text = frame.assign(
+        time=pd.to_datetime(frame["time"], unit="s").dt.strftime(_TIME_FORMAT)
+    ).to_csv(index=False, header=not exists, lineterminator="\n")
+    with open(path, "a", encoding="utf-8", newline="") as file:
+        file.write(text)
+
+
+class TransactionHistory:
+    """已导入交易的时间和金额
+
+    所有数据源共用一个 CSV 文件（数据源、交易时间、金额、收支方向、交易单号），按数据源
+    拆分并按时间排序后保存在内存中，查询某段时间内的交易为二分查找。已经与新交易配对过的
+    交易另记录在 matched.csv 中，以后的导入不再与之配对。与交易单号索引一样，
+    只在交易记录成功写入账本后更新；新交易追加到文件末尾，不重写已有记录。
+    """
+
+    def __init__(self, history_dir: str) -> None:
+        """
+        初始化已导入交易记录。
+
+        Args:
+            history_dir (str): 记录文件目录。
+        """
+        self.path = Path(history_dir) / "history.csv"
+        self.matched_path = Path(history_dir) / "matched.csv"
+        self.frame = self._read(self.path)
+        self.matched = self._read(self.matched_path)
+        self._split()
+
+    def _split(self) -> None:
+        """按数据源拆分为按时间排序的数组。"""
+        self._by_source = {
+            source: (
+                group["time"].to_numpy(),
+                group["amount"].to_numpy(),
+                group["direction"].to_numpy(),
+                group["index"].to_numpy(),
+            )
+            for source, group in self.frame.groupby("source", sort=False)
+        }
+
+    def _read(self, path: Path) -> pd.DataFrame:
+        """读取记录文件（时间换算为 Unix 秒），不存在时返回空表。"""
+        if not path.exists():
+            return _empty()
+        frame = pd.read_csv(
+            path, encoding="utf-8", dtype=_DTYPES, keep_default_na=False
+        )
+        frame["time"] = (
+            pd.to_datetime(frame["time"], format=_TIME_FORMAT)
+            .astype("datetime64[s]")
+            .astype("int64")
+        )
+        return frame[_COLUMNS].sort_values("time", kind="stable", ignore_index=True)
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @property
+    def sources(self) -> List[str]:
+        """记录中出现过的数据源。"""
+        return list(self._by_source)
+
+    def between(self, source: str, start: int, end: int) -> pd.DataFrame:
+        """
+        查询某个数据源在一段时间内的交易。
+
+        Args:
+            source (str): 数据源。
+            start (int): 开始时间（Unix 秒，含）。
+            end (int): 结束时间（Unix 秒，含）。
+
+        Returns:
+            pd.DataFrame: 包含 time、amount、direction、index 列的交易，按时间排序。
+        """
+        times, amounts, directions, indexes = self._by_source.get(
+            source,
+            (
+                np.empty(0, "int64"),
+                np.empty(0, "int64"),
+                np.empty(0, object),
+                np.empty(0, object),
+            ),
+        )
+        lo = np.searchsorted(times, start, side="left")
+        hi = np.searchsorted(times, end, side="right")
+        return pd.DataFrame(
+            {
+                "time": times[lo:hi],
+                "amount": amounts[lo:hi],
+                "direction": directions[lo:hi],
+                "index": indexes[lo:hi],
+            }
+        )
+
+    def commit(self, rows: List[pd.DataFrame], matched: List[pd.DataFrame] = ()) -> int:
+        """
+        记录已写入账本的交易和本次配对过的已有交易，追加到记录文件末尾。
+
+        Args:
+            rows (List[pd.DataFrame]): 包含 source、time、amount、direction、index 列的交易。
+            matched (List[pd.DataFrame]): 本次配对过的已有交易，列与 rows 相同。
+
+        Returns:
+            int: 新增的交易数量。
+        """
+        matched = [frame for frame in matched if len(frame)]
+        if matched:
+            matched = _unused(pd.concat(matched, ignore_index=True), self.matched)
+            _append_csv(self.matched_path, matched)
+            self.matched = pd.concat([self.matched, matched], ignore_index=True)
+
+        rows = [frame for frame in rows if len(frame)]
+        if not rows:
+            return 0
+        added = pd.concat(rows, ignore_index=True)[_COLUMNS]
+        _append_csv(self.path, added)
+
+        self.frame = pd.concat([self.frame, added], ignore_index=True)
+        self.frame = self.frame.sort_values("time", kind="stable", ignore_index=True)
+        self._split()
+        return len(added)
+
+
+class Deduplicator:
+    """跨数据源重复交易检测
+
+    同一笔消费可能同时出现在不同数据源的账单中（如微信支付使用的银行卡也出现在支付宝账单中）。
+    新交易与其他数据源的历史交易，以及本次导入中已接受的其他数据源的交易，按金额和收支
+    方向分组（同金额的付款和退款不会配对）、按时间做 as-of 连接（pd.merge_asof），
+    在时间窗口内取时间最接近的一笔作为候选；每笔已有交易最多与一笔新交易配对（包括以前
+    的导入中配对过的），多笔新交易争用同一笔时保留时间最接近的，其余的在剩下的交易中
+    重新查找。只查询新交易时间范围附近的历史交易，耗时与历史交易总数基本无关。
+
+    mode 为 "report" 时只在日志中报告候选，"suppress" 时不写入候选交易。
+    """
+
+    def __init__(
+        self,
+        history: TransactionHistory,
+        window: int,
+        mode: str,
+        log_obj: logging.Logger,
+    ) -> None:
+        """
+        初始化重复交易检测。
+
+        Args:
+            history (TransactionHistory): 已导入交易记录。
+            window (int): 时间窗口（秒），两笔交易的时间相差不超过该值才视为候选。
+            mode (str): "report" 或 "suppress"。
+            log_obj (logging.Logger): 日志对象。
+        """
+        if mode not in DEDUP_MODES[1:]:
+            raise ValueError(f"未知的查重模式: {mode}")
+        self.history = history
+        self.window = int(window)
+        self.mode = mode
+        self.log_obj = log_obj
+        self.accepted: List[pd.DataFrame] = []
+        self.used = history.matched
+        self.matched: List[pd.DataFrame] = []
+
+    def _pool(self, source: str, start: int, end: int) -> pd.DataFrame:
+        """其他数据源在 [start, end] 内、尚未配对过的交易，包括本次导入中已接受的交易。"""
+        frames = [
+            self.history.between(other, start, end).assign(source=other)
+            for other in self.history.sources
+            if other != source
+        ]
+        frames.extend(
+            frame[
+                (frame["source"] != source)
+                & (frame["time"] >= start)
+                & (frame["time"] <= end)
+            ]
+            for frame in self.accepted
+        )
+        frames = [frame for frame in frames if len(frame)]
+        if not frames:
+            return pd.DataFrame(columns=_COLUMNS)
+        return _unused(pd.concat(frames, ignore_index=True)[_COLUMNS], self.used)
+
+    def match(self, new: pd.DataFrame, pool: pd.DataFrame) -> List[Tuple[int, int]]:
+        """
+        为新交易在已有交易中一对一地查找候选。
+
+        Args:
+            new (pd.DataFrame): 新交易，包含 time、amount、direction 列。
+            pool (pd.DataFrame): 已有交易，包含 time、amount、direction 列。
+
+        Returns:
+            List[Tuple[int, int]]: (新交易位置, 已有交易位置) 列表。
+        """
+        left = pd.DataFrame(
+            {
+                "time": new["time"].to_numpy("int64"),
+                "amount": new["amount"].to_numpy("int64"),
+                "direction": new["direction"].to_numpy(object),
+                "row": np.arange(len(new)),
+            }
+        ).sort_values("time", kind="stable")
+        right = pd.DataFrame(
+            {
+                "time": pool["time"].to_numpy("int64"),
+                "amount": pool["amount"].to_numpy("int64"),
+                "direction": pool["direction"].to_numpy(object),
+                "key": np.arange(len(pool)),
+                "matched_time": pool["time"].to_numpy("int64"),
+            }
+        ).sort_values("time", kind="stable")
+
+        pairs = []
+        while len(left) and len(right):
+            merged = pd.merge_asof(
+                left,
+                right,
+                on="time",
+                by=["amount", "direction"],
+                tolerance=self.window,
+                direction="nearest",
+            ).dropna(subset=["key"])
+            if merged.empty:
+                break
+            merged["gap"] = (merged["time"] - merged["matched_time"]).abs()
+            best = merged.sort_values(["gap", "row"], kind="stable").drop_duplicates(
+                "key"
+            )
+            pairs.extend(zip(best["row"].tolist(), best["key"].astype(int).tolist()))
+            # 争用失败的新交易在剩余的已有交易中重新查找，没有候选的不再参与
+            retry = set(merged["row"]) - set(best["row"])
+            left = left[left["row"].isin(retry)]
+            right = right[~right["key"].isin(best["key"])]
+        return sorted(pairs)
+
+    def filter(self, batch: TransactionBatch) -> TransactionBatch:
+        """
+        检测批次中与其他数据源重复的交易。
+
+        没有数据源或交易时间的批次原样返回；返回的交易视为已接受，写入成功后由 commit 记录。
+
+        Args:
+            batch (TransactionBatch): 交易批次。
+
+        Returns:
+            TransactionBatch: suppress 模式下去除候选后的批次，否则为原批次。
+        """
+        times = batch.columns["time"]
+        if batch.source is None or not len(batch) or any(t is None for t in times):
+            return batch
+
+        with PROFILER.stage("dedup"):
+            new = pd.DataFrame(
+                {
+                    "source": batch.source,
+                    "time": np.array(times, dtype="int64"),
+                    "amount": _cents(batch.columns["amount"]),
+                    "direction": _directions(batch.columns["direction"]),
+                    "index": batch.columns["index"],
+                }
+            )
+            pool = self._pool(
+                batch.source,
+                int(new["time"].min()) - self.window,
+                int(new["time"].max()) + self.window,
+            )
+            pairs = self.match(new, pool) if len(pool) else []
+            PROFILER.count("duplicate_candidates", len(pairs))
+
+            for row, key in pairs:
+                self._report(batch, row, pool.iloc[key])
+            if pairs:
+                matched = pool.iloc[[key for _, key in pairs]]
+                self.used = pd.concat([self.used, matched], ignore_index=True)
+                self.matched.append(matched)
+
+            keep = np.ones(len(new), dtype=bool)
+            if pairs and self.mode == "suppress":
+                keep[[row for row, _ in pairs]] = False
+                batch = batch.select(keep.tolist())
+            self.accepted.append(new[keep])
+
+        if pairs:
+            action = "已跳过" if self.mode == "suppress" else "仍会写入"
+            self.log_obj.warning(
+                f"{batch.source}: 发现 {len(pairs)} 笔疑似与其他数据源重复的交易，{action}"
+            )
+        return batch
+
+    def _report(self, batch: TransactionBatch, row: int, other: pd.Series) -> None:
+        """在日志中报告一对候选。"""
+        columns = batch.columns
+        time = pd.Timestamp(columns["time"][row], unit="s")
+        other_time = pd.Timestamp(int(other["time"]), unit="s")
+        self.log_obj.info(
+            f"疑似重复: {batch.source} {time} {columns['amount'][row]} "
+            f"{columns['description'][row]} ({columns['index'][row]}) <-> "
+            f"{other['source']} {other_time} ({other['index']})"
+        )
+
+    def commit(self) -> int:
+        """
+        记录本次导入中已接受的交易和配对过的已有交易，应在交易记录成功写入账本后调用。
+
+        Returns:
+            int: 新增的交易数量。
+        """
+        added = self.history.commit(self.accepted, self.matched)
+        self.accepted = []
+        self.matched = []
+        return added
+
+
+def create_deduplicator(
+    config: Dict, log_obj: logging.Logger
+) -> Optional[Deduplicator]:
+    """
+    根据配置创建重复交易检测。
+
+    Args:
+        config (Dict): 查重配置，包含 path（记录目录）、mode（"off"、"report" 或 "suppress"）
+            和 window（时间窗口，秒）。
+        log_obj (logging.Logger): 日志对象。
+
+    Returns:
+        Optional[Deduplicator]: 未配置或 mode 为 "off" 时返回 None。
+    """
+    if not config or config["mode"] == "off":
+        return None
+    return Deduplicator(
+        TransactionHistory(config["path"]), config["window"], config["mode"], log_obj
+    )
@@ -0,0 +1,274 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : fava_launcher.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/18 19:40
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 启动 Fava
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import os
+import sys
+import json
+import time
+import socket
+import signal
+import tempfile
+import subprocess
+import webbrowser
+import urllib.error
+import urllib.request
+from pathlib import Path
+from datetime import datetime
+from typing import NoReturn, Optional
+
+HOST = "127.0.0.1"
+
+
+def get_free_port() -> int:
+    """
+    由操作系统分配一个空闲端口。
+
+    Returns:
+        int: 端口号。
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind((HOST, 0))
+        return s.getsockname()[1]
+
+
+def probe_fava(url: str, timeout: float = 0.5) -> bool:
+    """
+    通过 HTTP 请求检查地址上运行的是否为 Fava。
+
+    Args:
+        url (str): Fava 地址。
+        timeout (float): 单次请求超时（秒）。
+
+    Returns:
+        bool: 返回了 Fava 页面时为 True。
+    """
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return b"fava" in response.read(65536).lower()
+    except (urllib.error.URLError, OSError, ValueError):
+        return False
+
+
+def read_state(state_path: Path) -> Optional[dict]:
+    """
+    读取记录的 Fava 实例信息。
+
+    Args:
+        state_path (Path): 状态文件路径。
+
+    Returns:
+        Optional[dict]: 实例信息（pid、port、url、ledger、started），不存在或损坏时返回 None。
+    """
+    try:
+        with open(state_path, "r", encoding="utf-8") as file:
+            state = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return state if isinstance(state, dict) else None
+
+
+def write_state(state_path: Path, state: dict) -> None:
+    """
+    原子写入 Fava 实例信息。
+
+    Args:
+        state_path (Path): 状态文件路径。
+        state (dict): 实例信息。
+    """
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        mode="w", delete=False, dir=state_path.parent, suffix=".tmp", encoding="utf-8"
+    ) as temp_file:
+        json.dump(state, temp_file, ensure_ascii=False, indent=2)
+    os.replace(temp_file.name, state_path)
+
+
+def find_running_fava(target_path: Path, state_path: Path) -> Optional[dict]:
+    """
+    查找为同一账本运行中的 Fava 实例。
+
+    Args:
+        target_path (Path): Beancount 文件的路径。
+        state_path (Path): 状态文件路径。
+
+    Returns:
+        Optional[dict]: 仍在响应的实例信息，没有则返回 None。
+    """
+    state = read_state(state_path)
+    if not state or state.get("ledger") != str(Path(target_path).resolve()):
+        return None
+    return state if probe_fava(state["url"]) else None
+
+
+def start_fava(target_path: Path, port: int, log_path: Path) -> subprocess.Popen:
+    """
+    在后台启动 Fava 并返回进程对象，输出写入日志文件。
+
+    Fava 与当前进程分离，命令行退出后继续运行，供后续的 -r 复用。
+
+    Args:
+        target_path (Path): Beancount 文件的路径。
+        port (int): Fava 要监听的端口号。
+        log_path (Path): Fava 输出的日志文件。
+
+    Returns:
+        subprocess.Popen: Fava 进程对象。
+    """
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    command = ["fava", "-H", HOST, "-p", str(port), str(target_path)]
+    if sys.platform == "win32":
+        options = {
+            "creationflags": subprocess.CREATE_NEW_PROCESS_GROUP
+            | subprocess.DETACHED_PROCESS
+        }
+    else:
+        options = {"start_new_session": True}
+
+    with open(log_path, "a", encoding="utf-8") as log_file:
+        started = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        log_file.write(f"\n[{started}] {' '.join(command)}\n")
+        log_file.flush()
+        return subprocess.Popen(
+            command,
+            stdin=subprocess.DEVNULL,
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            **options,
+        )
+
+
+def wait_for_fava(process: subprocess.Popen, url: str, timeout: float) -> bool:
+    """
+    轮询 Fava 地址直到可以访问。
+
+    Args:
+        process (subprocess.Popen): Fava 进程对象。
+        url (str): Fava 地址。
+        timeout (float): 最长等待时间（秒）。
+
+    Returns:
+        bool: 在超时前可以访问时为 True；进程退出或超时返回 False。
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        if probe_fava(url):
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def tail(file_path: Path, lines: int = 10) -> str:
+    """读取文件最后几行，用于报告 Fava 的启动错误。"""
+    try:
+        with open(file_path, "r", encoding="utf-8", errors="replace") as file:
+            return "".join(file.readlines()[-lines:])
+    except OSError:
+        return ""
+
+
+def run_fava(
+    target_path: Path, state_path: Path, log_path: Path, timeout: float = 30.0
+) -> NoReturn:
+    """
+    打开账本的 Fava 页面，已有为同一账本运行的 Fava 时直接复用。
+
+    否则使用系统分配的端口在后台启动 Fava，通过 HTTP 探测等待其就绪后打开浏览器，
+    并记录进程号和端口供下次复用。端口在分配后被占用导致启动失败时重试一次。
+
+    Args:
+        target_path (Path): Beancount 文件的路径。
+        state_path (Path): 记录 Fava 实例信息的状态文件。
+        log_path (Path): Fava 输出的日志文件。
+        timeout (float): 等待 Fava 就绪的最长时间（秒）。
+
+    Returns:
+        NoReturn
+    """
+    state = find_running_fava(target_path, state_path)
+    if state:
+        print(f"Reusing Fava on <{state['url']}> (pid {state['pid']})")
+        webbrowser.open(state["url"])
+        return
+
+    fava_process = None
+    for _ in range(2):
+        port = get_free_port()
+        url = f"http://{HOST}:{port}/"
+        try:
+            fava_process = start_fava(target_path, port, log_path)
+        except FileNotFoundError:
+            print("Fava is not installed, run: pip install fava")
+            return
+        if wait_for_fava(fava_process, url, timeout):
+            break
+        if fava_process.poll() is None:
+            fava_process.terminate()
+            fava_process.wait()
+            fava_process = None
+            break
+        fava_process = None
+
+    if fava_process is None:
+        print(f"Fava did not start successfully, see {log_path}:")
+        print(tail(log_path))
+        return
+
+    write_state(
+        state_path,
+        {
+            "pid": fava_process.pid,
+            "port": port,
+            "url": url,
+            "ledger": str(Path(target_path).resolve()),
+            "started": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        },
+    )
+    print(f"Starting Fava on <{url}> (pid {fava_process.pid})")
+    print("Fava started successfully!")
+    webbrowser.open(url)
+
+
+def stop_fava(state_path: Path) -> bool:
+    """
+    停止记录的 Fava 实例。
+
+    只有记录的地址上仍在运行 Fava 时才结束该进程，避免误杀复用了同一进程号的其他程序。
+
+    Args:
+        state_path (Path): 状态文件路径。
+
+    Returns:
+        bool: 停止了 Fava 返回 True，没有运行中的实例返回 False。
+    """
+    state = read_state(state_path)
+    if state and probe_fava(state["url"]):
+        if sys.platform == "win32":
+            subprocess.run(
+                ["taskkill", "/PID", str(state["pid"]), "/T", "/F"],
+                capture_output=True,
+            )
+        else:
+            try:
+                os.kill(state["pid"], signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        stopped = True
+    else:
+        stopped = False
+
+    if state is not None:
+        os.remove(state_path)
+    return stopped
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : id_index.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/10 20:47
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 已导入交易单号索引
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+# 没有 index 元数据的交易（此前版本写入的账本）只能从描述中找交易单号，
+# 描述由 to_remark 生成，形如 "备注 | 交易单号 | 数据源"，
+# 备注可能含有 " | "，只有符合数据源单号格式的一段才视为交易单号
+_ID_FORMATS = {
+    "wechat": re.compile(r"\d{10,}"),
+    "alipay": re.compile(r"\d{10,}"),
+}
+_DEFAULT_ID_FORMAT = re.compile(r"[0-9A-Za-z_-]{10,}")
+
+
+def _narration_id(narration: str, source: str) -> Optional[str]:
+    """
+    从描述中取出交易单号。
+
+    Args:
+        narration (str): 交易描述。
+        source (str): 数据源。
+
+    Returns:
+        Optional[str]: 交易单号，描述不是该数据源生成的或没有交易单号时为 None。
+    """
+    parts = narration.split(" | ")
+    if len(parts) < 2 or parts[-1] != source:
+        return None
+    transaction_id = parts[-2].strip()
+    if _ID_FORMATS.get(source, _DEFAULT_ID_FORMAT).fullmatch(transaction_id):
+        return transaction_id
+    return None
+
+
+class TransactionIdIndex:
+    """已导入交易单号索引
+
+    每个数据源一个文本文件，每行一个交易单号，加载后保存在集合中，查询为 O(1)。
+    只在交易记录成功写入账本后更新，写入时先写临时文件再替换，保证原子性。
+    """
+
+    def __init__(self, index_dir: str, source: str) -> None:
+        """
+        初始化交易单号索引。
+
+        Args:
+            index_dir (str): 索引文件目录。
+            source (str): 数据源（如 "wechat" 或 "alipay"）。
+        """
+        self.source = source
+        self.path = Path(index_dir) / f"{source}.txt"
+        self.ids = self._read()
+
+    def _read(self) -> set:
+        """读取索引文件，不存在时返回空集合。"""
+        if not self.path.exists():
+            return set()
+        with open(self.path, "r", encoding="utf-8") as file:
+            return {line.rstrip("\n") for line in file if line.strip()}
+
+    def __contains__(self, transaction_id: str) -> bool:
+        return transaction_id in self.ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def save(self) -> None:
+        """原子写入索引文件。"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            mode="w",
+            delete=False,
+            dir=self.path.parent,
+            suffix=".tmp",
+            encoding="utf-8",
+        ) as temp_file:
+            for transaction_id in sorted(self.ids):
+                temp_file.write(f"{transaction_id}\n")
+        os.replace(temp_file.name, self.path)
+
+    def commit(self, transaction_ids: Iterable[str]) -> int:
+        """
+        记录已写入账本的交易单号并保存。
+
+        Args:
+            transaction_ids (Iterable[str]): 交易单号，None 会被忽略。
+
+        Returns:
+            int: 新增的交易单号数量。
+        """
+        before = len(self.ids)
+        self.ids.update(
+            transaction_id for transaction_id in transaction_ids if transaction_id
+        )
+        added = len(self.ids) - before
+        if added:
+            self.save()
+        return added
+
+    def rebuild(self, entries: List) -> int:
+        """
+        根据账本条目重建索引。
+
+        交易单号和数据源优先取交易的 index、source 元数据；没有元数据的交易
+        （此前版本写入的账本）从描述中取符合数据源单号格式的一段。
+        两者都没有的交易（如手工记录的交易）不计入。
+
+        Args:
+            entries (List): 账本条目（loader.load_file 的结果）。
+
+        Returns:
+            int: 重建后的交易单号数量。
+        """
+        ids = set()
+        for entry in entries:
+            meta = getattr(entry, "meta", None) or {}
+            transaction_id = meta.get("index")
+            if transaction_id:
+                if meta.get("source") == self.source:
+                    ids.add(str(transaction_id))
+                continue
+            narration = getattr(entry, "narration", None)
+            transaction_id = narration and _narration_id(narration, self.source)
+            if transaction_id:
+                ids.add(transaction_id)
+
+        self.ids = ids
+        self.save()
+        return len(ids)
@@ -12,7 +12,6 @@
 __copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
 __license__ = None
 
-import pandas as pd
 import logging
 from pathlib import Path
 from log import LoggerManager
@@ -70,26 +69,42 @@ def config_load() -> Tuple[dict, dict, logging.Logger, Path]:
     """
     初始化应用程序的基本组件。
 
-    此函数加载配置文件，初始化日志管理器，确保根目录存在，并生成文件格式字符串。
+    此函数加载配置文件并将其中的相对路径转换为绝对路径，没有任何副作用：
+    不创建目录，返回的日志记录器也尚未添加处理器，需要写日志的命令再调用 init_logger。
 
     Returns:
         Tuple[dict, dict, logging.Logger, Path]:
             包含以下四个元素的元组：
             - dict: 全局应用单例配置实例。
             - dict: 全局规则单例配置实例。
-            - logging.Logger: 全局单例日志记录器实例。
+            - logging.Logger: 全局单例日志记录器实例（由 init_logger 添加处理器）。
             - Path: 根目录路径。
 
     Example:
         app_config, rules, log_obj, config_path = config_load()
     """
     app = configs["app"]
-    log = app["log"]
     app_data_path = AppDataPath(app["name"], app["data_subdirectory"])
     config = convert_relative_paths_to_absolute(
         configs, app_data_path.get_absolute_path
     )
 
+    log_obj = logging.getLogger(app["name"])
+
+    return (app, config["rules"], log_obj, app_data_path.get_path())
+
+
+def init_logger(app: dict) -> logging.Logger:
+    """
+    为日志记录器添加控制台和文件处理器，重复调用时直接返回已初始化的记录器。
+
+    Args:
+        app (dict): 应用配置（config_load 返回的第一个元素）。
+
+    Returns:
+        logging.Logger: 全局单例日志记录器实例。
+    """
+    log = app["log"]
     singleton_logger = LoggerManager(
         name=app["name"],
         log_dir=log["path"],
@@ -98,9 +113,7 @@ def config_load() -> Tuple[dict, dict, logging.Logger, Path]:
         log_datefmt=log["datefmt"],
         log_colors=log["colors"],
     )
-    log_obj = singleton_logger.get_logger()
-
-    return (app, config["rules"], log_obj, app_data_path.get_path())
+    return singleton_logger.get_logger()
 
 
 def init_xlsx(
@@ -116,6 +129,8 @@ def init_xlsx(
     Returns:
         NoReturn
     """
+    import pandas as pd
+
     expenses_df = pd.DataFrame(columns=expenses_columns)
     assets_df = pd.DataFrame(columns=assets_columns)
     with pd.ExcelWriter(target_path) as writer:
@@ -130,7 +145,7 @@ def init_wechat_rule(root):
         root (Path): 规则存放路径
     """
     init_xlsx(
-        ["编号", "交易类型", "交易对方", "商品", "值", "备注"],
+        ["编号", "交易类型", "交易对方", "商品", "匹配方式", "优先级", "值", "备注"],
         ["编号", "交易类型", "支付方式", "当前状态", "值", "备注"],
         root / "wechat_rule.xlsx",
     )
@@ -143,7 +158,7 @@ def init_alipay_rule(root: Path):
         root (Path): 规则存放路径
     """
     init_xlsx(
-        ["编号", "交易分类", "交易对方", "商品说明", "值", "备注"],
+        ["编号", "交易分类", "交易对方", "商品说明", "匹配方式", "优先级", "值", "备注"],
         ["编号", "收/付款方式", "值", "备注"],
         root / "alipay_rule.xlsx",
     )
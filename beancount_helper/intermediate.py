@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : intermediate.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/25 21:14
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 映射结果的中间文件
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import os
+from pathlib import Path
+from typing import Iterable, Iterator, List
+import pandas as pd
+
+# 映射结果默认保存为不压缩的 Feather（Arrow IPC 文件），读取时可以直接内存映射；
+# CSV 仍用 gb18030 编码，便于在 Excel 中打开和修改
+FEATHER_SUFFIX = ".feather"
+CSV_ENCODING = "gb18030"
+
+
+def is_feather(file_path: str) -> bool:
+    """根据扩展名判断是否为 Feather 文件。"""
+    return Path(file_path).suffix.lower() == FEATHER_SUFFIX
+
+
+def feather_available() -> bool:
+    """是否已安装读写 Feather 所需的 pyarrow。"""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def read_columns(file_path: str) -> List[str]:
+    """
+    读取映射结果的列名，Feather 只读取文件结构，CSV 只读取表头。
+
+    Args:
+        file_path (str): 映射结果文件路径。
+
+    Returns:
+        List[str]: 列名列表。
+    """
+    if is_feather(file_path):
+        import pyarrow as pa
+
+        with pa.memory_map(str(file_path)) as source:
+            return list(pa.ipc.open_file(source).schema.names)
+    return list(pd.read_csv(file_path, encoding=CSV_ENCODING, nrows=0).columns)
+
+
+def iter_frames(file_path: str, chunksize: int = None) -> Iterator[pd.DataFrame]:
+    """
+    按块读取映射结果。
+
+    Feather 文件内存映射后按 chunksize 切片，每块只在转换为 DataFrame 时复制，
+    内存占用与块大小有关；CSV 按原有方式用 read_csv 读取。
+
+    Args:
+        file_path (str): 映射结果文件路径。
+        chunksize (int): 每块的行数，为 None 时整个文件作为一块。
+
+    Yields:
+        pd.DataFrame: 映射结果数据块。
+    """
+    if not is_feather(file_path):
+        if not chunksize:
+            yield pd.read_csv(file_path, encoding=CSV_ENCODING)
+            return
+        with pd.read_csv(
+            file_path, encoding=CSV_ENCODING, chunksize=chunksize
+        ) as reader:
+            yield from reader
+        return
+
+    import pyarrow as pa
+
+    with pa.memory_map(str(file_path)) as source:
+        table = pa.ipc.open_file(source).read_all()
+        size = chunksize or max(table.num_rows, 1)
+        for offset in range(0, max(table.num_rows, 1), size):
+            yield table.slice(offset, size).to_pandas()
+
+
+def _arrow_compatible(frame: pd.DataFrame) -> pd.DataFrame:
+    """object 列中混有多种类型（如规则编号既有数字又有文字）时，非空值统一转为字符串。"""
+    converted = {}
+    for name in frame.columns[frame.dtypes == object]:
+        values = frame[name]
+        if len({type(value) for value in values.dropna()}) > 1:
+            converted[name] = values.map(
+                lambda value: value if pd.isna(value) else str(value)
+            )
+    return frame.assign(**converted) if converted else frame
+
+
+def _promote(current, incoming):
+    """两个数据块的列类型不一致时，取能同时容纳二者的类型。"""
+    import pyarrow as pa
+
+    fields = []
+    for old, new in zip(current, incoming):
+        if old.type == new.type or pa.types.is_null(new.type):
+            fields.append(old)
+        elif pa.types.is_null(old.type):
+            fields.append(new)
+        elif pa.types.is_integer(old.type) and pa.types.is_integer(new.type):
+            fields.append(old.with_type(pa.int64()))
+        elif all(
+            pa.types.is_integer(field.type) or pa.types.is_floating(field.type)
+            for field in (old, new)
+        ):
+            fields.append(old.with_type(pa.float64()))
+        else:
+            fields.append(old.with_type(pa.string()))
+    return pa.schema(fields)
+
+
+class FeatherWriter:
+    """按块将数据写入 Feather 文件
+
+    每块作为一个记录批次追加，不压缩，读取时可以内存映射。分块读取的 CSV 各块推断出的
+    类型可能不同（如某块全为空值），出现不一致时按 _promote 放宽列类型，并将已写入的批次
+    按新的类型重写一遍；重写时逐个批次读取，内存占用与已写入的数据量无关。
+    """
+
+    def __init__(self, file_path: str) -> None:
+        """
+        初始化写入器，第一块数据写入时才创建文件。
+
+        Args:
+            file_path (str): Feather 文件路径。
+        """
+        self.file_path = str(file_path)
+        self.schema = None
+        self._sink = None
+        self._writer = None
+
+    def _open(self, schema) -> None:
+        import pyarrow as pa
+
+        self.schema = schema
+        self._sink = pa.OSFile(self.file_path, "wb")
+        self._writer = pa.ipc.new_file(self._sink, schema)
+
+    def _rewrite(self, schema) -> None:
+        """按新的列类型重写已写入的批次。"""
+        import pyarrow as pa
+
+        self.close()
+        previous = f"{self.file_path}.tmp"
+        os.replace(self.file_path, previous)
+        try:
+            self._open(schema)
+            with pa.memory_map(previous) as source:
+                reader = pa.ipc.open_file(source)
+                for number in range(reader.num_record_batches):
+                    self._writer.write_batch(reader.get_batch(number).cast(schema))
+        finally:
+            os.remove(previous)
+
+    def write(self, frame: pd.DataFrame) -> None:
+        """
+        写入一个数据块。
+
+        Args:
+            frame (pd.DataFrame): 数据块，各块的列名和顺序应相同。
+        """
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(_arrow_compatible(frame), preserve_index=False)
+        if self._writer is None:
+            self._open(table.schema)
+        elif not table.schema.equals(self.schema):
+            if table.schema.names != self.schema.names:
+                raise ValueError("数据块的列与已写入的数据不一致")
+            schema = _promote(self.schema, table.schema)
+            if not schema.equals(self.schema):
+                self._rewrite(schema)
+            table = table.cast(schema)
+        self._writer.write_table(table)
+
+    def close(self) -> None:
+        """完成写入并关闭文件。"""
+        if self._writer is not None:
+            self._writer.close()
+            self._sink.close()
+            self._writer = self._sink = None
+
+
+class MappedFileWriter:
+    """按块写入映射结果，按扩展名写为 Feather 或 CSV，可以同时写入多个文件。"""
+
+    def __init__(self, file_paths: Iterable[str]) -> None:
+        """
+        初始化写入器。
+
+        Args:
+            file_paths (Iterable[str]): 输出文件路径。
+        """
+        self.file_paths = [str(path) for path in file_paths]
+        self._feather = {
+            path: FeatherWriter(path) for path in self.file_paths if is_feather(path)
+        }
+        self._chunks = 0
+
+    def __enter__(self) -> "MappedFileWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def write(self, frame: pd.DataFrame) -> None:
+        """
+        写入一个映射后的数据块，CSV 第一块覆盖原文件并写入表头，其余追加。
+
+        Args:
+            frame (pd.DataFrame): 映射后的交易数据块。
+        """
+        for path in self.file_paths:
+            if path in self._feather:
+                self._feather[path].write(frame)
+                continue
+            frame.to_csv(
+                path,
+                mode="w" if self._chunks == 0 else "a",
+                header=self._chunks == 0,
+                index=False,
+                encoding=CSV_ENCODING,
+            )
+        self._chunks += 1
+
+    def close(self) -> None:
+        """关闭全部 Feather 文件。"""
+        for writer in self._feather.values():
+            writer.close()
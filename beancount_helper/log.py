@@ -14,8 +14,6 @@ __license__ = None
 
 import os
 import logging
-import colorlog
-from logging.handlers import RotatingFileHandler
 from datetime import datetime
 from typing import Dict
 from tool import SingletonMeta
@@ -60,6 +58,8 @@ class LoggerManager(metaclass=SingletonMeta):
         self._setup_logger()
 
     def _setup_logger(self):
+        import colorlog
+        from logging.handlers import RotatingFileHandler
 
         if not os.path.exists(self.log_dir):
             os.makedirs(self.log_dir)
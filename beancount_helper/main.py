@@ -12,20 +12,16 @@ __copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
 __license__ = None
 
 import os
-import re
-import time
-import socket
-import random
 import argparse
 import logging
-import subprocess
-import webbrowser
 from pathlib import Path
-from tool import AppDataPath
-from typing import NoReturn, Tuple, Dict, List, Union
-from mapper import AccountMapper, BeancountMapper
-from conversion import BeancountHelper
-from init import config_load, init_wechat_rule, init_alipay_rule
+from tool import AppDataPath, BillFormat, sniff_bill
+from typing import NoReturn, Dict, List, Union
+from profiler import PROFILER
+from init import config_load, init_logger, init_wechat_rule, init_alipay_rule
+
+# pandas、beancount 等较重的依赖只在需要它们的命令中导入，
+# 使 -gc、-r 等简单命令的启动时间不受影响
 
 
 def parse_arguments() -> argparse.Namespace:
@@ -41,7 +37,13 @@ def parse_arguments() -> argparse.Namespace:
         "-r",
         "--run",
         action="store_true",
-        help="运行账单 GUI ",
+        help="运行账单 GUI，已有为同一账本运行的 Fava 时直接复用",
+    )
+    parser.add_argument(
+        "-sf",
+        "--stop_fava",
+        action="store_true",
+        help="停止后台运行的 Fava",
     )
     parser.add_argument(
         "-i",
@@ -61,6 +63,76 @@ def parse_arguments() -> argparse.Namespace:
         type=str,
         help="使用默认应用打开规则文件，只能单独使用",
     )
+    parser.add_argument(
+        "-sc",
+        "--show_cache",
+        action="store_true",
+        help="显示已编译规则的缓存，只能单独使用",
+    )
+    parser.add_argument(
+        "-cc",
+        "--clear_cache",
+        action="store_true",
+        help="清空已编译规则的缓存，只能单独使用",
+    )
+    parser.add_argument(
+        "-cr",
+        "--check_rules",
+        type=str,
+        choices=["wechat", "alipay"],
+        help="检查规则文件中重复、矛盾和被遮蔽的规则，只能单独使用",
+    )
+    parser.add_argument(
+        "-dr",
+        "--dead_rules",
+        type=str,
+        choices=["wechat", "alipay"],
+        help="列出最近多次导入中都没有命中的规则，只能单独使用",
+    )
+    parser.add_argument(
+        "--dead_after",
+        type=int,
+        default=10,
+        help="与 -dr 一起使用，连续多少次导入未命中视为失效规则，默认为 10",
+    )
+    parser.add_argument(
+        "-cl",
+        "--compact_ledger",
+        action="store_true",
+        help="将账本引入的带时间戳交易文件迁移到按月分片的布局，只能单独使用",
+    )
+    parser.add_argument(
+        "-vl",
+        "--validate_ledger",
+        action="store_true",
+        help="多进程并行校验账本（与 bean-check 结果一致），只能单独使用",
+    )
+    parser.add_argument(
+        "--dedup",
+        type=str,
+        choices=["off", "report", "suppress"],
+        help="跨数据源重复交易检测：report 只报告，suppress 跳过疑似重复的交易，"
+        "默认使用配置中的 dedup.mode",
+    )
+    parser.add_argument(
+        "--dedup_window",
+        type=int,
+        help="与 --dedup 一起使用，金额相同且时间相差不超过多少秒视为疑似重复，"
+        "默认使用配置中的 dedup.window",
+    )
+    parser.add_argument(
+        "--layout",
+        type=str,
+        choices=["file", "monthly"],
+        help="账本写入布局：file 每次导入生成一个文件，monthly 按月追加到 YYYY/YYYY-MM.bean，"
+        "默认使用配置中的 bean_layout",
+    )
+    parser.add_argument(
+        "-ri",
+        "--rebuild_index",
+        action="store_true",
+        help="根据账本重建已导入交易单号索引，只能单独使用",
+    )
     parser.add_argument(
         "-t",
         "--target_path",
@@ -72,7 +144,7 @@ def parse_arguments() -> argparse.Namespace:
         "--account_type",
         type=str,
         choices=["wechat", "alipay"],
-        help="账户映射类型，只支持 wechat 或 alipay",
+        help="账户映射类型，只支持 wechat 或 alipay，省略时根据账单表头自动识别",
     )
     parser.add_argument(
         "-b",
@@ -80,205 +152,381 @@ def parse_arguments() -> argparse.Namespace:
         action="store_true",
         help="将 csv 文件转换为 beancount 文件格式",
     )
+    parser.add_argument(
+        "-d",
+        "--batch_path",
+        type=str,
+        help="批量导入的账单目录或通配符（如 \"bills/*.csv\"），各账单的数据源自动识别",
+    )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        type=int,
+        help="批量导入以及加载、校验账本时的工作进程数，默认为 CPU 核数",
+    )
+    parser.add_argument(
+        "--dump_csv",
+        action="store_true",
+        help="额外导出映射后的 csv 文件（可用 Excel 修改），便于调试规则",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="统计各阶段的耗时、峰值内存以及规则匹配计数，结果以 JSON 保存在日志目录",
+    )
+    parser.add_argument(
+        "-c",
+        "--chunk_size",
+        type=int,
+        help="分块处理的行数，指定后按块流式读取、映射和写入，适用于大文件",
+    )
 
-    args = parser.parse_args()
-
-    if args.target_path:
-        if not (args.account_type or args.to_beancount):
-            parser.error(
-                "-t/--target_path 必须与 -a/--account_type 或 -b/--to_beancount 其中一个组合使用"
-            )
-    return args
+    return parser.parse_args()
 
 
-def is_port_available(port: int) -> bool:
+def get_account_rules(
+    rules: Dict[str, Dict], account_type: str = None
+) -> Union[Dict[str, Dict], List[str]]:
     """
-    检查指定端口是否可用。
-    使用 socket 尝试连接到指定端口，如果连接失败，则端口可用。
+    根据账户类型从配置文件中获取规则。
+    如果 account_type 为 None，则返回一个包含所有账户规则的列表。
 
     Args:
-        port (int): 要检查的端口号。
+        rules (Dict[str, Dict]): 配置。
+        account_type (str): 账户类型（如 "wechat" 或 "alipay"）。
 
     Returns:
-        bool: 如果端口可用，返回 True；否则返回 False。
+        Union[Dict[str, Dict], List[str]:
+            - 如果 account_type 指定，返回对应账户的规则。
+            - 如果 account_type 为 None，返回一个包含所有账户规则的列表。
     """
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        return s.connect_ex(("127.0.0.1", port)) != 0
+    if account_type is None:
+        # 返回所有账户规则的列表
+        return list(rules.keys())
+    else:
+        # 返回指定账户类型的规则
+        return rules.get(account_type, {})
 
 
-def get_random_available_port(port_range: range) -> int:
+def sniff_target(
+    target_path: Path, rules: Dict[str, Dict], account_type: str = None
+) -> Union[BillFormat, None]:
     """
-    从指定范围内随机选择一个可用端口。
-    首先打乱端口范围的顺序，然后依次检查每个端口是否可用，返回第一个可用端口。
+    识别账单的编码、数据源和表头位置，只读取文件开头的一小段。
 
     Args:
-        port_range (range): 要检查的端口范围。
+        target_path (Path): 账单文件路径。
+        rules (Dict[str, Dict]): 全部数据源的规则配置。
+        account_type (str): 指定的数据源，为 None 时在全部数据源中识别。
 
     Returns:
-        int: 第一个可用的端口号。
+        Union[BillFormat, None]: 账单格式，无法识别时返回 None。
+    """
+    from mapper import AccountMapper
 
-    Raises:
-        ValueError: 如果指定范围内没有可用端口，抛出此异常。
+    sources = [account_type] if account_type else get_account_rules(rules)
+    signatures = {
+        source: AccountMapper.bill_columns(rules[source]) for source in sources
+    }
+    return sniff_bill(target_path, signatures)
+
+
+def account_map(
+    target_path: Path,
+    rules: Dict[str, Dict],
+    output_paths: List[Path],
+    bill_format: BillFormat,
+    chunk_size: int = None,
+    cache_dir: Path = None,
+    log_obj: logging.Logger = None,
+    stats_dir: Path = None,
+) -> NoReturn:
     """
-    shuffled_ports = list(port_range)
-    random.shuffle(shuffled_ports)
-    for port in shuffled_ports:
-        if is_port_available(port):
-            return port
-    raise ValueError("No available ports found in the specified range.")
+    使用指定规则映射交易记录。
 
+    Args:
+        target_path (Path): 目标文件路径。
+        rules (Dict[str, Dict]): 映射规则。
+        output_paths (List[Path]): 映射结果的输出路径，按扩展名写为 Feather 或 CSV。
+        bill_format (BillFormat): 账单格式（编码和表头位置）。
+        chunk_size (int): 分块处理的行数，为 None 时一次性处理。
+        cache_dir (Path): 已编译规则的缓存目录。
+        log_obj (logging.Logger): 日志对象，用于报告规则检查发现的问题。
+        stats_dir (Path): 规则命中统计目录。
+    """
+    from mapper import AccountMapper
+
+    account_mapper = AccountMapper(
+        target_file=target_path,
+        map=rules,
+        output_file=output_paths,
+        cache_dir=cache_dir,
+        encoding=bill_format.encoding,
+        skiprows=bill_format.skiprows,
+        log_obj=log_obj,
+        stats_dir=stats_dir,
+    )
+    account_mapper.process_transactions(chunksize=chunk_size)
 
-def start_fava(target_path: Path, port: int) -> subprocess.Popen:
+
+def csv_to_beancount(
+    target_path: Path,
+    bean_path: Path,
+    out_bean_path: Path,
+    log_obj: logging.Logger,
+    rules: Dict[str, Dict],
+    id_index_path: Path,
+    chunk_size: int = None,
+    layout: str = "file",
+    workers: int = None,
+    dedup_config: Dict = None,
+) -> NoReturn:
     """
-    启动 Fava 并返回进程对象。
+    将映射后的文件转换为 Beancount 文件，已导入过的交易单号会被跳过。
 
     Args:
-        target_path (Path): Beancount 文件的路径。
-        port (int): Fava 要监听的端口号。
+        target_path (Path): 映射后的文件路径（Feather 或 CSV）。
+        bean_path (Path): Beancount 文件路径。
+        out_bean_path (Path): 输出 Beancount 文件路径。
+        log_obj (logging.Logger): 日志对象。
+        rules (Dict[str, Dict]): 全部数据源的规则配置，按列名选择数据源的管道。
+        id_index_path (Path): 已导入交易单号索引目录。
+        chunk_size (int): 分块处理的行数，指定后边读取边写入。
+        layout (str): 账本写入布局（"file" 或 "monthly"）。
+        workers (int): 加载和校验账本时的工作进程数。
+        dedup_config (Dict): 跨数据源重复交易检测的配置。
 
     Returns:
-        subprocess.Popen: Fava 进程对象。
+        NoReturn
     """
-    command = ["fava", "-p", str(port), str(target_path)]
-    process = subprocess.Popen(
-        command,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.STDOUT,
-        text=True,
-        encoding="utf-8",
+    from id_index import TransactionIdIndex
+    from mapper import BeancountMapper
+    from conversion import BeancountHelper
+    from dedup import create_deduplicator
+
+    source = BeancountMapper.detect_source(target_path, rules)
+    if source is None:
+        log_obj.error(f"无法识别映射后文件的数据源: {target_path}")
+        return
+
+    id_index = TransactionIdIndex(id_index_path, source)
+    beancount_mapper = BeancountMapper(
+        target_path,
+        rules[source]["pipeline"],
+        chunksize=chunk_size,
+        id_index=id_index,
+        source=source,
+    )
+    beancount_helper = BeancountHelper(
+        bean_path, out_bean_path, log_obj, layout, workers
+    )
+    beancount_helper.write_transaction_list(
+        beancount_mapper.iter_batches(),
+        id_index,
+        create_deduplicator(dedup_config, log_obj),
     )
-    return process
 
 
-def monitor_fava_output(process: subprocess.Popen) -> Tuple[bool, str]:
+def import_bill(
+    target_path: Path,
+    bill_format: BillFormat,
+    rules: Dict[str, Dict],
+    bean_path: Path,
+    out_bean_path: Path,
+    log_obj: logging.Logger,
+    cache_dir: Path,
+    id_index_path: Path,
+    temp_csv_path: Path = None,
+    chunk_size: int = None,
+    stats_dir: Path = None,
+    layout: str = "file",
+    workers: int = None,
+    dedup_config: Dict = None,
+) -> NoReturn:
     """
-    监控 Fava 输出，检查是否成功启动或出现错误。
-    逐行读取 Fava 的输出，检查是否包含启动成功的 URL 或错误信息。
+    一次完成账单映射和 Beancount 转换，映射结果直接在内存中传递，不经过临时 CSV。
+    读取、映射、转换和写入分阶段并发执行，并与账本加载同时进行。
 
     Args:
-        process (subprocess.Popen): Fava 进程对象。
+        target_path (Path): 账单文件路径。
+        bill_format (BillFormat): 账单格式（数据源、编码和表头位置）。
+        rules (Dict[str, Dict]): 该数据源的规则配置。
+        bean_path (Path): Beancount 文件路径。
+        out_bean_path (Path): 输出 Beancount 文件路径。
+        log_obj (logging.Logger): 日志对象。
+        cache_dir (Path): 已编译规则的缓存目录。
+        id_index_path (Path): 已导入交易单号索引目录。
+        temp_csv_path (Path): 指定时同时导出映射后的 CSV 文件。
+        chunk_size (int): 分块处理的行数，指定后按块流式处理。
+        stats_dir (Path): 规则命中统计目录。
+        layout (str): 账本写入布局（"file" 或 "monthly"）。
+        workers (int): 加载和校验账本时的工作进程数。
+        dedup_config (Dict): 跨数据源重复交易检测的配置。
 
     Returns:
-        Tuple[bool, str]: 如果 Fava 成功启动，返回 (True, url)；如果失败，返回 (False, error_message)。
+        NoReturn
     """
-    url_pattern = re.compile(r"Starting Fava on (http[s]?://\S+)")
-    error_pattern = re.compile(r"Error:")
-    while True:
-        line = process.stdout.readline()
-        if not line:
-            break
-        print(line, end="")
-
-        url_match = url_pattern.search(line)
-        if url_match:
-            url = url_match.group(1)
-            print("Fava started successfully!")
-            return True, url
-
-        if error_pattern.search(line):
-            error_message = f"Fava encountered an error: {line.strip()}"
-            return False, error_message
-    return False, "Fava did not start successfully. No URL or error detected."
-
-
-def run_fava(target_path: Path) -> NoReturn:
+    from id_index import TransactionIdIndex
+    from mapper import AccountMapper
+    from staged import StagedImport
+    from dedup import create_deduplicator
+
+    account_mapper = AccountMapper(
+        target_file=target_path,
+        map=rules,
+        output_file=temp_csv_path,
+        cache_dir=cache_dir,
+        encoding=bill_format.encoding,
+        skiprows=bill_format.skiprows,
+        log_obj=log_obj,
+        stats_dir=stats_dir,
+    )
+    StagedImport(
+        account_mapper,
+        rules["pipeline"],
+        bill_format.source,
+        bean_path,
+        out_bean_path,
+        log_obj,
+        id_index=TransactionIdIndex(id_index_path, bill_format.source),
+        dedup=create_deduplicator(dedup_config, log_obj),
+        chunk_size=chunk_size,
+        export_csv=bool(temp_csv_path),
+        layout=layout,
+        workers=workers,
+    ).run()
+    if temp_csv_path:
+        print(f"映射后文件路径：{temp_csv_path}")
+
+
+def rebuild_id_index(
+    bean_path: Path,
+    id_index_path: Path,
+    rules: Dict[str, Dict],
+    log_obj: logging.Logger,
+) -> NoReturn:
     """
-    启动 Fava 并处理端口分配和错误。
-    主函数，负责选择可用端口、启动 Fava、监控输出，并在成功启动后打开默认浏览器。
+    根据账本中的交易重建各数据源的已导入交易单号索引。
 
     Args:
-        target_path (Path): Beancount 文件的路径。
+        bean_path (Path): Beancount 文件路径。
+        id_index_path (Path): 已导入交易单号索引目录。
+        rules (Dict[str, Dict]): 全部数据源的规则配置。
+        log_obj (logging.Logger): 日志对象。
 
     Returns:
         NoReturn
     """
+    from beancount import loader
+    from id_index import TransactionIdIndex
 
-    port_range = range(5000, 5100)
-    port = get_random_available_port(port_range)
-    fava_process = start_fava(target_path, port)
-    status, message = monitor_fava_output(fava_process)
-    if status:
-        webbrowser.open(message)
-        print("Press Ctrl+C to exit...")
-        try:
-            while True:
-                time.sleep(1)
-        except KeyboardInterrupt:
-            print("Shutting down Fava...")
-    else:
-        print(f"{message}")
-        print("Shutting down Fava...")
-        fava_process.terminate()
-        fava_process.wait()
+    entries, errors, _ = loader.load_file(bean_path)
+    if errors:
+        log_obj.warning(f"账本存在 {len(errors)} 个错误，索引可能不完整")
+    for source in get_account_rules(rules):
+        count = TransactionIdIndex(id_index_path, source).rebuild(entries)
+        print(f"{source} 交易单号索引：{count} 条")
 
 
-def get_account_rules(
-    rules: Dict[str, Dict], account_type: str = None
-) -> Union[Dict[str, Dict], List[str]]:
+def validate_ledger(bean_path: Path, workers: int = None) -> bool:
     """
-    根据账户类型从配置文件中获取规则。
-    如果 account_type 为 None，则返回一个包含所有账户规则的列表。
+    并行校验账本并打印错误。
 
     Args:
-        rules (Dict[str, Dict]): 配置。
-        account_type (str): 账户类型（如 "wechat" 或 "alipay"）。
+        bean_path (Path): Beancount 文件路径。
+        workers (int): 工作进程数，默认为 CPU 核数。
 
     Returns:
-        Union[Dict[str, Dict], List[str]:
-            - 如果 account_type 指定，返回对应账户的规则。
-            - 如果 account_type 为 None，返回一个包含所有账户规则的列表。
+        bool: 没有错误返回 True。
     """
-    if account_type is None:
-        # 返回所有账户规则的列表
-        return list(rules.keys())
-    else:
-        # 返回指定账户类型的规则
-        return rules.get(account_type, {})
+    import time
+    from beancount.parser import printer
+    from validator import load_ledger
+
+    start = time.perf_counter()
+    entries, errors, options_map = load_ledger(bean_path, workers=workers)
+    for error in errors:
+        print(printer.format_error(error), end="")
+    print(
+        f"{len(options_map['include'])} 个文件，{len(entries)} 条记录，"
+        f"{len(errors)} 个错误，用时 {time.perf_counter() - start:.2f} 秒"
+    )
+    return not errors
 
 
-def account_map(
-    target_path: Path,
-    rules: Dict[str, Dict],
-    temp_csv_path: Path,
-) -> NoReturn:
+def show_rule_cache(cache_dir: Path) -> NoReturn:
     """
-    使用指定规则映射交易记录。
+    打印已编译规则的缓存信息。
 
     Args:
-        target_path (Path): 目标文件路径。
-        rules (Dict[str, Dict]): 映射规则。
-        temp_csv_path (Path): 临时 CSV 文件路径。
+        cache_dir (Path): 缓存目录。
+
+    Returns:
+        NoReturn
     """
-    account_mapper = AccountMapper(
-        target_file=target_path,
-        map=rules,
-        output_file=temp_csv_path,
-    )
-    account_mapper.process_transactions()
+    from rule_cache import RuleCache
 
+    entries = RuleCache(cache_dir).entries()
+    print(f"缓存目录：{cache_dir}")
+    if not entries:
+        print("暂无缓存")
+        return
+    for entry in entries:
+        status = "有效" if entry["valid"] else "已失效"
+        print(
+            f"{entry['path']}  {entry['size']} 字节  {status}  "
+            f"创建于 {entry['created']}  规则问题 {entry['issues']} 个  "
+            f"规则文件 {entry['mapping_file']}"
+        )
 
-def csv_to_beancount(
-    target_path: Path,
-    bean_path: Path,
-    out_bean_path: Path,
-    log_obj: logging.Logger,
-) -> NoReturn:
+
+def check_rules(rules: Dict) -> NoReturn:
     """
-    将 CSV 文件转换为 Beancount 文件。
+    检查规则文件并打印发现的问题。
 
     Args:
-        target_path (Path): 目标 CSV 文件路径。
-        bean_path (Path): Beancount 文件路径。
-        out_bean_path (Path): 输出 Beancount 文件路径。
-        log_obj (logging.Logger): 日志对象。
+        rules (Dict): 该数据源的规则配置。
 
     Returns:
         NoReturn
     """
-    beancount_mapper = BeancountMapper(target_path)
-    transactions = beancount_mapper.map_to_transactions()
-    beancount_helper = BeancountHelper(bean_path, out_bean_path, log_obj)
-    beancount_helper.write_transaction_list(transactions)
+    import pandas as pd
+    from mapper import AccountMapper
+    from rule_lint import format_issue
+
+    sheets = pd.read_excel(rules["mapping_file"], sheet_name=["Expenses", "Assets"])
+    account_mapper = AccountMapper(target_file=None, map=rules, output_file=None)
+    issues = account_mapper.lint_rules(sheets)
+    print(f"规则文件：{rules['mapping_file']}")
+    for issue in issues:
+        print(format_issue(issue))
+    print(f"共发现 {len(issues)} 个问题")
+
+
+def show_dead_rules(rules: Dict, stats_dir: Path, after: int) -> NoReturn:
+    """
+    打印最近 after 次导入中都没有命中的规则。
+
+    Args:
+        rules (Dict): 该数据源的规则配置。
+        stats_dir (Path): 规则命中统计目录。
+        after (int): 连续未命中的导入次数阈值。
+
+    Returns:
+        NoReturn
+    """
+    import pandas as pd
+    from rule_stats import RuleStats
+
+    rule_stats = RuleStats(stats_dir, rules["mapping_file"])
+    sheets = pd.read_excel(rules["mapping_file"], sheet_name=["Expenses", "Assets"])
+    dead = rule_stats.dead_rules(
+        {sheet: sheets[sheet]["编号"].dropna() for sheet in sheets}, after
+    )
+    print(f"规则文件：{rules['mapping_file']}，累计导入 {rule_stats.imports} 次")
+    for sheet, rule_id, hits, idle in dead:
+        print(f"[{sheet}] 规则 {rule_id}: 连续 {idle} 次导入未命中，累计命中 {hits} 次")
+    print(f"共 {len(dead)} 条规则连续 {after} 次以上导入未命中")
 
 
 def close_and_remove_handlers(logger: logging.Logger) -> NoReturn:
@@ -303,6 +551,29 @@ def close_and_remove_handlers(logger: logging.Logger) -> NoReturn:
             logger.removeHandler(handler)
 
 
+def write_profile_report(app_config: Dict, log_obj: logging.Logger) -> NoReturn:
+    """
+    将性能统计结果写入日志目录，文件名与本次生成的 Beancount 文件对应。
+
+    Args:
+        app_config (Dict): 应用配置。
+        log_obj (logging.Logger): 日志对象。
+
+    Returns:
+        NoReturn
+    """
+    report_path = PROFILER.dump(
+        Path(app_config["log"]["path"])
+        / f"profile_{Path(app_config['out_bean']).stem}.json"
+    )
+    report = PROFILER.report()
+    summary = ", ".join(
+        f"{name} {stat['self_seconds']:.3f}s" for name, stat in report["stages"].items()
+    )
+    log_obj.info(f"性能统计（总计 {report['total_seconds']:.3f}s）：{summary}")
+    log_obj.info(f"性能统计已保存：{report_path}")
+
+
 def main() -> NoReturn:
     """主函数
 
@@ -310,13 +581,68 @@ def main() -> NoReturn:
         NoReturn
     """
     args = parse_arguments()
+    if args.profile:
+        PROFILER.enable()
+
     app_config, rules, log_obj, config_path = config_load()
+    try:
+        dispatch(args, app_config, rules, log_obj, config_path)
+    finally:
+        if args.profile:
+            write_profile_report(app_config, log_obj)
+
+
+def dispatch(
+    args: argparse.Namespace,
+    app_config: Dict,
+    rules: Dict[str, Dict],
+    log_obj: logging.Logger,
+    config_path: Path,
+) -> NoReturn:
+    """
+    根据命令行参数执行对应的命令。
+
+    Args:
+        args (argparse.Namespace): 命令行参数。
+        app_config (Dict): 应用配置。
+        rules (Dict[str, Dict]): 全部数据源的规则配置。
+        log_obj (logging.Logger): 日志对象。
+        config_path (Path): 应用数据目录。
+
+    Returns:
+        NoReturn
+    """
     bean_path: str = app_config["bean_path"]
     temp_csv_path: str = app_config["temp_csv"]
+    temp_data_path: str = app_config["temp_data"]
     out_bean_path: str = app_config["out_bean"]
+    rule_cache_path: str = app_config["rule_cache"]
+    id_index_path: str = app_config["id_index"]
+    rule_stats_path: str = app_config["rule_stats"]
+    layout: str = args.layout or app_config["bean_layout"]
+    dedup_config: Dict = dict(app_config["dedup"])
+    if args.dedup:
+        dedup_config["mode"] = args.dedup
+    if args.dedup_window is not None:
+        dedup_config["window"] = args.dedup_window
 
     if args.run:
-        run_fava((config_path / "bean" / "moneybook.bean"))
+        from fava_launcher import run_fava
+
+        run_fava(
+            config_path / "bean" / "moneybook.bean",
+            Path(app_config["fava_state"]),
+            Path(app_config["log"]["path"]) / "fava.log",
+        )
+        return
+
+    if args.stop_fava:
+        from fava_launcher import stop_fava
+
+        if stop_fava(Path(app_config["fava_state"])):
+            print("已停止 Fava")
+        else:
+            print("没有运行中的 Fava")
         return
 
     if args.get_rules:
@@ -340,24 +666,154 @@ def main() -> NoReturn:
         print(f"配置文件路径：{config_path}")
         return
 
-    if args.target_path and args.account_type:
-        if not os.path.exists(args.target_path):
-            print(f"错误: 指定的路径不存在: {args.target_path}")
+    if args.show_cache:
+        show_rule_cache(rule_cache_path)
+        return
+
+    if args.clear_cache:
+        from rule_cache import RuleCache
+
+        count = RuleCache(rule_cache_path).clear()
+        print(f"已清空规则缓存：{count} 个文件")
+        return
+
+    if args.check_rules:
+        check_rules(rules[args.check_rules])
+        return
+
+    if args.dead_rules:
+        show_dead_rules(rules[args.dead_rules], rule_stats_path, args.dead_after)
+        return
+
+    if args.validate_ledger:
+        validate_ledger(bean_path, args.workers)
+        return
+
+    if not (
+        args.rebuild_index
+        or args.compact_ledger
+        or args.batch_path
+        or args.target_path
+    ):
+        return
+
+    # 以下命令会读写应用数据目录，此时才创建目录和日志文件
+    AppDataPath().create_directories()
+    init_logger(app_config)
+
+    if args.rebuild_index:
+        rebuild_id_index(bean_path, id_index_path, rules, log_obj)
+        return
+
+    if args.compact_ledger:
+        from shard import compact_ledger
+
+        compact_ledger(bean_path, log_obj)
+        return
+
+    if args.batch_path:
+        from batch import collect_bill_files, import_bills
+
+        bills = []
+        for target_file in collect_bill_files(args.batch_path):
+            bill_format = sniff_target(target_file, rules, args.account_type)
+            if bill_format is None or bill_format.mapped:
+                log_obj.warning(f"无法识别账单格式，已跳过: {target_file}")
+                continue
+            bills.append((target_file, bill_format))
+        if not bills:
+            print(f"错误: 未找到账单文件: {args.batch_path}")
             return
 
-        rules = get_account_rules(rules, args.account_type)
-        account_map(args.target_path, rules, temp_csv_path)
-        print(f"映射后文件路径：{temp_csv_path}")
+        import_bills(
+            bills,
+            rules,
+            bean_path,
+            out_bean_path,
+            log_obj,
+            rule_cache_path,
+            id_index_path,
+            args.workers,
+            rule_stats_path,
+            layout,
+            dedup_config,
+        )
+        return
+
+    if not os.path.exists(args.target_path):
+        print(f"错误: 指定的路径不存在: {args.target_path}")
         return
 
-    if args.target_path and args.to_beancount:
-        if not os.path.exists(args.target_path):
-            print(f"错误: 指定的路径不存在: {args.target_path}")
+    from intermediate import feather_available, is_feather
+
+    # Feather 文件只会是映射结果，不需要识别格式
+    bill_format = None
+    if not is_feather(args.target_path):
+        bill_format = sniff_target(args.target_path, rules, args.account_type)
+        if bill_format is None:
+            print(f"错误: 无法识别账单格式: {args.target_path}")
             return
 
-        csv_to_beancount(args.target_path, bean_path, out_bean_path, log_obj)
+    if bill_format is None or bill_format.mapped:
+        if not args.to_beancount:
+            print(f"错误: 文件已经过映射，请使用 -b 转换: {args.target_path}")
+            return
+
+        csv_to_beancount(
+            args.target_path,
+            bean_path,
+            out_bean_path,
+            log_obj,
+            rules,
+            id_index_path,
+            args.chunk_size,
+            layout,
+            args.workers,
+            dedup_config,
+        )
+        return
+
+    source_rules = get_account_rules(rules, bill_format.source)
+    if args.to_beancount:
+        import_bill(
+            args.target_path,
+            bill_format,
+            source_rules,
+            bean_path,
+            out_bean_path,
+            log_obj,
+            rule_cache_path,
+            id_index_path,
+            temp_csv_path if args.dump_csv else None,
+            args.chunk_size,
+            rule_stats_path,
+            layout,
+            args.workers,
+            dedup_config,
+        )
         return
 
+    output_paths = []
+    if feather_available():
+        output_paths.append(temp_data_path)
+    else:
+        log_obj.warning("未安装 pyarrow，映射结果保存为 CSV")
+    if args.dump_csv or not output_paths:
+        output_paths.append(temp_csv_path)
+
+    account_map(
+        args.target_path,
+        source_rules,
+        output_paths,
+        bill_format,
+        args.chunk_size,
+        rule_cache_path,
+        log_obj,
+        rule_stats_path,
+    )
+    for output_path in output_paths:
+        print(f"映射后文件路径：{output_path}")
+
 
 if __name__ == "__main__":
     main()
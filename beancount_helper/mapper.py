@@ -12,32 +12,77 @@
 __copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
 __license__ = None
 
+import os
+import logging
+import itertools
+import numpy as np
 import pandas as pd
-from typing import NoReturn, List, Dict
-from conversion import Transaction
-from pipeline import (
-    to_data,
-    to_amount,
-    to_remark,
-    to_status,
-    to_description,
-    to_currency,
+from typing import NoReturn, List, Dict, Union, Tuple, Iterator, Iterable
+from rule import RuleIndex
+from rule_lint import RuleIssue, format_issue, lint_rules
+from rule_cache import RuleCache
+from rule_stats import RuleStats
+from id_index import TransactionIdIndex
+from conversion import Transaction, TransactionBatch
+from pipeline import compile_pipeline
+from profiler import PROFILER
+from intermediate import MappedFileWriter, iter_frames, read_columns
+
+_REQUIRED_KEYS = (
+    "date",
+    "status",
+    "description",
+    "amount",
+    "currency",
+    "remark",
+    "debit",
+    "credit",
 )
 
+# 收/支 列写入交易的 direction 字段，跨数据源查重时区分付款和退款
+_DIRECTION_COLUMN = "收/支"
+
+# 规则文件的工作表及其匹配类型
+_SHEETS = (("Expenses", "expenses"), ("Assets", "assets"))
+
+
+def _valid_rules(rules) -> bool:
+    """缓存中的规则应为结构完整的费用和资产规则索引。"""
+    return (
+        isinstance(rules, tuple)
+        and len(rules) == len(_SHEETS)
+        and all(RuleIndex.is_valid(rule_index) for rule_index in rules)
+    )
+
 
 class AccountMapper:
     def __init__(
         self,
         target_file: str,
         map: dict,
-        output_file: str,
+        output_file: Union[str, List[str]],
+        cache_dir: str = None,
+        compiled_rules: Tuple[RuleIndex, RuleIndex] = None,
+        encoding: str = "utf8",
+        skiprows: int = 16,
+        log_obj: logging.Logger = None,
+        stats_dir: str = None,
     ) -> NoReturn:
         """初始化 TransactionMapper 类。
 
         Args:
             target_file (str): 目标文件路径（CSV）。
             map (dict): 映射规则字典。
-            output_file (str): 输出文件路径（CSV）。
+            output_file (Union[str, List[str]]): 映射结果的输出文件路径，按扩展名写为 Feather
+                或 CSV，可以指定多个。
+            cache_dir (str): 已编译规则的缓存目录，为 None 时不使用缓存。
+            compiled_rules (Tuple[RuleIndex, RuleIndex]): 已编译的规则，指定后不再读取规则文件，
+                用于多个文件共用同一份规则。
+            encoding (str): 目标文件编码，通常由 tool.sniff_bill 识别。
+            skiprows (int): 表头行之前需要跳过的行数，通常由 tool.sniff_bill 识别。
+            log_obj (logging.Logger): 日志对象，用于报告规则检查发现的问题。
+            stats_dir (str): 规则命中统计目录，指定后按历史命中次数调整规则的查询顺序，
+                并在映射完成后记录本次的命中次数。
         Returns:
 
             NoReturn
@@ -46,6 +91,49 @@ class AccountMapper:
         self.mapping_file = map["mapping_file"]
         self.output_file = output_file
         self.match_columns = map["match_columns"]
+        self.rule_cache = RuleCache(cache_dir) if cache_dir else None
+        self.compiled_rules = compiled_rules
+        self.encoding = encoding
+        self.skiprows = skiprows
+        self.log_obj = log_obj
+        self.rule_stats = RuleStats(stats_dir, self.mapping_file) if stats_dir else None
+        self.hits: Dict[str, np.ndarray] = {}
+
+    @staticmethod
+    def bill_columns(map: dict) -> List[str]:
+        """账单中必有的列（匹配列、收/支列和管道输入列），用于识别账单的数据源和表头行。
+
+        Args:
+            map (dict): 映射规则字典。
+
+        Returns:
+            List[str]: 列名列表。
+        """
+        columns = [
+            *map["match_columns"]["expenses"]["columns"],
+            *map["match_columns"]["assets"]["columns"],
+            "收/支",
+            *compile_pipeline(map["pipeline"]).input_columns,
+        ]
+        return list(dict.fromkeys(columns))
+
+    def read_target(
+        self, chunksize: int = None
+    ) -> Union[pd.DataFrame, Iterator[pd.DataFrame]]:
+        """按识别出的编码和表头位置读取目标文件。
+
+        Args:
+            chunksize (int): 每块的行数，指定后返回分块读取器。
+
+        Returns:
+            Union[pd.DataFrame, Iterator[pd.DataFrame]]: 整表，或分块读取器。
+        """
+        return pd.read_csv(
+            self.target_file,
+            skiprows=self.skiprows,
+            encoding=self.encoding,
+            chunksize=chunksize,
+        )
 
     def generate_mask(
         self, mapping_row: pd.Series, transaction: pd.Series, columns: list
@@ -66,14 +154,63 @@ class AccountMapper:
                 conditions.append(mapping_row[col] == transaction[col])
         return all(conditions) if conditions else False
 
+    def compile_rules(
+        self, mapping_table: pd.DataFrame, mapping_type: str
+    ) -> RuleIndex:
+        """将映射表编译为规则索引。
+
+        Args:
+            mapping_table (pd.DataFrame): 映射表。
+            mapping_type (str): 匹配类型（如 "expenses" 或 "assets"）。
+
+        Returns:
+            RuleIndex: 规则索引。资产只按第一列匹配，与原有逻辑一致。
+        """
+        return RuleIndex(mapping_table, *self.rule_columns(mapping_type))
+
+    def rule_columns(self, mapping_type: str) -> Tuple[List[str], List[str]]:
+        """获取规则的匹配列和支持模式匹配的列。
+
+        Args:
+            mapping_type (str): 匹配类型（如 "expenses" 或 "assets"）。
+
+        Returns:
+            Tuple[List[str], List[str]]: 匹配列和模式匹配列。资产只按第一列匹配。
+        """
+        match_info = self.match_columns.get(mapping_type, {})
+        match_columns = match_info.get("columns", [])
+        if mapping_type == "assets":
+            match_columns = match_columns[:1]
+        return match_columns, match_info.get("pattern_columns", [])
+
+    def lint_rules(self, sheets: Dict[str, pd.DataFrame]) -> List[RuleIssue]:
+        """检查两个规则表中重复、矛盾和被遮蔽的规则。
+
+        Args:
+            sheets (Dict[str, pd.DataFrame]): Expenses 和 Assets 两个映射表。
+
+        Returns:
+            List[RuleIssue]: 发现的问题。
+        """
+        issues = []
+        for sheet, mapping_type in _SHEETS:
+            issues.extend(
+                lint_rules(sheets[sheet], *self.rule_columns(mapping_type), sheet)
+            )
+        return issues
+
     def map_generic(
-        self, transaction: pd.Series, mapping_table: pd.DataFrame, mapping_type: str
+        self,
+        transaction: pd.Series,
+        mapping_table: Union[pd.DataFrame, RuleIndex],
+        mapping_type: str,
     ) -> tuple:
         """通用匹配方法，用于匹配费用或资产信息。
 
         Args:
             transaction (pd.Series): 交易数据。
-            mapping_table (pd.DataFrame): 映射表。
+            mapping_table (Union[pd.DataFrame, RuleIndex]): 映射表或已编译的规则索引，
+                传入映射表时每次调用都会重新编译。
             mapping_type (str): 匹配类型（如 "expenses" 或 "assets"）。
 
         Returns:
@@ -89,81 +226,494 @@ class AccountMapper:
         if not match_columns or default_value is None:
             return (None, None)
 
-        if mapping_type == "assets":
-            mask = mapping_table[match_columns[0]] == transaction[match_columns[0]]
-            matching_rows = mapping_table[mask]
-            if not matching_rows.empty:
-                return matching_rows.iloc[0]["编号"], matching_rows.iloc[0]["值"]
-
-        elif mapping_type == "expenses":
-            for _, mapping_row in mapping_table.iterrows():
-                if self.generate_mask(mapping_row, transaction, match_columns):
-                    return mapping_row["编号"], mapping_row["值"]
+        if mapping_type not in ("assets", "expenses"):
+            return default_value
+
+        if isinstance(mapping_table, pd.DataFrame):
+            mapping_table = self.compile_rules(mapping_table, mapping_type)
+
+        evaluations = mapping_table.evaluations
+        position = mapping_table.find(transaction)
+        self.hits.setdefault(mapping_type, np.zeros(len(mapping_table), np.int64))
+        if position is not None:
+            self.hits[mapping_type][position] += 1
+        if PROFILER.enabled:
+            self._count_matches(
+                mapping_type,
+                mapping_table.evaluations - evaluations,
+                int(position is not None),
+                1,
+            )
+        if position is not None:
+            return mapping_table.ids[position], mapping_table.values[position]
 
         return default_value
 
-    def process_transactions(self) -> NoReturn:
+    @staticmethod
+    def _count_matches(
+        mapping_type: str, evaluations: int, matches: int, total: int
+    ) -> None:
+        """记录规则查找次数、命中数和使用默认值（如 Expenses:Node）的行数。"""
+        PROFILER.count("rule_evaluations", evaluations)
+        PROFILER.count("rule_matches", matches)
+        PROFILER.count(f"{mapping_type}_default_fallbacks", total - matches)
+
+    def map_frame_generic(
+        self, target_df: pd.DataFrame, rule_index: RuleIndex, mapping_type: str
+    ) -> tuple:
+        """通用批量匹配方法，map_generic 的列式版本。
+
+        Args:
+            target_df (pd.DataFrame): 交易数据表。
+            rule_index (RuleIndex): 已编译的规则索引。
+            mapping_type (str): 匹配类型（如 "expenses" 或 "assets"）。
+
+        Returns:
+            tuple: 编号数组和值数组，未匹配的行取默认值。
+        """
+        match_info = self.match_columns.get(mapping_type, {})
+        match_columns = match_info.get("columns", [])
+        default_value = match_info.get("default", None)
+
+        if isinstance(default_value, str):
+            default_value = (None, default_value)
+
+        if not match_columns or default_value is None:
+            default_value = (None, None)
+            positions = np.full(len(target_df), len(rule_index), dtype=np.int64)
+        elif mapping_type not in ("assets", "expenses"):
+            positions = np.full(len(target_df), len(rule_index), dtype=np.int64)
+        else:
+            evaluations = rule_index.evaluations
+            positions = rule_index.find_frame(target_df)
+            evaluations = rule_index.evaluations - evaluations
+
+        counts = np.bincount(positions, minlength=len(rule_index) + 1)
+        hits = self.hits.get(mapping_type)
+        self.hits[mapping_type] = counts[:-1] if hits is None else hits + counts[:-1]
+
+        if PROFILER.enabled:
+            self._count_matches(
+                mapping_type,
+                evaluations if mapping_type in ("assets", "expenses") else 0,
+                int(np.count_nonzero(positions < len(rule_index))),
+                len(target_df),
+            )
+        return rule_index.take(positions, default_value)
+
+    def map_frame(
+        self,
+        target_df: pd.DataFrame,
+        expenses_mapping: RuleIndex,
+        assets_mapping: RuleIndex,
+    ) -> pd.DataFrame:
+        """批量映射交易数据，结果与逐行映射一致。
+
+        Args:
+            target_df (pd.DataFrame): 交易数据表。
+            expenses_mapping (RuleIndex): 费用规则索引。
+            assets_mapping (RuleIndex): 资产规则索引。
+
+        Returns:
+            pd.DataFrame: 追加了 debit_id、debit、credit_id、credit 列的交易数据表。
+        """
+        PROFILER.count("rows_read", len(target_df))
+        with PROFILER.stage("account_map"):
+            debit_id, debit = self.map_frame_generic(
+                target_df, expenses_mapping, "expenses"
+            )
+            credit_id, credit = self.map_frame_generic(
+                target_df, assets_mapping, "assets"
+            )
+
+            income = (target_df["收/支"] == "收入").to_numpy()
+            target_df["debit_id"] = np.where(income, credit_id, debit_id)
+            target_df["debit"] = np.where(income, credit, debit)
+            target_df["credit_id"] = np.where(income, debit_id, credit_id)
+            target_df["credit"] = np.where(income, debit, credit)
+        return target_df
+
+    def load_rules(self) -> Tuple[RuleIndex, RuleIndex]:
+        """读取并编译映射规则文件，规则文件未变化时直接使用缓存。
+
+        Returns:
+            Tuple[RuleIndex, RuleIndex]: 费用规则索引和资产规则索引。
+        """
+        with PROFILER.stage("rule_load"):
+            rules = self._load_rules()
+        if self.rule_stats and self.compiled_rules is None:
+            for (sheet, _), rule_index in zip(_SHEETS, rules):
+                rule_index.reorder(self.rule_stats.hits(sheet, rule_index.ids))
+        return rules
+
+    def save_rule_stats(
+        self, rules: Tuple[RuleIndex, RuleIndex], imports: int = 1
+    ) -> NoReturn:
+        """将本次映射累计的规则命中次数写入统计文件，未启用统计时不做任何事。
+
+        Args:
+            rules (Tuple[RuleIndex, RuleIndex]): 映射时使用的费用和资产规则索引。
+            imports (int): 本次映射的账单数量。
+        """
+        if not self.rule_stats:
+            return
+        hits = {}
+        for (sheet, mapping_type), rule_index in zip(_SHEETS, rules):
+            counts = self.hits.get(mapping_type, np.zeros(len(rule_index), np.int64))
+            sheet_hits = hits[sheet] = {}
+            for rule_id, count in zip(rule_index.ids, counts):
+                if pd.notna(rule_id):
+                    sheet_hits[rule_id] = sheet_hits.get(rule_id, 0) + int(count)
+        self.rule_stats.record(hits, imports)
+        self.hits = {}
+
+    def _load_rules(self) -> Tuple[RuleIndex, RuleIndex]:
+        """load_rules 的实现。"""
+        if self.compiled_rules is not None:
+            return self.compiled_rules
+
+        if self.rule_cache:
+            rules = self.rule_cache.load(
+                self.mapping_file, self.match_columns, _valid_rules
+            )
+            if rules is not None:
+                return rules
+
+        sheets = pd.read_excel(self.mapping_file, sheet_name=["Expenses", "Assets"])
+        rules = (
+            self.compile_rules(sheets["Expenses"], "expenses"),
+            self.compile_rules(sheets["Assets"], "assets"),
+        )
+
+        # 规则文件变化后才会走到这里，顺带检查规则
+        with PROFILER.stage("rule_lint"):
+            issues = self.lint_rules(sheets)
+        if issues and self.log_obj:
+            self.log_obj.warning(
+                f"规则检查发现 {len(issues)} 个问题: {self.mapping_file}"
+            )
+            for issue in issues:
+                self.log_obj.warning(format_issue(issue))
+
+        if self.rule_cache:
+            self.rule_cache.save(
+                self.mapping_file, self.match_columns, rules, len(issues)
+            )
+        return rules
+
+    def iter_target(self, chunksize: int = None) -> Iterator[pd.DataFrame]:
+        """分块读取目标文件，表头行由 read_csv 的 skiprows 统一跳过，不受分块边界影响。
+
+        Args:
+            chunksize (int): 每块的行数，为 None 时整个文件作为一块。
+
+        Yields:
+            pd.DataFrame: 未映射的交易数据块。
+        """
+        if not chunksize:
+            with PROFILER.stage("bill_read"):
+                target_df = self.read_target()
+            yield target_df
+            return
+
+        with self.read_target(chunksize) as reader:
+            while True:
+                with PROFILER.stage("bill_read"):
+                    chunk = next(reader, None)
+                if chunk is None:
+                    return
+                yield chunk
+
+    def iter_mapped_chunks(
+        self, chunksize: int = None, rules: Tuple[RuleIndex, RuleIndex] = None
+    ) -> Iterator[pd.DataFrame]:
+        """分块读取并映射交易数据，内存占用只与块大小有关。
+
+        命中次数累计在 hits 中，不写入统计文件；调用方在结果写入成功后
+        调用 save_rule_stats，被拒绝或重试的导入不计入。
+
+        Args:
+            chunksize (int): 每块的行数，为 None 时整个文件作为一块。
+            rules (Tuple[RuleIndex, RuleIndex]): 已加载的费用和资产规则索引，
+                为 None 时加载。
+
+        Yields:
+            pd.DataFrame: 映射后的交易数据块。
+        """
+        expenses_mapping, assets_mapping = rules or self.load_rules()
+        for chunk in self.iter_target(chunksize):
+            yield self.map_frame(chunk, expenses_mapping, assets_mapping)
+
+    def open_output(self) -> MappedFileWriter:
+        """打开输出文件，用于按块写入映射结果。
+
+        Returns:
+            MappedFileWriter: 写入器，写完后需关闭。
+        """
+        output_file = self.output_file
+        if isinstance(output_file, (str, os.PathLike)):
+            output_file = [output_file]
+        return MappedFileWriter(output_file)
+
+    def write_chunks(self, chunks: Iterable[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+        """将映射后的数据块依次写入输出文件，并原样返回数据块。
+
+        Args:
+            chunks (Iterable[pd.DataFrame]): 映射后的交易数据块。
+
+        Yields:
+            pd.DataFrame: 已写入的交易数据块。
+        """
+        with self.open_output() as writer:
+            for chunk in chunks:
+                with PROFILER.stage("mapped_write"):
+                    writer.write(chunk)
+                yield chunk
+
+    def process_transactions(
+        self, vectorized: bool = True, chunksize: int = None
+    ) -> NoReturn:
         """处理交易数据并保存结果。
 
+        Args:
+            vectorized (bool): 是否使用列式批量映射，为 False 时逐行映射。
+            chunksize (int): 分块读取的行数，指定后按块映射并追加写入（总是列式映射）。
+
         Returns:
             NoReturn
         """
-        target_df = pd.read_csv(self.target_file, skiprows=16, encoding="utf8")
-
-        expenses_mapping = pd.read_excel(self.mapping_file, sheet_name="Expenses")
-        assets_mapping = pd.read_excel(self.mapping_file, sheet_name="Assets")
+        if vectorized or chunksize:
+            rules = self.load_rules()
+            for _ in self.write_chunks(self.iter_mapped_chunks(chunksize, rules)):
+                pass
+            # 只映射不写入账本时，映射结果写入完成即记录命中次数
+            self.save_rule_stats(rules)
+            return
+
+        with PROFILER.stage("bill_read"):
+            target_df = self.read_target()
+        expenses_mapping, assets_mapping = self.load_rules()
+        PROFILER.count("rows_read", len(target_df))
 
         target_df["debit_id"] = None
         target_df["debit"] = None
         target_df["credit_id"] = None
         target_df["credit"] = None
 
-        for index, transaction in target_df.iterrows():
+        with PROFILER.stage("account_map"):
+            for index, transaction in target_df.iterrows():
 
-            debit_id, debit = self.map_generic(
-                transaction, expenses_mapping, "expenses"
-            )
-            credit_id, credit = self.map_generic(transaction, assets_mapping, "assets")
+                debit_id, debit = self.map_generic(
+                    transaction, expenses_mapping, "expenses"
+                )
+                credit_id, credit = self.map_generic(
+                    transaction, assets_mapping, "assets"
+                )
 
-            if target_df.loc[index, "收/支"] == "收入":
-                target_df.loc[index, ["debit_id", "debit"]] = [credit_id, credit]
-                target_df.loc[index, ["credit_id", "credit"]] = [debit_id, debit]
-                target_df.to_csv(self.output_file, index=False, encoding="gb18030")
-                continue
+                if target_df.loc[index, "收/支"] == "收入":
+                    target_df.loc[index, ["debit_id", "debit"]] = [credit_id, credit]
+                    target_df.loc[index, ["credit_id", "credit"]] = [debit_id, debit]
+                    continue
+
+                target_df.loc[index, ["debit_id", "debit"]] = [debit_id, debit]
+                target_df.loc[index, ["credit_id", "credit"]] = [credit_id, credit]
 
-            target_df.loc[index, ["debit_id", "debit"]] = [debit_id, debit]
-            target_df.loc[index, ["credit_id", "credit"]] = [credit_id, credit]
-            target_df.to_csv(self.output_file, index=False, encoding="gb18030")
+        with PROFILER.stage("mapped_write"), self.open_output() as writer:
+            writer.write(target_df)
+        self.save_rule_stats((expenses_mapping, assets_mapping))
 
 
 class BeancountMapper:
     """Beancount 映射器，用于将目标表数据映射为 Transaction 对象"""
 
-    def __init__(self, target_file: str) -> NoReturn:
+    def __init__(
+        self,
+        target_file: Union[str, pd.DataFrame, Iterable[pd.DataFrame]],
+        pipeline: List[Dict],
+        chunksize: int = None,
+        id_index: TransactionIdIndex = None,
+        source: str = None,
+    ) -> NoReturn:
         """
         初始化 BeancountMapper。
 
         Args:
-            rule (dict): 匹配规则。
+            target_file (Union[str, pd.DataFrame, Iterable[pd.DataFrame]]): 映射后的文件路径
+                （Feather 或 CSV），也可以直接传入 AccountMapper 映射后的 DataFrame 或数据块迭代器，省去临时文件。
+            pipeline (List[Dict]): 数据源的管道定义（配置中的 pipeline）。
+            chunksize (int): 分块读取的行数，指定后不会一次性读入整个文件。
+            id_index (TransactionIdIndex): 已导入交易单号索引，指定后跳过已导入的交易
+                以及本次文件中重复的交易单号。
+            source (str): 数据源，记录在生成的交易批次上，用于跨数据源查找重复交易。
+
+        Raises:
+            ValueError: 目标文件缺少管道所需的列时抛出。
         """
-        self.df = pd.read_csv(target_file, encoding="gb18030")
+        self.target_file = target_file
+        self.chunksize = chunksize
+        self.id_index = id_index
+        self.source = source
+        self._seen_ids = set()
+        self.plan = compile_pipeline(pipeline, _REQUIRED_KEYS)
+
+        self._frames = None
+        if isinstance(target_file, pd.DataFrame):
+            self.df = target_file
+            columns = self.df.columns
+        elif not isinstance(target_file, (str, os.PathLike)):
+            self.df = None
+            frames = iter(target_file)
+            first = next(frames, None)
+            if first is None:
+                self._frames = iter(())
+                return
+            self._frames = itertools.chain([first], frames)
+            columns = first.columns
+        elif chunksize:
+            self.df = None
+            columns = read_columns(target_file)
+        else:
+            with PROFILER.stage("mapped_read"):
+                self.df = next(iter_frames(target_file))
+            columns = self.df.columns
+        self.plan.check_columns(columns)
+
+    @staticmethod
+    def detect_source(target_file: str, rules: Dict[str, Dict]) -> str:
+        """
+        根据映射后文件的列名判断数据源。
+
+        Args:
+            target_file (str): 映射后的文件路径（Feather 或 CSV）。
+            rules (Dict[str, Dict]): 全部数据源的规则配置。
+
+        Returns:
+            str: 第一个所需列齐全的数据源，没有则返回 None。
+        """
+        columns = read_columns(target_file)
+        for source, rule in rules.items():
+            try:
+                compile_pipeline(rule["pipeline"], _REQUIRED_KEYS).check_columns(
+                    columns
+                )
+            except ValueError:
+                continue
+            return source
+        return None
+
+    def iter_frames(self) -> Iterator[pd.DataFrame]:
+        """
+        按块返回目标表数据，未分块时只返回整表。
+
+        Yields:
+            pd.DataFrame: 目标表数据块。
+        """
+        if self.df is not None:
+            yield self.df
+            return
+
+        if self._frames is not None:
+            yield from self._frames
+            return
+
+        frames = iter_frames(self.target_file, self.chunksize)
+        while True:
+            with PROFILER.stage("mapped_read"):
+                frame = next(frames, None)
+            if frame is None:
+                return
+            yield frame
+
+    def iter_transactions(self, vectorized: bool = True) -> Iterator[Transaction]:
+        """
+        逐个生成 Transaction 对象，配合分块读取时内存占用与文件大小无关。
+
+        Args:
+            vectorized (bool): 是否按列批量转换，为 False 时逐行执行管道。
+
+        Yields:
+            Transaction: 映射后的 Transaction 对象。
+        """
+        for frame in self.iter_frames():
+            if vectorized:
+                yield from self.map_batch(frame)
+                continue
+
+            for _, row in frame.iterrows():
+                transaction = self._map_row_to_transaction(row)
+                if transaction:
+                    yield Transaction.from_dict(transaction)
+                else:
+                    PROFILER.count("rows_dropped")
+
+    def iter_batches(self) -> Iterator[TransactionBatch]:
+        """
+        按块生成交易批次，每个数据块对应一个批次。
+
+        Yields:
+            TransactionBatch: 交易批次。
+        """
+        for frame in self.iter_frames():
+            yield self.map_batch(frame)
+
+    def map_to_batch(self) -> TransactionBatch:
+        """
+        将全部数据映射为一个交易批次。
+
+        Returns:
+            TransactionBatch: 交易批次。
+        """
+        batches = list(self.iter_batches())
+        if len(batches) == 1:
+            return batches[0]
+        return TransactionBatch.from_transactions(
+            itertools.chain.from_iterable(batches), self.source
+        )
 
     def map_to_transactions(self) -> List[Transaction]:
         """
         将 DataFrame 中的数据映射为 Transaction 字典列表。
 
+        会一次性创建全部交易对象，写入账本时应直接传入 iter_transactions() 或 iter_batches()。
+
+        Returns:
+            List[Transaction]: 映射后的 Transaction 列表。
+        """
+        return list(self.iter_transactions())
+
+    def map_batch(self, frame: pd.DataFrame) -> TransactionBatch:
+        """
+        按列批量执行管道，将整块数据映射为交易批次。
+
         Args:
-            df (pd.DataFrame): 输入的目标表数据。
+            frame (pd.DataFrame): 目标表数据块。
 
         Returns:
-            List[Dict]: 映射后的 Transaction 字典列表。
+            TransactionBatch: 交易批次。
+        """
+        with PROFILER.stage("beancount_map"):
+            data = self.plan.apply(frame.copy(deep=False))
+            if _DIRECTION_COLUMN in data:
+                data["direction"] = data[_DIRECTION_COLUMN]
+            if self.id_index is not None and "index" in data:
+                data = data[[self._is_new(index) for index in data["index"]]]
+                PROFILER.count("rows_dropped", len(frame) - len(data))
+            return TransactionBatch.from_frame(data, self.source)
+
+    def _is_new(self, index: str) -> bool:
         """
-        transactions = []
-        for _, row in self.df.iterrows():
-            transaction = self._map_row_to_transaction(row)
-            if transaction:
-                transactions.append(Transaction.from_dict(transaction))
-        return transactions
+        判断交易单号是否未导入过，并记录本次已出现的交易单号。
+
+        Args:
+            index (str): 交易单号，为空时视为新交易。
+
+        Returns:
+            bool: 未导入过返回 True。
+        """
+        if not index or index in self.id_index or index in self._seen_ids:
+            return not index
+        self._seen_ids.add(index)
+        return True
 
     def _map_row_to_transaction(self, row: pd.Series) -> Dict:
         """
@@ -173,33 +723,12 @@ class BeancountMapper:
             row (pd.Series): 单行数据。
 
         Returns:
-            Dict: 映射后的 Transaction 字典。
+            Dict: 映射后的 Transaction 字典，交易已导入过时返回 None。
         """
-        pipelines = [
-            to_data("交易时间", "%Y-%m-%d %H:%M:%S"),
-            to_amount("金额(元)"),
-            to_remark(["备注", "交易单号"], "wechat"),
-            to_status("*"),
-            to_description("交易对方"),
-            to_currency("CNY"),
-        ]
-
-        data = row.to_dict()
-        for func in pipelines:
-            data = func(data)
-
-        if not all(
-            key in data
-            for key in [
-                "date",
-                "status",
-                "description",
-                "amount",
-                "currency",
-                "remark",
-                "debit",
-                "credit",
-            ]
-        ):
+        data = self.plan(row.to_dict())
+        if _DIRECTION_COLUMN in data:
+            data["direction"] = data[_DIRECTION_COLUMN]
+        data["source"] = self.source
+        if self.id_index is not None and not self._is_new(data.get("index")):
             return None
         return data
@@ -12,17 +12,24 @@
 __copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
 __license__ = None
 
+import calendar
+import numpy as np
+import pandas as pd
+from decimal import Decimal
 from datetime import datetime
-from typing import Callable, Dict
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Tuple
 
 PipeFunc = Callable[[Dict], Dict]
+BatchPipeFunc = Callable[[pd.DataFrame], pd.DataFrame]
 
 
 def to_data(date_str_key: str, date_format: str) -> PipeFunc:
     """
     日期转换管道处理函数。
 
-    将字典中的日期字符串转换为指定格式的日期对象。
+    将字典中的日期字符串转换为指定格式的日期对象，同时以 Unix 秒记录交易时间
+    （按账单中的本地时间计算，不做时区换算），供跨数据源查找重复交易。
 
     Args:
         date_str_key (str): 包含日期字符串的键。
@@ -36,6 +43,7 @@ def to_data(date_str_key: str, date_format: str) -> PipeFunc:
         date_str = data[date_str_key]
         date_time_obj = datetime.strptime(date_str, date_format)
         data["date"] = date_time_obj.strftime("%Y-%m-%d")
+        data["time"] = calendar.timegm(date_time_obj.timetuple())
         return data
 
     return _to_data
@@ -45,7 +53,7 @@ def to_amount(amount_key: str) -> PipeFunc:
     """
     金额转换管道处理函数。
 
-    将字典中的金额字符串转换为浮点数。
+    将字典中的金额字符串转换为精确的 Decimal，避免浮点误差。
 
     Args:
         amount_key (str): 包含金额字符串的键。
@@ -57,7 +65,7 @@ def to_amount(amount_key: str) -> PipeFunc:
     def _to_amount(data: Dict) -> Dict:
         amount_str = data[amount_key]
         amount_str = "".join(filter(lambda x: x.isdigit() or x == ".", amount_str))
-        data["amount"] = float(amount_str)
+        data["amount"] = Decimal(amount_str)
         return data
 
     return _to_amount
@@ -150,3 +158,365 @@ def to_currency(currency_value: str) -> PipeFunc:
         return data
 
     return _to_currency
+
+
+def to_index(index_key: str) -> PipeFunc:
+    """
+    交易单号转换管道处理函数。
+
+    将交易单号去除首尾空白后写入 index，用于识别已导入的交易；
+    交易单号为空或 "/" 时写入 None。
+
+    Args:
+        index_key (str): 包含交易单号的键。
+
+    Returns:
+        PipeFunc: 转换函数，接收一个字典并返回更新后的字典。
+    """
+
+    def _to_index(data: Dict) -> Dict:
+        value = data[index_key]
+        index = None if pd.isna(value) else str(value).strip()
+        data["index"] = index if index not in ("", "/") else None
+        return data
+
+    return _to_index
+
+
+def to_data_batch(date_str_key: str, date_format: str) -> BatchPipeFunc:
+    """
+    日期转换管道处理函数（列式批量版本）。
+
+    与 to_data 等价，一次性解析整列日期字符串。
+
+    Args:
+        date_str_key (str): 包含日期字符串的列名。
+        date_format (str): 日期字符串的格式（例如 '%Y-%m-%d'）。
+
+    Returns:
+        BatchPipeFunc: 转换函数，接收一个 DataFrame 并返回更新后的 DataFrame。
+    """
+
+    def _to_data(frame: pd.DataFrame) -> pd.DataFrame:
+        date_time = pd.to_datetime(frame[date_str_key], format=date_format)
+        frame["date"] = date_time.dt.strftime("%Y-%m-%d")
+        frame["time"] = date_time.astype("datetime64[s]").astype("int64")
+        return frame
+
+    return _to_data
+
+
+def to_amount_batch(amount_key: str) -> BatchPipeFunc:
+    """
+    金额转换管道处理函数（列式批量版本）。
+
+    与 to_amount 等价，用正则表达式一次性去除整列中数字和小数点以外的字符，
+    结果为 Decimal 列。
+
+    Args:
+        amount_key (str): 包含金额字符串的列名。
+
+    Returns:
+        BatchPipeFunc: 转换函数，接收一个 DataFrame 并返回更新后的 DataFrame。
+    """
+
+    def _to_amount(frame: pd.DataFrame) -> pd.DataFrame:
+        amount_str = frame[amount_key].astype(str).str.replace(
+            r"[^\d.]", "", regex=True
+        )
+        frame["amount"] = amount_str.map(Decimal)
+        return frame
+
+    return _to_amount
+
+
+def to_remark_batch(remark_keys: list, source: str) -> BatchPipeFunc:
+    """
+    备注转换管道处理函数（列式批量版本）。
+
+    与 to_remark 等价，逐列拼接备注，值为 "/" 的字段被跳过。
+
+    Args:
+        remark_keys (list): 包含备注字段的列名列表。
+        source (str): 数据来源的标识。
+
+    Returns:
+        BatchPipeFunc: 转换函数，接收一个 DataFrame 并返回更新后的 DataFrame。
+    """
+
+    def _part(column: pd.Series, as_str: bool) -> pd.Series:
+        part = column.astype(str) if as_str else column
+        return part.str.strip().where(column != "/")
+
+    def _to_remark(frame: pd.DataFrame) -> pd.DataFrame:
+        parts = [
+            _part(frame[key], as_str=True) for key in remark_keys if key in frame
+        ]
+        if "remark" in frame:
+            parts.insert(0, _part(frame["remark"], as_str=False))
+
+        remark = np.full(len(frame), "", dtype=object)
+        present = np.zeros(len(frame), dtype=bool)
+        for part in parts:
+            keep = part.notna().to_numpy()
+            text = np.where(keep, part.to_numpy(dtype=object), "")
+            remark = remark + np.where(present & keep, " | ", "") + text
+            present |= keep
+
+        frame["remark"] = remark + np.where(present, " | ", "") + source
+        return frame
+
+    return _to_remark
+
+
+def to_status_batch(status_value: str) -> BatchPipeFunc:
+    """
+    状态转换管道处理函数（列式批量版本）。
+
+    Args:
+        status_value (str): 状态值。
+
+    Returns:
+        BatchPipeFunc: 转换函数，接收一个 DataFrame 并返回更新后的 DataFrame。
+    """
+
+    def _to_status(frame: pd.DataFrame) -> pd.DataFrame:
+        frame["status"] = status_value
+        return frame
+
+    return _to_status
+
+
+def to_description_batch(description_key: str) -> BatchPipeFunc:
+    """
+    描述转换管道处理函数（列式批量版本）。
+
+    Args:
+        description_key (str): 包含描述字段的列名。
+
+    Returns:
+        BatchPipeFunc: 转换函数，接收一个 DataFrame 并返回更新后的 DataFrame。
+    """
+
+    def _to_description(frame: pd.DataFrame) -> pd.DataFrame:
+        frame["description"] = frame[description_key]
+        return frame
+
+    return _to_description
+
+
+def to_currency_batch(currency_value: str) -> BatchPipeFunc:
+    """
+    货币转换管道处理函数（列式批量版本）。
+
+    Args:
+        currency_value (str): 货币值。
+
+    Returns:
+        BatchPipeFunc: 转换函数，接收一个 DataFrame 并返回更新后的 DataFrame。
+    """
+
+    def _to_currency(frame: pd.DataFrame) -> pd.DataFrame:
+        frame["currency"] = currency_value
+        return frame
+
+    return _to_currency
+
+
+def to_index_batch(index_key: str) -> BatchPipeFunc:
+    """
+    交易单号转换管道处理函数（列式批量版本）。
+
+    Args:
+        index_key (str): 包含交易单号的列名。
+
+    Returns:
+        BatchPipeFunc: 转换函数，接收一个 DataFrame 并返回更新后的 DataFrame。
+    """
+
+    def _to_index(frame: pd.DataFrame) -> pd.DataFrame:
+        column = frame[index_key]
+        index = column.astype(str).str.strip()
+        valid = column.notna() & ~index.isin(["", "/"])
+        frame["index"] = np.where(valid, index, None)
+        return frame
+
+    return _to_index
+
+
+def to_constants(constants: Dict) -> PipeFunc:
+    """
+    常量设置管道处理函数。
+
+    一次性写入多个常量字段，由 compile_pipeline 合并相邻的常量步骤得到。
+
+    Args:
+        constants (Dict): 字段名到常量值的映射。
+
+    Returns:
+        PipeFunc: 转换函数，接收一个字典并返回更新后的字典。
+    """
+
+    def _to_constants(data: Dict) -> Dict:
+        data.update(constants)
+        return data
+
+    return _to_constants
+
+
+def to_constants_batch(constants: Dict) -> BatchPipeFunc:
+    """
+    常量设置管道处理函数（列式批量版本）。
+
+    Args:
+        constants (Dict): 字段名到常量值的映射。
+
+    Returns:
+        BatchPipeFunc: 转换函数，接收一个 DataFrame 并返回更新后的 DataFrame。
+    """
+
+    def _to_constants(frame: pd.DataFrame) -> pd.DataFrame:
+        for key, value in constants.items():
+            frame[key] = value
+        return frame
+
+    return _to_constants
+
+
+@dataclass(frozen=True)
+class PipeStep:
+    """管道步骤描述"""
+
+    func: Callable[..., PipeFunc]
+    batch_func: Callable[..., BatchPipeFunc]
+    output: str
+    inputs: Callable[..., List[str]] = None
+    constant: bool = False
+
+
+PIPE_STEPS: Dict[str, PipeStep] = {
+    "to_data": PipeStep(
+        to_data, to_data_batch, "date", lambda date_str_key, *_: [date_str_key]
+    ),
+    "to_amount": PipeStep(
+        to_amount, to_amount_batch, "amount", lambda amount_key: [amount_key]
+    ),
+    "to_remark": PipeStep(to_remark, to_remark_batch, "remark"),
+    "to_status": PipeStep(to_status, to_status_batch, "status", constant=True),
+    "to_description": PipeStep(
+        to_description,
+        to_description_batch,
+        "description",
+        lambda description_key: [description_key],
+    ),
+    "to_currency": PipeStep(to_currency, to_currency_batch, "currency", constant=True),
+    "to_index": PipeStep(
+        to_index, to_index_batch, "index", lambda index_key: [index_key]
+    ),
+}
+
+
+@dataclass(frozen=True)
+class PipelinePlan:
+    """编译后的管道
+
+    每个数据源只编译一次，逐行和按列两种执行方式共用同一份步骤列表。
+    """
+
+    funcs: Tuple[PipeFunc, ...]
+    batch_funcs: Tuple[BatchPipeFunc, ...]
+    input_columns: Tuple[str, ...]
+    output_keys: Tuple[str, ...]
+
+    def __call__(self, data: Dict) -> Dict:
+        for func in self.funcs:
+            data = func(data)
+        return data
+
+    def apply(self, frame: pd.DataFrame) -> pd.DataFrame:
+        """
+        按列执行管道。
+
+        Args:
+            frame (pd.DataFrame): 目标表数据。
+
+        Returns:
+            pd.DataFrame: 更新后的 DataFrame。
+        """
+        for func in self.batch_funcs:
+            frame = func(frame)
+        return frame
+
+    def check_columns(self, columns: Iterable[str]) -> None:
+        """
+        检查目标表是否包含管道所需的全部列。
+
+        Args:
+            columns (Iterable[str]): 目标表的列名。
+
+        Raises:
+            ValueError: 缺少所需列时抛出。
+        """
+        columns = set(columns)
+        missing = [column for column in self.input_columns if column not in columns]
+        if missing:
+            raise ValueError(f"目标文件缺少管道所需的列: {missing}")
+
+
+def compile_pipeline(
+    definition: List[Dict], required_keys: Iterable[str] = ()
+) -> PipelinePlan:
+    """
+    将声明式的管道定义编译为执行计划。
+
+    相邻的常量步骤（如 to_status、to_currency）会合并为一次写入。
+
+    Args:
+        definition (List[Dict]): 管道定义，每项形如 {"step": "to_data", "args": [...]}。
+        required_keys (Iterable[str]): 结果中必须存在的字段，
+            不由管道生成的字段视为目标表必须提供的列。
+
+    Returns:
+        PipelinePlan: 编译后的管道。
+
+    Raises:
+        ValueError: 步骤名未知时抛出。
+    """
+    funcs, batch_funcs = [], []
+    input_columns, output_keys = [], []
+    constants = {}
+
+    def _flush_constants():
+        if constants:
+            funcs.append(to_constants(dict(constants)))
+            batch_funcs.append(to_constants_batch(dict(constants)))
+            constants.clear()
+
+    for item in definition:
+        name, args = item["step"], item.get("args", [])
+        if name not in PIPE_STEPS:
+            raise ValueError(f"未知的管道步骤: {name}")
+
+        step = PIPE_STEPS[name]
+        output_keys.append(step.output)
+        if step.constant:
+            constants[step.output] = args[0]
+            continue
+
+        _flush_constants()
+        funcs.append(step.func(*args))
+        batch_funcs.append(step.batch_func(*args))
+        if step.inputs:
+            input_columns.extend(step.inputs(*args))
+    _flush_constants()
+
+    for key in required_keys:
+        if key not in output_keys:
+            input_columns.append(key)
+
+    return PipelinePlan(
+        funcs=tuple(funcs),
+        batch_funcs=tuple(batch_funcs),
+        input_columns=tuple(dict.fromkeys(input_columns)),
+        output_keys=tuple(output_keys),
+    )
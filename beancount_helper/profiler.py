@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : profiler.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/17 21:02
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 分阶段性能统计
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import time
+import threading
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+
+class Profiler:
+    """分阶段性能统计
+
+    记录每个阶段的累计耗时、进入次数和峰值内存（tracemalloc），以及各类计数器。
+    同一阶段多次进入（如分块处理）时耗时累加、峰值取最大；阶段可以嵌套
+    （如写入时才拉取上游生成器），seconds 包含内层阶段，self_seconds 不包含，
+    内层阶段的内存峰值同时计入外层阶段。各线程分别记录嵌套关系，可以在多个线程中
+    同时统计不同的阶段（如分阶段导入），此时各阶段的内存峰值是同一时段内全进程的峰值。
+
+    未启用时 stage 直接返回，count 不做任何事，也不会导入 tracemalloc；
+    调用方在逐行路径上还应先判断 enabled，避免计算计数本身的开销。
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.stages: Dict[str, Dict] = {}
+        self.counters: Dict[str, int] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._started = None
+
+    @property
+    def _stack(self) -> List[List]:
+        """当前线程正在统计的阶段，由外到内排列。"""
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def enable(self) -> None:
+        """开始统计，并启动 tracemalloc。"""
+        import tracemalloc
+
+        self.enabled = True
+        self._started = time.perf_counter()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self) -> None:
+        """停止统计，并停止 tracemalloc。"""
+        if not self.enabled:
+            return
+        import tracemalloc
+
+        self.enabled = False
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def reset(self) -> None:
+        """清空已记录的阶段和计数器。"""
+        self.stages = {}
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        统计代码块的耗时和峰值内存。
+
+        Args:
+            name (str): 阶段名称。
+        """
+        if not self.enabled:
+            yield
+            return
+
+        import tracemalloc
+
+        _, peak = tracemalloc.get_traced_memory()
+        for frame in self._stack:
+            frame[1] = max(frame[1], peak)
+        tracemalloc.reset_peak()
+        frame = [name, 0, 0.0]
+        self._stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stack.pop()
+            _, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, frame[1])
+            if self._stack:
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+                self._stack[-1][2] += elapsed
+            self._record(name, elapsed, elapsed - frame[2], 1, peak)
+
+    def _record(
+        self, name: str, seconds: float, self_seconds: float, calls: int, peak: int
+    ) -> None:
+        """累加一个阶段的统计结果。"""
+        with self._lock:
+            stat = self.stages.setdefault(
+                name,
+                {"seconds": 0.0, "self_seconds": 0.0, "calls": 0, "peak_bytes": 0},
+            )
+            stat["seconds"] += seconds
+            stat["self_seconds"] += self_seconds
+            stat["calls"] += calls
+            stat["peak_bytes"] = max(stat["peak_bytes"], peak)
+
+    def count(self, name: str, value: int = 1) -> None:
+        """
+        累加计数器。
+
+        Args:
+            name (str): 计数器名称。
+            value (int): 增量。
+        """
+        if self.enabled:
+            with self._lock:
+                self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def merge(self, report: Dict) -> None:
+        """
+        合并另一个统计结果（如工作进程返回的 report()）。
+
+        Args:
+            report (Dict): report() 的结果。
+        """
+        for name, stat in report.get("stages", {}).items():
+            self._record(
+                name,
+                stat["seconds"],
+                stat["self_seconds"],
+                stat["calls"],
+                stat["peak_bytes"],
+            )
+        for name, value in report.get("counters", {}).items():
+            self.count(name, value)
+
+    def report(self) -> Dict:
+        """
+        生成统计结果。
+
+        Returns:
+            Dict: 包含总耗时、各阶段统计和计数器的字典。
+        """
+        total = time.perf_counter() - self._started if self._started else 0.0
+        return {
+            "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "total_seconds": total,
+            "stages": self.stages,
+            "counters": self.counters,
+        }
+
+    def dump(self, file_path: Path) -> Path:
+        """
+        将统计结果写入 JSON 文件。
+
+        Args:
+            file_path (Path): 输出文件路径。
+
+        Returns:
+            Path: 输出文件路径。
+        """
+        import json
+
+        file_path = Path(file_path)
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(file_path, "w", encoding="utf-8") as file:
+            json.dump(self.report(), file, ensure_ascii=False, indent=2)
+        return file_path
+
+
+# 进程内共享的统计实例，由 main.py 的 --profile 启用
+PROFILER = Profiler()
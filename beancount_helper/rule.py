@@ -0,0 +1,634 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : rule.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/02 10:12
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 规则编译
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import re
+import itertools
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+_POSITION = "__rule_position__"
+
+# 匹配方式列的取值，空白为精确匹配
+MATCH_TYPES = {
+    "exact": "exact",
+    "精确": "exact",
+    "contains": "contains",
+    "包含": "contains",
+    "prefix": "prefix",
+    "前缀": "prefix",
+    "regex": "regex",
+    "正则": "regex",
+}
+
+
+class AhoCorasick:
+    """多模式字符串匹配自动机
+
+    一次扫描文本即可找出所有出现的模式串，耗时与文本长度和命中次数有关，与模式串数量无关。
+    """
+
+    def __init__(self) -> None:
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, object]]] = [[]]
+
+    def add(self, word: str, value: object) -> None:
+        """添加模式串。
+
+        Args:
+            word (str): 模式串（非空）。
+            value (object): 命中时返回的值。
+        """
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((len(word), value))
+
+    def build(self) -> None:
+        """按广度优先计算失败指针，添加完所有模式串后调用。"""
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[next_state] = fail if fail != next_state else 0
+                self._output[next_state] = (
+                    self._output[next_state] + self._output[self._fail[next_state]]
+                )
+
+    def iter(self, text: str) -> Iterator[Tuple[int, object]]:
+        """扫描文本。
+
+        Args:
+            text (str): 文本。
+
+        Yields:
+            Tuple[int, object]: 命中模式串在文本中的起始位置和对应的值。
+        """
+        state = 0
+        for end, char in enumerate(text, 1):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, value in self._output[state]:
+                yield end - length, value
+
+
+def _to_text(value) -> Optional[str]:
+    """将单元格值转为文本，空值返回 None。"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return str(value)
+
+
+class Rule(NamedTuple):
+    """按优先级排序后的一条规则。
+
+    conditions 为 (列, 匹配方式, 操作数) 的元组，匹配方式为 exact、contains、prefix
+    或 regex（操作数为已编译的正则）；没有任何条件的规则永远不会匹配。
+    """
+
+    id: object
+    value: object
+    conditions: Tuple[Tuple[str, str, object], ...]
+
+
+# 未使用任何全局内联标志时编译得到的标志
+_DEFAULT_FLAGS = re.compile("").flags
+# 提取字面量依赖 CPython 的内部解析器（re._parser），不可用时不提取，退化为合并正则预筛选
+_PARSER = getattr(re, "_parser", None)
+_LITERAL = getattr(_PARSER, "LITERAL", None)
+
+
+def combine_regexes(regexes: List[re.Pattern]) -> Optional[re.Pattern]:
+    """将多个正则合并为一个选择分支，用于一次扫描预筛选。
+
+    含分组（包括命名分组、反向引用和条件分组都依赖分组）或全局内联标志（如 (?i)）的
+    正则合并后会改变含义或无法编译，此时不合并。
+
+    Args:
+        regexes (List[re.Pattern]): 已编译的正则。
+
+    Returns:
+        Optional[re.Pattern]: 合并后的正则，无法安全合并时返回 None，
+            调用方应逐条使用原正则。
+    """
+    if not regexes or any(
+        regex.groups or regex.flags != _DEFAULT_FLAGS for regex in regexes
+    ):
+        return None
+    try:
+        return re.compile("|".join(f"(?:{regex.pattern})" for regex in regexes))
+    except (re.error, OverflowError, RecursionError):
+        return None
+
+
+def required_literal(regex: re.Pattern) -> Optional[str]:
+    """找出正则的任何匹配都必然包含的最长字面量，用作索引的锚点。
+
+    只取最外层连续的普通字符，分支、重复、分组等内部的字符不计入；忽略大小写或
+    内部解析器不可用时不提取。
+
+    Args:
+        regex (re.Pattern): 已编译的正则。
+
+    Returns:
+        Optional[str]: 字面量，没有时返回 None。
+    """
+    if _LITERAL is None or regex.flags & re.IGNORECASE:
+        return None
+    longest = run = ""
+    try:
+        for opcode, argument in _PARSER.parse(regex.pattern, regex.flags):
+            run = run + chr(argument) if opcode is _LITERAL else ""
+            if len(run) > len(longest):
+                longest = run
+    except (re.error, AttributeError, TypeError, ValueError):
+        return None
+    return longest or None
+
+
+def _match_type(mapping_row: dict) -> str:
+    """读取规则的匹配方式。"""
+    value = _to_text(mapping_row.get("匹配方式"))
+    if value is None or not value.strip():
+        return "exact"
+    match_type = MATCH_TYPES.get(value.strip().lower())
+    if match_type is None:
+        raise ValueError(
+            f"规则 {mapping_row.get('编号')} 的匹配方式无效: {value}，"
+            f"可选值: {', '.join(MATCH_TYPES)}"
+        )
+    return match_type
+
+
+def _priority(mapping_row: dict) -> int:
+    """读取规则的优先级，空白为 0。"""
+    value = mapping_row.get("优先级")
+    if _to_text(value) is None:
+        return 0
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"规则 {mapping_row.get('编号')} 的优先级不是整数: {value}")
+
+
+def parse_rules(
+    mapping_table: pd.DataFrame, columns: List[str], pattern_columns: List[str] = ()
+) -> List[Rule]:
+    """解析规则表，并按优先级（越大越先，默认 0）排序，同优先级保持表格顺序。
+
+    Args:
+        mapping_table (pd.DataFrame): 映射表（需包含 编号、值 两列，
+            可选 匹配方式、优先级 两列）。
+        columns (List[str]): 匹配列。
+        pattern_columns (List[str]): 支持包含、前缀和正则匹配的列，其余列始终精确匹配。
+
+    Returns:
+        List[Rule]: 排序后的规则。
+
+    Raises:
+        ValueError: 匹配方式、优先级或正则表达式无效。
+    """
+    records = mapping_table.to_dict(orient="records")
+    priorities = [_priority(mapping_row) for mapping_row in records]
+    order = sorted(range(len(records)), key=lambda row: -priorities[row])
+
+    rules = []
+    for row in order:
+        mapping_row = records[row]
+        match_type = _match_type(mapping_row)
+        conditions = []
+        for col in columns:
+            operand = mapping_row.get(col)
+            if not pd.notna(operand):
+                continue
+            if match_type == "exact" or col not in pattern_columns:
+                conditions.append((col, "exact", operand))
+            elif match_type == "regex":
+                try:
+                    conditions.append((col, "regex", re.compile(str(operand))))
+                except re.error as e:
+                    raise ValueError(
+                        f"规则 {mapping_row.get('编号')} 的正则表达式无效: {e}"
+                    )
+            else:
+                conditions.append((col, match_type, str(operand)))
+        rules.append(
+            Rule(mapping_row.get("编号"), mapping_row.get("值"), tuple(conditions))
+        )
+    return rules
+
+
+def _verify_conditions(conditions, transaction) -> bool:
+    """校验交易是否满足规则的全部条件。"""
+    for col, kind, operand in conditions:
+        value = transaction[col]
+        if kind == "exact":
+            if not value == operand:
+                return False
+            continue
+        text = _to_text(value)
+        if text is None:
+            return False
+        if kind == "contains":
+            matched = operand in text
+        elif kind == "prefix":
+            matched = text.startswith(operand)
+        else:
+            matched = operand.search(text) is not None
+        if not matched:
+            return False
+    return True
+
+
+class RuleIndex:
+    """规则索引
+
+    精确匹配的规则按非空列的组合（模式）分组，每组建立 值元组 -> 规则位置 的字典，
+    查询时对每个模式做一次字典查找。
+
+    包含、前缀和正则规则只用于 pattern_columns 中的文本列：每条规则以条件中最长的字面量
+    （正则取其匹配必然包含的字面量）为锚点，按列编入 Aho-Corasick 自动机；提取不到字面量
+    的正则规则按列合并为一个正则做预筛选（无法安全合并时不预筛选），候选规则再逐条校验
+    全部条件。
+
+    规则先按优先级（优先级列，越大越先，默认 0）排序，同优先级保持表格顺序，
+    查询结果取位置最小者。
+    """
+
+    # 编译后的全部属性，缓存中的规则索引缺少任何一项都说明是旧版本程序写入的
+    STATE = (
+        "columns",
+        "pattern_columns",
+        "ids",
+        "values",
+        "patterns",
+        "conditions",
+        "automata",
+        "regexes",
+        "anchors",
+        "evaluations",
+        "order",
+        "exclusive",
+    )
+
+    def __init__(
+        self,
+        mapping_table: pd.DataFrame,
+        columns: List[str],
+        pattern_columns: List[str] = (),
+    ) -> None:
+        """编译规则表。
+
+        Args:
+            mapping_table (pd.DataFrame): 映射表（需包含 编号、值 两列，
+                可选 匹配方式、优先级 两列）。
+            columns (List[str]): 匹配列。
+            pattern_columns (List[str]): 支持包含、前缀和正则匹配的列，其余列始终精确匹配。
+
+        Raises:
+            ValueError: 匹配方式、优先级或正则表达式无效。
+        """
+        self.columns = list(columns)
+        self.pattern_columns = [col for col in pattern_columns if col in self.columns]
+        self.ids: List = []
+        self.values: List = []
+        self.patterns: Dict[Tuple[str, ...], Dict[tuple, int]] = {}
+        self.conditions: Dict[int, Tuple[Tuple[str, str, object], ...]] = {}
+        self.automata: Dict[str, AhoCorasick] = {}
+        self.regexes: Dict[str, Tuple[Optional[re.Pattern], List[int]]] = {}
+        self.anchors: Dict[int, str] = {}
+        self.evaluations = 0
+
+        regex_rules: Dict[str, List[Tuple[int, re.Pattern]]] = {}
+        rules = parse_rules(mapping_table, self.columns, self.pattern_columns)
+        for position, rule in enumerate(rules):
+            self.ids.append(rule.id)
+            self.values.append(rule.value)
+            conditions = rule.conditions
+            if not conditions:
+                continue
+            if all(kind == "exact" for _, kind, _ in conditions):
+                pattern = tuple(col for col, _, _ in conditions)
+                key = tuple(operand for _, _, operand in conditions)
+                self.patterns.setdefault(pattern, {}).setdefault(key, position)
+                continue
+
+            self.conditions[position] = conditions
+            literals = []
+            for col, kind, operand in conditions:
+                # 精确条件的操作数可能不是文本（如数字），只从模式条件中取锚点
+                if kind == "exact":
+                    continue
+                literal = required_literal(operand) if kind == "regex" else operand
+                if literal:
+                    literals.append((len(literal), col, kind, literal))
+            if literals:
+                # 以最长的字面量为锚点，候选最少
+                _, col, kind, literal = max(literals, key=lambda item: item[0])
+                self.automata.setdefault(col, AhoCorasick()).add(
+                    literal, (position, kind)
+                )
+                self.anchors[position] = col
+            else:
+                col, _, operand = next(
+                    condition for condition in conditions if condition[1] == "regex"
+                )
+                regex_rules.setdefault(col, []).append((position, operand))
+                self.anchors[position] = col
+
+        for automaton in self.automata.values():
+            automaton.build()
+        for col, rules in regex_rules.items():
+            combined = combine_regexes([regex for _, regex in rules])
+            self.regexes[col] = (combined, [position for position, _ in rules])
+
+        self.order: List[Tuple[str, ...]] = list(self.patterns)
+        self.exclusive = self._exclusive()
+
+    def _exclusive(self) -> np.ndarray:
+        """判断每条精确规则是否与所有位置更靠前的规则互斥（不可能匹配同一笔交易）。
+
+        互斥的规则一旦命中就是最终结果，查询可以提前结束，因此可以按命中频率调整
+        模式的查询顺序而不改变结果。只做保守判断：模式规则一律视为不互斥；精确规则与
+        前面的模式规则只在锚点列有取值且锚点不匹配时才视为互斥。
+
+        两条精确规则在共同列上取值都相同时才会同时匹配，因此把每个模式在各个列子集上的
+        投影建成 投影值 -> 最小位置 的字典，每条规则只需按各模式查一次，不必两两比较。
+
+        Returns:
+            np.ndarray: 长度为 len(self) + 1 的布尔数组，最后一项对应未匹配。
+        """
+        exclusive = np.zeros(len(self) + 1, dtype=bool)
+        projections: Dict[Tuple, Dict[tuple, int]] = {}
+        for pattern, table in self.patterns.items():
+            for size in range(len(pattern) + 1):
+                for subset in itertools.combinations(range(len(pattern)), size):
+                    projection = projections.setdefault(
+                        (pattern, tuple(pattern[i] for i in subset)), {}
+                    )
+                    for key, position in table.items():
+                        value = tuple(key[i] for i in subset)
+                        if position < projection.get(value, len(self)):
+                            projection[value] = position
+
+        for pattern, table in self.patterns.items():
+            # 锚点不在本模式列上的模式规则可能与本模式的任何规则同时匹配
+            unanchored = min(
+                (
+                    position
+                    for position, col in self.anchors.items()
+                    if col not in pattern
+                ),
+                default=len(self),
+            )
+            for key, position in table.items():
+                if position > unanchored:
+                    continue
+                transaction = dict(zip(pattern, key))
+                first = min(
+                    projections[(other, common)].get(
+                        tuple(transaction[col] for col in common), len(self)
+                    )
+                    for other in self.patterns
+                    for common in [tuple(col for col in other if col in transaction)]
+                )
+                if first < position:
+                    continue
+                exclusive[position] = not any(
+                    candidate < position
+                    and self._overlaps(self.conditions[candidate], transaction)
+                    for candidate in self._pattern_candidates(transaction)
+                )
+        return exclusive
+
+    def _pattern_candidates(self, transaction: dict) -> Iterator[int]:
+        """锚点列在交易中且锚点匹配的模式规则位置（未校验其他条件）。"""
+        for col, automaton in self.automata.items():
+            text = _to_text(transaction.get(col))
+            if text is None:
+                continue
+            for start, (position, kind) in automaton.iter(text):
+                if kind != "prefix" or start == 0:
+                    yield position
+        for col, (combined, positions) in self.regexes.items():
+            text = _to_text(transaction.get(col))
+            if text is not None and (combined is None or combined.search(text)):
+                yield from positions
+
+    @staticmethod
+    def _overlaps(conditions: Tuple, transaction: dict) -> bool:
+        """只有部分列取值的交易是否可能满足条件（缺少的列视为满足）。"""
+        return _verify_conditions(
+            [condition for condition in conditions if condition[0] in transaction],
+            transaction,
+        )
+
+    def reorder(self, hits: List[int]) -> None:
+        """按历史命中次数调整模式的查询顺序，命中多的先查，结果不变。
+
+        Args:
+            hits (List[int]): 每条规则（按位置）的累计命中次数。
+        """
+        scores = {
+            pattern: sum(hits[position] for position in table.values())
+            for pattern, table in self.patterns.items()
+        }
+        self.order = sorted(self.patterns, key=lambda pattern: -scores[pattern])
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def is_valid(cls, rule_index) -> bool:
+        """检查对象是否为结构完整的规则索引（用于校验反序列化的缓存）。
+
+        Args:
+            rule_index (object): 待检查的对象。
+
+        Returns:
+            bool: 属性齐全且互斥标记与规则数量一致时返回 True。
+        """
+        if not isinstance(rule_index, cls):
+            return False
+        state = vars(rule_index)
+        if any(name not in state for name in cls.STATE):
+            return False
+        return (
+            isinstance(rule_index.exclusive, np.ndarray)
+            and len(rule_index.exclusive) == len(rule_index) + 1
+            and set(rule_index.order) == set(rule_index.patterns)
+        )
+
+    def find(self, transaction) -> Optional[int]:
+        """查找首个匹配规则的位置。
+
+        Args:
+            transaction (Mapping): 交易数据（pd.Series 或字典）。
+
+        Returns:
+            Optional[int]: 规则位置，未匹配返回 None。
+        """
+        best = len(self)
+        for pattern in self.order:
+            self.evaluations += 1
+            position = self.patterns[pattern].get(
+                tuple(transaction[col] for col in pattern)
+            )
+            if position is not None and position < best:
+                if self.exclusive[position]:
+                    return position
+                best = position
+        if self.conditions:
+            self.evaluations += 1
+            best = self._find_pattern(transaction, best)
+        return best if best < len(self) else None
+
+    def _verify(self, position: int, transaction) -> bool:
+        """校验模式规则的全部条件。"""
+        return _verify_conditions(self.conditions[position], transaction)
+
+    def _find_pattern(self, transaction, best: int) -> int:
+        """在模式规则中查找位置小于 best 的首个匹配规则。
+
+        Args:
+            transaction (Mapping): 交易数据。
+            best (int): 当前最小位置。
+
+        Returns:
+            int: 新的最小位置。
+        """
+        for col, automaton in self.automata.items():
+            text = _to_text(transaction[col])
+            if text is None:
+                continue
+            for start, (position, kind) in automaton.iter(text):
+                if (
+                    position < best
+                    and (kind != "prefix" or start == 0)
+                    and self._verify(position, transaction)
+                ):
+                    best = position
+        for col, (combined, positions) in self.regexes.items():
+            text = _to_text(transaction[col])
+            if text is None or (combined is not None and not combined.search(text)):
+                continue
+            for position in positions:
+                if position >= best:
+                    break
+                if self._verify(position, transaction):
+                    best = position
+                    break
+        return best
+
+    def find_frame(self, frame: pd.DataFrame) -> np.ndarray:
+        """批量查找每行交易首个匹配规则的位置。
+
+        每个模式与交易表做一次左连接，再逐行取最小位置；模式规则按去重后的取值组合匹配。
+        已命中互斥规则的行不再参与后续模式的查找。
+
+        Args:
+            frame (pd.DataFrame): 交易数据表。
+
+        Returns:
+            np.ndarray: 规则位置数组，未匹配的行为 len(self)。
+        """
+        frame = frame.reset_index(drop=True)
+        best = np.full(len(frame), len(self), dtype=np.int64)
+        pending = np.arange(len(frame))
+        for pattern in self.order:
+            if not len(pending):
+                return best
+            self.evaluations += len(pending)
+            table = self.patterns[pattern]
+            columns = list(pattern)
+            rules = pd.DataFrame(list(table.keys()), columns=columns, dtype=object)
+            rules[_POSITION] = list(table.values())
+            values = (
+                frame[columns]
+                if len(pending) == len(frame)
+                else frame.loc[pending, columns]
+            )
+            merged = (
+                values.astype(object)
+                .reset_index(drop=True)
+                .merge(rules, how="left", on=columns, sort=False)
+            )
+            positions = merged[_POSITION].fillna(len(self)).to_numpy(dtype=np.int64)
+            best[pending] = np.minimum(best[pending], positions)
+            pending = pending[~self.exclusive[best[pending]]]
+        if self.conditions and len(pending):
+            self.evaluations += len(pending)
+            best[pending] = np.minimum(
+                best[pending], self._find_pattern_frame(frame.loc[pending])
+            )
+        return best
+
+    def _find_pattern_frame(self, frame: pd.DataFrame) -> np.ndarray:
+        """批量查找模式规则，每种取值组合只匹配一次。"""
+        columns = sorted(
+            {col for conditions in self.conditions.values() for col, _, _ in conditions}
+        )
+        values = frame[columns].astype(object).reset_index(drop=True)
+        unique = values.drop_duplicates().copy()
+        unique[_POSITION] = [
+            self._find_pattern(dict(zip(columns, row)), len(self))
+            for row in unique.itertuples(index=False, name=None)
+        ]
+        merged = values.merge(unique, how="left", on=columns, sort=False)
+        return merged[_POSITION].to_numpy(dtype=np.int64)
+
+    def take(self, positions: np.ndarray, default: Tuple) -> Tuple[np.ndarray, ...]:
+        """按规则位置取出编号和值。
+
+        Args:
+            positions (np.ndarray): find_frame 返回的规则位置数组。
+            default (Tuple): 未匹配时使用的（编号, 值）。
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: 编号数组和值数组（object 类型）。
+        """
+        ids = np.empty(len(self) + 1, dtype=object)
+        ids[:-1] = self.ids
+        ids[-1] = default[0]
+        values = np.empty(len(self) + 1, dtype=object)
+        values[:-1] = self.values
+        values[-1] = default[1]
+        return ids[positions], values[positions]
+
+    def match(self, transaction) -> Optional[Tuple]:
+        """匹配交易数据。
+
+        Args:
+            transaction (Mapping): 交易数据（pd.Series 或字典）。
+
+        Returns:
+            Optional[Tuple]: 匹配结果（编号和值），未匹配返回 None。
+        """
+        position = self.find(transaction)
+        if position is None:
+            return None
+        return self.ids[position], self.values[position]
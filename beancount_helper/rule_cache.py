@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : rule_cache.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/18 20:02
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 已编译规则的缓存
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import os
+import pickle
+import hashlib
+import tempfile
+from pathlib import Path
+from datetime import datetime
+from typing import Any, Callable, List, Optional
+
+
+class RuleCache:
+    """已编译规则的缓存
+
+    将编译后的规则索引以 pickle 形式保存在缓存目录中，并记录规则文件的修改时间、
+    大小和 SHA-256 指纹。修改时间和大小不变时直接命中；二者变化但内容哈希相同时
+    同样命中，并刷新记录的指纹；否则视为失效。
+
+    规则本身再单独序列化一层，查看缓存信息时只读取记录，不必导入 pandas 等依赖。
+    """
+
+    VERSION = 4
+    SUFFIX = ".rules.pickle"
+
+    def __init__(self, cache_dir: str) -> None:
+        """初始化规则缓存。
+
+        Args:
+            cache_dir (str): 缓存目录。
+        """
+        self.cache_dir = Path(cache_dir)
+
+    def get_path(self, mapping_file: str) -> Path:
+        """获取规则文件对应的缓存文件路径。
+
+        Args:
+            mapping_file (str): 规则文件路径。
+
+        Returns:
+            Path: 缓存文件路径。
+        """
+        return self.cache_dir / f"{Path(mapping_file).stem}{self.SUFFIX}"
+
+    @staticmethod
+    def _file_hash(file_path: str) -> str:
+        """计算文件的 SHA-256 哈希。"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _read(self, cache_path: Path) -> Optional[dict]:
+        """读取缓存文件，文件不存在或已损坏时返回 None。"""
+        try:
+            with open(cache_path, "rb") as file:
+                payload = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            return None
+        if not isinstance(payload, dict) or payload.get("version") != self.VERSION:
+            return None
+        return payload
+
+    def _write(self, cache_path: Path, payload: dict) -> None:
+        """原子写入缓存文件。"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            mode="wb", delete=False, dir=self.cache_dir, suffix=".tmp"
+        ) as temp_file:
+            pickle.dump(payload, temp_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_file.name, cache_path)
+
+    def load(
+        self,
+        mapping_file: str,
+        match_columns: dict,
+        validate: Callable[[Any], bool] = None,
+    ) -> Optional[Any]:
+        """读取与规则文件和匹配列一致的缓存。
+
+        Args:
+            mapping_file (str): 规则文件路径。
+            match_columns (dict): 匹配列配置，配置变化时缓存失效。
+            validate (Callable[[Any], bool]): 检查反序列化后的规则结构，返回 False 时
+                视为未命中（如旧版本程序写入、版本号又未变化的缓存）。
+
+        Returns:
+            Optional[Any]: 已编译的规则，缓存未命中返回 None。
+        """
+        cache_path = self.get_path(mapping_file)
+        payload = self._read(cache_path)
+        if payload is None or payload["match_columns"] != match_columns:
+            return None
+
+        stat = os.stat(mapping_file)
+        if payload["mtime_ns"] != stat.st_mtime_ns or payload["size"] != stat.st_size:
+            if payload["sha256"] != self._file_hash(mapping_file):
+                return None
+
+            payload["mtime_ns"] = stat.st_mtime_ns
+            payload["size"] = stat.st_size
+            self._write(cache_path, payload)
+
+        try:
+            rules = pickle.loads(payload["rules"])
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+        if validate is not None and not validate(rules):
+            return None
+        return rules
+
+    def save(
+        self, mapping_file: str, match_columns: dict, rules: Any, issues: int = 0
+    ) -> None:
+        """保存已编译的规则。
+
+        Args:
+            mapping_file (str): 规则文件路径。
+            match_columns (dict): 匹配列配置。
+            rules (Any): 已编译的规则。
+            issues (int): 编译时规则检查发现的问题数。
+        """
+        stat = os.stat(mapping_file)
+        payload = {
+            "version": self.VERSION,
+            "mapping_file": str(mapping_file),
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": self._file_hash(mapping_file),
+            "match_columns": match_columns,
+            "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "issues": issues,
+            "rules": pickle.dumps(rules, protocol=pickle.HIGHEST_PROTOCOL),
+        }
+        self._write(self.get_path(mapping_file), payload)
+
+    def entries(self) -> List[dict]:
+        """列出所有缓存条目。
+
+        Returns:
+            List[dict]: 缓存信息（路径、大小、规则文件、创建时间、规则问题数、是否有效）。
+        """
+        if not self.cache_dir.exists():
+            return []
+
+        entries = []
+        for cache_path in sorted(self.cache_dir.glob(f"*{self.SUFFIX}")):
+            payload = self._read(cache_path) or {}
+            mapping_file = payload.get("mapping_file")
+            valid = False
+            if mapping_file and os.path.exists(mapping_file):
+                stat = os.stat(mapping_file)
+                valid = (
+                    payload["mtime_ns"] == stat.st_mtime_ns
+                    and payload["size"] == stat.st_size
+                ) or payload["sha256"] == self._file_hash(mapping_file)
+            entries.append(
+                {
+                    "path": str(cache_path),
+                    "size": cache_path.stat().st_size,
+                    "mapping_file": mapping_file,
+                    "created": payload.get("created"),
+                    "issues": payload.get("issues"),
+                    "valid": valid,
+                }
+            )
+        return entries
+
+    def clear(self) -> int:
+        """清空缓存。
+
+        Returns:
+            int: 删除的缓存文件数量。
+        """
+        if not self.cache_dir.exists():
+            return 0
+
+        count = 0
+        for cache_path in self.cache_dir.glob(f"*{self.SUFFIX}"):
+            cache_path.unlink()
+            count += 1
+        return count
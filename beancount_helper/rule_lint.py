@@ -0,0 +1,298 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : rule_lint.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/19 21:10
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 规则冲突与遮蔽检查
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import re
+import itertools
+import pandas as pd
+from typing import Dict, List, NamedTuple, Tuple
+from rule import (
+    AhoCorasick,
+    Rule,
+    combine_regexes,
+    parse_rules,
+    required_literal,
+    _to_text,
+)
+
+
+class RuleIssue(NamedTuple):
+    """规则检查发现的问题。
+
+    kind 取值：
+        empty: 没有任何匹配条件，永远不会生效。
+        duplicate_id: 编号与前面的规则重复。
+        duplicate: 条件和值都与前面的规则相同，可以删除。
+        conflict: 条件与前面的规则相同但值不同，永远不会生效。
+        shadowed: 前面更宽泛的规则已覆盖其全部匹配，永远不会生效。
+    """
+
+    kind: str
+    sheet: str
+    rule_id: object
+    other_id: object
+    message: str
+
+
+def _signature(conditions: Tuple) -> Tuple:
+    """规则条件的可哈希形式，正则取其表达式文本。"""
+    return tuple(
+        (col, kind, operand.pattern if kind == "regex" else operand)
+        for col, kind, operand in conditions
+    )
+
+
+def _covers(general: Tuple, specific: Tuple) -> bool:
+    """
+    判断满足 specific 条件的交易是否一定满足 general 条件。
+
+    只做保守判断：无法确定时（如两个不同的正则）返回 False。
+    """
+    specific_map = {col: (kind, operand) for col, kind, operand in specific}
+    for col, kind, operand in general:
+        if col not in specific_map:
+            return False
+        specific_kind, specific_operand = specific_map[col]
+        if specific_kind == "regex":
+            if not (kind == "regex" and operand.pattern == specific_operand.pattern):
+                return False
+            continue
+        text = _to_text(specific_operand)
+        if kind == "exact":
+            covered = specific_kind == "exact" and specific_operand == operand
+        elif kind == "contains":
+            covered = operand in text
+        elif kind == "prefix":
+            covered = specific_kind in ("exact", "prefix") and text.startswith(operand)
+        else:
+            covered = specific_kind == "exact" and operand.search(text) is not None
+        if not covered:
+            return False
+    return True
+
+
+class _CoverIndex:
+    """规则索引，用于找出可能覆盖某条规则的其他规则。
+
+    每条规则按自身条件当作一笔“伪交易”查询，候选规则再用 _covers 校验，
+    因此总耗时与规则数近似线性，而不是两两比较：
+        精确规则按 (列组合, 值元组) 建字典，查询时枚举伪交易精确条件的各个子集；
+        包含和前缀规则以最长字面量为锚点编入 Aho-Corasick 自动机，扫描伪交易的文本；
+        只有正则条件的规则以必然出现的最长字面量为锚点编入另一组自动机，
+        扫描伪交易的精确文本；提取不到字面量的正则（如 \\d+）做合并正则预筛选
+        （无法安全合并时逐条匹配）；表达式相同的正则规则按表达式文本直接查找。
+    """
+
+    def __init__(self, rules: List[Rule]) -> None:
+        """
+        为全部规则建立索引。
+
+        Args:
+            rules (List[Rule]): 按匹配顺序排列的规则。
+        """
+        self.exact: Dict[Tuple, int] = {}
+        self.literals: Dict[str, AhoCorasick] = {}
+        self.regex_literals: Dict[str, AhoCorasick] = {}
+        self.regexes: Dict[str, List[Tuple[int, re.Pattern]]] = {}
+        self.regex_texts: Dict[Tuple[str, str], List[int]] = {}
+
+        for position, rule in enumerate(rules):
+            conditions = rule.conditions
+            if not conditions:
+                continue
+            if all(kind == "exact" for _, kind, _ in conditions):
+                key = (
+                    tuple(col for col, _, _ in conditions),
+                    tuple(operand for _, _, operand in conditions),
+                )
+                self.exact.setdefault(key, position)
+                continue
+
+            literals = [
+                (len(operand), col, kind, operand)
+                for col, kind, operand in conditions
+                if kind in ("contains", "prefix")
+            ]
+            if literals:
+                _, col, kind, operand = max(literals, key=lambda item: item[0])
+                self.literals.setdefault(col, AhoCorasick()).add(
+                    operand, (position, kind)
+                )
+                continue
+
+            col, _, operand = next(
+                condition for condition in conditions if condition[1] == "regex"
+            )
+            self.regex_texts.setdefault((col, operand.pattern), []).append(position)
+            literal = required_literal(operand)
+            if literal:
+                self.regex_literals.setdefault(col, AhoCorasick()).add(
+                    literal, position
+                )
+            else:
+                self.regexes.setdefault(col, []).append((position, operand))
+
+        for automaton in itertools.chain(
+            self.literals.values(), self.regex_literals.values()
+        ):
+            automaton.build()
+        self.combined = {
+            col: combine_regexes([regex for _, regex in regexes])
+            for col, regexes in self.regexes.items()
+        }
+
+    def candidates(self, conditions: Tuple, before: int) -> List[int]:
+        """
+        返回位置在 before 之前、可能覆盖给定条件的规则（未校验）。
+
+        Args:
+            conditions (Tuple): 被覆盖规则的条件。
+            before (int): 被覆盖规则的位置。
+
+        Returns:
+            List[int]: 候选规则位置。
+        """
+        positions = []
+        exact = [(col, operand) for col, kind, operand in conditions if kind == "exact"]
+        for size in range(1, len(exact) + 1):
+            for subset in itertools.combinations(exact, size):
+                positions.append(
+                    self.exact.get(
+                        (
+                            tuple(col for col, _ in subset),
+                            tuple(operand for _, operand in subset),
+                        )
+                    )
+                )
+
+        for col, kind, operand in conditions:
+            if kind == "regex":
+                positions.extend(self.regex_texts.get((col, operand.pattern), ()))
+                continue
+            text = _to_text(operand)
+            automaton = self.literals.get(col)
+            if automaton is not None:
+                positions.extend(
+                    position
+                    for start, (position, literal_kind) in automaton.iter(text)
+                    if literal_kind == "contains" or start == 0
+                )
+            if kind == "exact" and col in self.regex_literals:
+                positions.extend(
+                    position for _, position in self.regex_literals[col].iter(text)
+                )
+            if kind == "exact" and col in self.combined:
+                combined = self.combined[col]
+                if combined is None or combined.search(text) is not None:
+                    positions.extend(
+                        position
+                        for position, regex in self.regexes[col]
+                        if position < before and regex.search(text) is not None
+                    )
+        return [
+            position
+            for position in positions
+            if position is not None and position < before
+        ]
+
+
+def lint_rules(
+    mapping_table: pd.DataFrame,
+    columns: List[str],
+    pattern_columns: List[str] = (),
+    sheet: str = "",
+) -> List[RuleIssue]:
+    """
+    检查规则表中永远不会生效或多余的规则。
+
+    规则按匹配时的顺序（优先级，其次表格顺序）排列，每条规则只与索引给出的、可能覆盖它的
+    前序规则比较，适用于上万条规则。
+
+    Args:
+        mapping_table (pd.DataFrame): 映射表。
+        columns (List[str]): 匹配列，与编译规则时一致。
+        pattern_columns (List[str]): 支持包含、前缀和正则匹配的列。
+        sheet (str): 工作表名称，用于报告。
+
+    Returns:
+        List[RuleIssue]: 发现的问题，按匹配顺序排列。
+    """
+    rules = parse_rules(mapping_table, columns, pattern_columns)
+    index = _CoverIndex(rules)
+    issues = []
+    ids = set()
+    signatures: Dict[Tuple, int] = {}
+
+    for position, rule in enumerate(rules):
+        if _to_text(rule.id) is not None:
+            if rule.id in ids:
+                issues.append(
+                    RuleIssue(
+                        "duplicate_id", sheet, rule.id, rule.id, "编号与前面的规则重复"
+                    )
+                )
+            ids.add(rule.id)
+
+        if not rule.conditions:
+            issues.append(
+                RuleIssue("empty", sheet, rule.id, None, "没有任何匹配条件，永远不会生效")
+            )
+            continue
+
+        first = signatures.setdefault(_signature(rule.conditions), position)
+        if first != position:
+            other = rules[first]
+            if other.value == rule.value:
+                issues.append(
+                    RuleIssue(
+                        "duplicate", sheet, rule.id, other.id, "与前面的规则完全相同，可以删除"
+                    )
+                )
+            else:
+                issues.append(
+                    RuleIssue(
+                        "conflict",
+                        sheet,
+                        rule.id,
+                        other.id,
+                        f"条件相同但值不同（{other.value} / {rule.value}），永远不会生效",
+                    )
+                )
+            continue
+
+        covering = [
+            candidate
+            for candidate in set(index.candidates(rule.conditions, position))
+            if _covers(rules[candidate].conditions, rule.conditions)
+        ]
+        if covering:
+            other = rules[min(covering)]
+            same = "值相同，可以删除" if other.value == rule.value else "永远不会生效"
+            issues.append(
+                RuleIssue(
+                    "shadowed",
+                    sheet,
+                    rule.id,
+                    other.id,
+                    f"被前面更宽泛的规则覆盖，{same}",
+                )
+            )
+    return issues
+
+
+def format_issue(issue: RuleIssue) -> str:
+    """将问题格式化为一行文本。"""
+    text = f"[{issue.sheet}] 规则 {issue.rule_id}: {issue.message}"
+    if issue.other_id is not None and issue.kind != "duplicate_id":
+        text += f"（参见规则 {issue.other_id}）"
+    return text
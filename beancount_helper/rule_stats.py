@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : rule_stats.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/20 20:36
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 规则命中统计
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import os
+import json
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+
+class RuleStats:
+    """规则命中统计
+
+    每个规则文件一个 JSON 文件，记录累计导入次数，以及每条规则（按工作表和编号）的
+    累计命中次数、首次出现和最近一次命中时的导入序号，用于调整规则的查询顺序和找出
+    长期未命中的规则。
+    """
+
+    SUFFIX = ".stats.json"
+
+    def __init__(self, stats_dir: str, mapping_file: str) -> None:
+        """
+        初始化规则命中统计。
+
+        Args:
+            stats_dir (str): 统计文件目录。
+            mapping_file (str): 规则文件路径。
+        """
+        self.path = Path(stats_dir) / f"{Path(mapping_file).stem}{self.SUFFIX}"
+        self.data = self._read()
+
+    @staticmethod
+    def key(rule_id) -> str:
+        """规则编号的统一文本形式（Excel 读出的 1.0 与 1 视为同一编号）。"""
+        if isinstance(rule_id, float) and rule_id.is_integer():
+            rule_id = int(rule_id)
+        return str(rule_id)
+
+    def _read(self) -> dict:
+        """读取统计文件，不存在或已损坏时返回空统计。"""
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            data = None
+        if not isinstance(data, dict) or not isinstance(data.get("sheets"), dict):
+            return {"imports": 0, "sheets": {}}
+        return data
+
+    def save(self) -> None:
+        """原子写入统计文件。"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            mode="w",
+            delete=False,
+            dir=self.path.parent,
+            suffix=".tmp",
+            encoding="utf-8",
+        ) as temp_file:
+            json.dump(self.data, temp_file, ensure_ascii=False, indent=2)
+        os.replace(temp_file.name, self.path)
+
+    @property
+    def imports(self) -> int:
+        """累计导入次数。"""
+        return self.data["imports"]
+
+    def hits(self, sheet: str, rule_ids: Iterable) -> List[int]:
+        """
+        获取规则的累计命中次数。
+
+        Args:
+            sheet (str): 工作表名称。
+            rule_ids (Iterable): 规则编号。
+
+        Returns:
+            List[int]: 与 rule_ids 一一对应的命中次数，没有记录的规则为 0。
+        """
+        rules = self.data["sheets"].get(sheet, {})
+        return [rules.get(self.key(rule_id), {}).get("hits", 0) for rule_id in rule_ids]
+
+    def record(self, hits: Dict[str, Dict], imports: int = 1) -> None:
+        """
+        记录一次导入的命中次数并保存。
+
+        Args:
+            hits (Dict[str, Dict]): 工作表 -> {规则编号: 命中次数}，应包含规则文件中的全部规则，
+                未命中的规则为 0，以便记录其首次出现的导入序号。
+            imports (int): 本次导入的账单数量。
+        """
+        self.data["imports"] += imports
+        current = self.data["imports"]
+        for sheet, counts in hits.items():
+            rules = self.data["sheets"].setdefault(sheet, {})
+            for rule_id, count in counts.items():
+                entry = rules.setdefault(
+                    self.key(rule_id),
+                    {"hits": 0, "first_seen": current - imports + 1, "last_hit": None},
+                )
+                if count:
+                    entry["hits"] += int(count)
+                    entry["last_hit"] = current
+        self.save()
+
+    def dead_rules(
+        self, rule_ids: Dict[str, Iterable], after: int
+    ) -> List[Tuple[str, str, int, int]]:
+        """
+        找出最近 after 次导入中都没有命中的规则。
+
+        Args:
+            rule_ids (Dict[str, Iterable]): 工作表 -> 规则文件中当前的规则编号，
+                已删除的规则不会出现在结果中。
+            after (int): 连续未命中的导入次数阈值。
+
+        Returns:
+            List[Tuple[str, str, int, int]]: (工作表, 编号, 累计命中次数, 连续未命中的导入次数)。
+        """
+        dead = []
+        for sheet, ids in rule_ids.items():
+            rules = self.data["sheets"].get(sheet, {})
+            for rule_id in ids:
+                entry = rules.get(self.key(rule_id))
+                if entry is None:
+                    continue
+                last = entry["last_hit"] or entry["first_seen"] - 1
+                idle = self.imports - last
+                if idle >= after:
+                    dead.append((sheet, self.key(rule_id), entry["hits"], idle))
+        return dead
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : shard.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/21 20:18
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 按月分片的账本布局
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import os
+import re
+import logging
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Tuple
+from beancount import loader
+from beancount.parser import parser
+
+# write_transaction_list 生成的带时间戳的交易文件名，如 2025-02-26_14-48-01_4355.bean
+TIMESTAMPED_FILE = re.compile(r"^\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}_\d{4}\.bean$")
+INCLUDE_LINE = re.compile(r'^\s*include\s+"([^"]+)"\s*$')
+INCLUDE_COMMENT = ";【新增交易记录】"
+
+
+def shard_include(month: str) -> str:
+    """
+    分片文件相对主账本目录的路径。
+
+    Args:
+        month (str): 月份（YYYY-MM）。
+
+    Returns:
+        str: 如 2025/2025-02.bean。
+    """
+    return f"{month[:4]}/{month}.bean"
+
+
+def split_by_month(file_path: str, entries: List) -> Dict[str, str]:
+    """
+    按条目日期将交易文件的文本切分到各月。
+
+    每个条目的文本从其所在行开始，到下一个条目之前为止；第一个条目之前的内容（如注释）
+    归入第一个条目。条目需来自对该文件的解析（meta 中带有行号）。
+
+    Args:
+        file_path (str): 交易文件路径。
+        entries (List): 该文件解析得到的条目。
+
+    Returns:
+        Dict[str, str]: 月份（YYYY-MM）-> 该月条目的文本。
+    """
+    with open(file_path, "r", encoding="utf-8") as file:
+        lines = file.readlines()
+
+    located = sorted(
+        (entry.meta["lineno"], entry.date.strftime("%Y-%m"))
+        for entry in entries
+        if entry.meta.get("filename") == str(file_path)
+    )
+    months: Dict[str, List[str]] = {}
+    for number, (lineno, month) in enumerate(located):
+        start = 0 if number == 0 else lineno - 1
+        end = located[number + 1][0] - 1 if number + 1 < len(located) else len(lines)
+        chunk = "".join(lines[start:end])
+        if not chunk.endswith("\n"):
+            chunk += "\n"
+        months.setdefault(month, []).append(chunk)
+    return {month: "".join(chunks) for month, chunks in months.items()}
+
+
+def _atomic_write(file_path: Path, text: str) -> None:
+    """先写临时文件再替换，保证文件内容完整。"""
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        mode="w", delete=False, dir=file_path.parent, suffix=".tmp", encoding="utf-8"
+    ) as temp_file:
+        temp_file.write(text)
+    os.replace(temp_file.name, file_path)
+
+
+def read_includes(main_path: str) -> List[str]:
+    """
+    读取主账本中的 include 路径。
+
+    Args:
+        main_path (str): 主账本路径。
+
+    Returns:
+        List[str]: include 的路径（原样）。
+    """
+    with open(main_path, "r", encoding="utf-8") as main_file:
+        return [
+            match.group(1)
+            for match in map(INCLUDE_LINE.match, main_file)
+            if match is not None
+        ]
+
+
+def write_shards(main_path: str, months: Dict[str, str]) -> List[str]:
+    """
+    将各月文本追加到对应的分片文件，并为新建的分片在主账本中添加 include。
+
+    各分片先完整写出新内容再替换，主账本最后更新。
+
+    Args:
+        main_path (str): 主账本路径。
+        months (Dict[str, str]): 月份（YYYY-MM）-> 要追加的文本。
+
+    Returns:
+        List[str]: 新添加的 include 路径。
+    """
+    bean_dir = Path(main_path).resolve().parent
+    for month, text in sorted(months.items()):
+        shard_path = bean_dir / shard_include(month)
+        existing = ""
+        if shard_path.exists():
+            existing = shard_path.read_text(encoding="utf-8")
+        _atomic_write(shard_path, existing + text)
+
+    includes = set(read_includes(main_path))
+    added = [
+        shard_include(month)
+        for month in sorted(months)
+        if shard_include(month) not in includes
+    ]
+    if added:
+        with open(main_path, "rb") as main_file:
+            main_file.seek(0, os.SEEK_END)
+            needs_newline = main_file.tell() > 0
+            if needs_newline:
+                main_file.seek(-1, os.SEEK_END)
+                needs_newline = main_file.read(1) != b"\n"
+        with open(main_path, "a", encoding="utf-8") as main_file:
+            if needs_newline:
+                main_file.write("\n")
+            for include in added:
+                main_file.write(f'include "{include}"\n')
+    return added
+
+
+def compact_ledger(main_path: str, log_obj: logging.Logger) -> int:
+    """
+    将主账本引入的带时间戳交易文件迁移到按月分片的布局。
+
+    迁移前后分别加载账本并比较条目数，不一致或出现错误时恢复原状；
+    成功后才删除原有的交易文件。
+
+    Args:
+        main_path (str): 主账本路径。
+        log_obj (logging.Logger): 日志对象。
+
+    Returns:
+        int: 迁移的文件数，失败返回 -1。
+    """
+    bean_dir = Path(main_path).resolve().parent
+    targets = [
+        include
+        for include in read_includes(main_path)
+        if TIMESTAMPED_FILE.match(os.path.basename(include))
+        and (bean_dir / include).resolve().parent == bean_dir
+    ]
+    if not targets:
+        log_obj.info("没有需要迁移的交易文件")
+        return 0
+
+    entries, errors, _ = loader.load_file(main_path)
+    if errors:
+        log_obj.error(f"账本存在错误，请先修复后再迁移: {len(errors)} 个错误")
+        return -1
+
+    months: Dict[str, List[str]] = {}
+    for include in targets:
+        file_path = str(bean_dir / include)
+        file_entries, parse_errors, _ = parser.parse_file(file_path)
+        if parse_errors:
+            log_obj.error(f"解析失败，跳过迁移: {file_path}")
+            return -1
+        for month, text in split_by_month(file_path, file_entries).items():
+            months.setdefault(month, []).append(text)
+
+    backups: Dict[Path, Tuple[bool, str]] = {}
+    for path in [Path(main_path)] + [
+        bean_dir / shard_include(month) for month in months
+    ]:
+        backups[path] = (
+            path.exists(),
+            path.read_text(encoding="utf-8") if path.exists() else "",
+        )
+
+    try:
+        with open(main_path, "r", encoding="utf-8") as main_file:
+            lines = main_file.readlines()
+        removed = set(targets)
+        kept = []
+        for line in lines:
+            match = INCLUDE_LINE.match(line)
+            if match is not None and match.group(1) in removed:
+                if kept and kept[-1].strip() == INCLUDE_COMMENT:
+                    kept.pop()
+                    if kept and not kept[-1].strip():
+                        kept.pop()
+                continue
+            kept.append(line)
+        _atomic_write(Path(main_path), "".join(kept))
+        write_shards(
+            main_path, {month: "".join(texts) for month, texts in months.items()}
+        )
+
+        new_entries, new_errors, _ = loader.load_file(main_path)
+        if new_errors or len(new_entries) != len(entries):
+            raise ValueError(
+                f"迁移后账本不一致: 条目 {len(entries)} -> {len(new_entries)}，"
+                f"错误 {len(new_errors)} 个"
+            )
+    except Exception as e:
+        log_obj.error(f"迁移失败，正在恢复: {e}")
+        for path, (existed, text) in backups.items():
+            if existed:
+                _atomic_write(path, text)
+            elif path.exists():
+                os.remove(path)
+        return -1
+
+    for include in targets:
+        os.remove(bean_dir / include)
+    log_obj.info(f"已将 {len(targets)} 个交易文件迁移到 {len(months)} 个月度分片")
+    return len(targets)
@@ -0,0 +1,238 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : staged.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/24 20:05
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 分阶段并发导入
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import os
+import asyncio
+import logging
+import pandas as pd
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional
+from conversion import BeancountHelper, TransactionBatch, TransactionWriter
+from id_index import TransactionIdIndex
+from mapper import AccountMapper, BeancountMapper
+from profiler import PROFILER
+
+# 相邻阶段之间最多缓存的数据块数：下游较慢时上游在此等待，内存占用只与块大小有关
+QUEUE_SIZE = 2
+# 读取、规则映射、转换、写入四个阶段，加上账本加载，各占一个线程
+_THREADS = 5
+_DONE = object()
+
+
+async def _produce(
+    iterator: Iterator, output: asyncio.Queue, executor: Executor
+) -> None:
+    """在线程中逐个取出迭代器的元素放入队列，结束时放入结束标记。"""
+    loop = asyncio.get_running_loop()
+    while True:
+        item = await loop.run_in_executor(executor, next, iterator, _DONE)
+        await output.put(item)
+        if item is _DONE:
+            return
+
+
+async def _consume(
+    func: Callable,
+    input: asyncio.Queue,
+    output: Optional[asyncio.Queue],
+    executor: Executor,
+) -> None:
+    """在线程中依次处理队列中的元素，结果放入下一个队列（为 None 时丢弃）。"""
+    loop = asyncio.get_running_loop()
+    while True:
+        item = await input.get()
+        if item is _DONE:
+            if output is not None:
+                await output.put(_DONE)
+            return
+        result = await loop.run_in_executor(executor, func, item)
+        if output is not None:
+            await output.put(result)
+
+
+class StagedImport:
+    """分阶段并发导入单个账单
+
+    读取账单、规则映射、转换为交易批次、写入临时交易文件四个阶段各在一个线程中执行，
+    由 asyncio 按块在阶段之间传递数据，相邻阶段通过有界队列连接，上游领先过多时等待下游；
+    账本加载与这些阶段同时进行，全部写完后再检查临时文件并写入账本。
+    分块导入时总耗时接近最慢的阶段而不是各阶段之和；不分块时整个账单是一块，
+    只有账本加载与映射重叠。
+
+    各阶段中纯 Python 的部分受 GIL 限制不能真正并行，重叠主要来自读取 CSV、
+    多进程加载账本等会释放 GIL 的操作。
+    """
+
+    def __init__(
+        self,
+        account_mapper: AccountMapper,
+        pipeline: List[Dict],
+        source: str,
+        bean_path: str,
+        out_bean_path: str,
+        log_obj: logging.Logger,
+        id_index: TransactionIdIndex = None,
+        dedup=None,
+        chunk_size: int = None,
+        export_csv: bool = False,
+        layout: str = "file",
+        workers: int = None,
+    ) -> None:
+        """
+        初始化分阶段导入。
+
+        Args:
+            account_mapper (AccountMapper): 账单的规则映射器。
+            pipeline (List[Dict]): 数据源的管道定义（配置中的 pipeline）。
+            source (str): 数据源。
+            bean_path (str): 主账本路径。
+            out_bean_path (str): 按文件布局写入时，本次交易文件的路径。
+            log_obj (logging.Logger): 日志对象。
+            id_index (TransactionIdIndex): 已导入交易单号索引。
+            dedup (dedup.Deduplicator): 跨数据源重复交易检测。
+            chunk_size (int): 分块处理的行数，为 None 时整个账单作为一块。
+            export_csv (bool): 是否同时将映射结果导出到 account_mapper 的输出文件。
+            layout (str): 账本写入布局（"file" 或 "monthly"）。
+            workers (int): 加载和校验账本时的工作进程数。
+        """
+        self.account_mapper = account_mapper
+        self.pipeline = pipeline
+        self.source = source
+        self.bean_path = bean_path
+        self.out_bean_path = out_bean_path
+        self.log_obj = log_obj
+        self.id_index = id_index
+        self.dedup = dedup
+        self.chunk_size = chunk_size
+        self.export_csv = export_csv
+        self.layout = layout
+        self.workers = workers
+        self._chunks = account_mapper.iter_target(chunk_size)
+        self._mappings = None
+        self._beancount_mapper = None
+        self._output = None
+
+    def run(self) -> bool:
+        """
+        执行导入。
+
+        Raises:
+            ValueError: 账本加载失败时抛出。
+
+        Returns:
+            bool: 写入成功返回 True，否则返回 False。
+        """
+        return asyncio.run(self._run())
+
+    def _load_ledger(self) -> BeancountHelper:
+        """账本加载，与各阶段同时进行。"""
+        return BeancountHelper(
+            self.bean_path, self.out_bean_path, self.log_obj, self.layout, self.workers
+        )
+
+    def _map(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """规则映射阶段，按需同时导出映射后的 CSV。"""
+        mapped = self.account_mapper.map_frame(chunk, *self._mappings)
+        if self._output is not None:
+            with PROFILER.stage("mapped_write"):
+                self._output.write(mapped)
+        return mapped
+
+    def _convert(self, frame: pd.DataFrame) -> TransactionBatch:
+        """转换阶段，第一块数据到达时按其列名检查管道。"""
+        if self._beancount_mapper is None:
+            self._beancount_mapper = BeancountMapper(
+                frame, self.pipeline, id_index=self.id_index, source=self.source
+            )
+        return self._beancount_mapper.map_batch(frame)
+
+    async def _run_stages(self, writer: TransactionWriter, executor: Executor) -> None:
+        """连接各阶段并等待全部完成，任一阶段出错时取消其余阶段。"""
+        loop = asyncio.get_running_loop()
+        read_queue, map_queue, write_queue = (
+            asyncio.Queue(maxsize=QUEUE_SIZE) for _ in range(3)
+        )
+
+        async def map_stage() -> None:
+            # 规则加载与读取账单同时进行
+            self._mappings = await loop.run_in_executor(
+                executor, self.account_mapper.load_rules
+            )
+            await _consume(self._map, read_queue, map_queue, executor)
+
+        tasks = [
+            asyncio.ensure_future(coroutine)
+            for coroutine in (
+                _produce(self._chunks, read_queue, executor),
+                map_stage(),
+                _consume(self._convert, map_queue, write_queue, executor),
+                _consume(writer.write, write_queue, None, executor),
+            )
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def _run(self) -> bool:
+        loop = asyncio.get_running_loop()
+        writer = TransactionWriter(
+            os.path.dirname(os.path.abspath(self.bean_path)), self.dedup
+        )
+        committing = False
+        if self.export_csv:
+            self._output = self.account_mapper.open_output()
+        try:
+            with ThreadPoolExecutor(
+                max_workers=_THREADS, thread_name_prefix="staged_import"
+            ) as executor:
+                ledger = loop.run_in_executor(executor, self._load_ledger)
+                stages = asyncio.ensure_future(self._run_stages(writer, executor))
+                await asyncio.wait(
+                    (ledger, stages), return_when=asyncio.FIRST_EXCEPTION
+                )
+                if ledger.done() and ledger.exception() is not None:
+                    stages.cancel()
+                    await asyncio.gather(stages, return_exceptions=True)
+                    raise ledger.exception()
+
+                try:
+                    await stages
+                except Exception as e:
+                    self.log_obj.error(f"写入交易记录时发生错误: {e}")
+                    await ledger
+                    return False
+
+                writer.close()
+                beancount_helper = await ledger
+                committing = True
+                written = await loop.run_in_executor(
+                    executor, beancount_helper.commit_written, writer, self.id_index
+                )
+                # 写入被拒绝时不记录命中次数，重试不会重复计数
+                if written:
+                    self.account_mapper.save_rule_stats(self._mappings)
+                return written
+        finally:
+            # 线程池关闭时已等待全部阶段结束，此时才能安全地关闭读取器和临时文件
+            self._chunks.close()
+            if self._output is not None:
+                self._output.close()
+            if not committing:
+                writer.close()
+                if os.path.exists(writer.path):
+                    os.remove(writer.path)
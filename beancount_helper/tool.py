@@ -13,17 +13,20 @@ __copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
 __license__ = None
 
 import os
-import chardet
+import codecs
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
 
 
-def detect_encoding(file_path: str) -> Tuple[str, str]:
+def detect_encoding(file_path: str, sample_size: int = 65536) -> Tuple[str, str]:
     """
     检测指定文件的编码格式，并返回检测结果与执行消息。
 
+    只读取文件开头的 sample_size 字节进行检测，检测耗时与文件大小无关。
+
     Args:
         file_path (str): 要检测编码的文件路径。
+        sample_size (int): 读取的最大字节数。
 
     Returns:
         Tuple[str, str]: 返回一个元组，包含两个字符串：
@@ -45,9 +48,11 @@ def detect_encoding(file_path: str) -> Tuple[str, str]:
         在这种情况下，可能需要手动指定文件的编码格式。
 
     """
+    import chardet
+
     try:
         with open(file_path, "rb") as file:
-            raw_data = file.read()
+            raw_data = file.read(sample_size)
             result = chardet.detect(raw_data)
             encoding = result["encoding"]
             confidence = result["confidence"]
@@ -61,6 +66,89 @@ def detect_encoding(file_path: str) -> Tuple[str, str]:
         return "unknown", f"Error: An I/O error occurred while reading the file: {e}"
 
 
+class BillFormat(NamedTuple):
+    """账单文件格式"""
+
+    encoding: str
+    source: str
+    skiprows: int
+    mapped: bool = False
+
+
+def _decode_sample(sample: bytes, encoding: str) -> Optional[str]:
+    """
+    按指定编码解码文件开头的样本，容忍样本末尾被截断的多字节字符。
+
+    Args:
+        sample (bytes): 文件开头的字节。
+        encoding (str): 编码名称。
+
+    Returns:
+        Optional[str]: 解码结果，编码不匹配时返回 None。
+    """
+    try:
+        return sample.decode(encoding)
+    except UnicodeDecodeError as e:
+        if e.start >= len(sample) - 4 and e.reason in (
+            "unexpected end of data",
+            "incomplete multibyte sequence",
+        ):
+            return sample[: e.start].decode(encoding, errors="ignore")
+        return None
+
+
+def sniff_bill(
+    file_path: str,
+    signatures: Dict[str, Iterable[str]],
+    sample_size: int = 65536,
+) -> Optional[BillFormat]:
+    """
+    只读取文件开头的一段字节，识别账单的编码、数据源和表头所在行。
+
+    依次尝试 utf-8 和 gb18030 严格解码，均失败时再用 chardet 检测；
+    然后逐行查找包含某个数据源全部特征列的表头行。
+
+    Args:
+        file_path (str): 账单文件路径。
+        signatures (Dict[str, Iterable[str]]): 数据源到其账单必有列的映射。
+        sample_size (int): 读取的最大字节数。
+
+    Returns:
+        Optional[BillFormat]: 账单格式，无法识别时返回 None。
+            表头同时包含 debit 和 credit 列时视为映射后的文件（mapped=True）。
+    """
+    with open(file_path, "rb") as file:
+        sample = file.read(sample_size)
+
+    text, encoding = None, None
+    if sample.startswith(codecs.BOM_UTF8):
+        encoding = "utf-8-sig"
+        text = _decode_sample(sample, encoding)
+    for candidate in ("utf8", "gb18030"):
+        if text is not None:
+            break
+        encoding, text = candidate, _decode_sample(sample, candidate)
+    if text is None:
+        import chardet
+
+        encoding = chardet.detect(sample)["encoding"]
+        text = _decode_sample(sample, encoding) if encoding else None
+    if text is None:
+        return None
+
+    for skiprows, line in enumerate(text.splitlines()):
+        cells = {cell.strip() for cell in line.split(",")}
+        for source, columns in signatures.items():
+            if all(column in cells for column in columns):
+                return BillFormat(
+                    encoding=encoding,
+                    source=source,
+                    skiprows=skiprows,
+                    mapped={"debit", "credit"} <= cells,
+                )
+    return None
+
+
 class SingletonMeta(type):
     """
     单例模式的元类实现。
@@ -94,7 +182,8 @@ class AppDataPath(metaclass=SingletonMeta):
     """
     应用程序数据路径管理类。
 
-    根据应用名初始化本地应用程序数据目录，并创建指定的子目录结构。
+    根据应用名确定本地应用程序数据目录，构造时不创建目录，
+    需要写入的命令调用 create_directories 创建指定的子目录结构。
     """
 
     def __init__(self, app_name: str, subdirectory: List[str]):
@@ -109,8 +198,6 @@ class AppDataPath(metaclass=SingletonMeta):
         self.base_path = local_app_data / self.app_name / "data"
         self.subdirectory = subdirectory
 
-        self.create_directories()
-
     def create_directories(self, is_cover: bool = False):
         """
         创建基础目录和所有子目录。
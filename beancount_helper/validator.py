@@ -0,0 +1,251 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : validator.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/22 15:12
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 多进程加载与校验账本
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import os
+import sys
+import glob
+import tempfile
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, List, Sequence, Tuple
+from beancount import loader
+from beancount.core import data
+from beancount.core.number import MISSING
+from beancount.ops import validation
+from beancount.parser import booking, parser
+from beancount.utils import encryption
+from profiler import PROFILER
+
+
+def _self_contained(entry) -> bool:
+    """
+    判断条目的插值结果是否与账户此前的余额无关。
+
+    持有成本的记账需要按账户余额匹配批次，缺少币种的金额需要从账户余额推断币种，
+    这两种记账只能在合并阶段按全账本的顺序插值。
+    """
+    if not isinstance(entry, data.Transaction):
+        return True
+    for posting in entry.postings:
+        if posting.cost is not None:
+            return False
+        units = posting.units
+        if units is not MISSING and units.currency is MISSING:
+            return False
+        price = posting.price
+        if price is not None and price.currency is MISSING:
+            return False
+    return True
+
+
+def _expand_includes(file_path: str, includes: List[str]) -> Tuple[List[str], List]:
+    """按 loader 的规则展开 include（相对所在文件的目录，支持通配符）。"""
+    cwd = os.path.dirname(file_path)
+    expanded, errors = [], []
+    for include in includes:
+        search_path = include if os.path.isabs(include) else os.path.join(cwd, include)
+        matched = glob.glob(search_path, recursive=True)
+        if not matched:
+            errors.append(
+                loader.LoadError(
+                    data.new_metadata("<load>", 0),
+                    f'File glob "{include}" does not match any files',
+                )
+            )
+        expanded.extend(os.path.normpath(os.path.join(cwd, path)) for path in matched)
+    return expanded, errors
+
+
+def _parse_file(file_path: str) -> Tuple[List, List, Dict]:
+    """解析单个文件，支持加密文件。"""
+    if encryption.is_encrypted_file(file_path):
+        return parser.parse_string(encryption.read_encrypted_file(file_path), file_path)
+    return parser.parse_file(file_path)
+
+
+def _check_shard(file_path: str, options_map: Dict) -> Tuple:
+    """
+    工作进程：解析一个账本文件，可以独立插值时一并完成插值和交易平衡检查。
+
+    Args:
+        file_path (str): 文件的绝对路径。
+        options_map (Dict): 主账本的选项。
+
+    Returns:
+        Tuple: (条目, 错误, 该文件的选项, 展开后的 include, 是否已插值)
+    """
+    entries, errors, options_map_file = _parse_file(file_path)
+    includes, include_errors = _expand_includes(
+        file_path, options_map_file["include"]
+    )
+    errors.extend(include_errors)
+
+    booked = all(map(_self_contained, entries))
+    if booked:
+        entries.sort(key=data.entry_sortkey)
+        entries, booking_errors = booking.book(entries, options_map)
+        errors.extend(booking_errors)
+        if not options_map["plugin"]:
+            errors.extend(
+                validation.validate_check_transaction_balances(entries, options_map)
+            )
+    return entries, errors, options_map_file, includes, booked
+
+
+def _mp_context():
+    """有其他线程在运行时（如分阶段导入）fork 可能使子进程死锁，改用 forkserver 启动工作进程。"""
+    if (
+        threading.active_count() > 1
+        and "forkserver" in multiprocessing.get_all_start_methods()
+    ):
+        return multiprocessing.get_context("forkserver")
+    return None
+
+
+def load_ledger(
+    file_path: str, extra_files: Sequence[str] = (), workers: int = None
+) -> Tuple[List, List, Dict]:
+    """
+    加载并校验账本，结果与 loader.load_file 一致。
+
+    主账本在当前进程解析，其引入的各文件在工作进程中并行解析，能独立插值的文件
+    （不含持有成本或缺少币种的记账）同时完成插值和交易平衡检查；合并阶段再按日期
+    排序全部条目，执行 pad、余额断言等插件，并运行账户开闭、币种限制等跨文件的检查。
+    有任何文件不能独立插值、引入的文件不超过一个或只有一个工作进程时，退回到单进程加载。
+
+    Args:
+        file_path (str): 主账本路径。
+        extra_files (Sequence[str]): 追加在主账本末尾引入的文件（如尚未写入账本的临时交易文件）。
+        workers (int): 工作进程数，默认为 CPU 核数。
+
+    Returns:
+        Tuple[List, List, Dict]: (按日期排序的条目, 错误, 选项)
+    """
+    main_path = os.path.normpath(os.path.abspath(file_path))
+    entries, errors, options_map = _parse_file(main_path)
+    includes, include_errors = _expand_includes(main_path, options_map["include"])
+    errors.extend(include_errors)
+    includes.extend(os.path.normpath(os.path.abspath(path)) for path in extra_files)
+
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(includes) <= 1 or not all(map(_self_contained, entries)):
+        return _load_sequential(main_path, extra_files)
+
+    seen = {main_path}
+    shards: List[Future] = []
+    with PROFILER.stage("ledger_parse"):
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(includes)), mp_context=_mp_context()
+        ) as executor:
+            pending = includes
+            while pending:
+                start = len(shards)
+                for include in pending:
+                    if include in seen:
+                        message = f'Duplicate filename parsed: "{include}"'
+                    elif not os.path.exists(include):
+                        message = f'File "{include}" does not exist'
+                    else:
+                        seen.add(include)
+                        shards.append(
+                            executor.submit(_check_shard, include, options_map)
+                        )
+                        continue
+                    errors.append(
+                        loader.LoadError(data.new_metadata("<load>", 0), message)
+                    )
+                # 被引入的文件还可以再引入其他文件，与 loader 一样按层展开
+                pending = [
+                    path for future in shards[start:] for path in future.result()[3]
+                ]
+            results = [future.result() for future in shards]
+
+    if not all(booked for *_, booked in results):
+        return _load_sequential(main_path, extra_files)
+
+    with PROFILER.stage("ledger_merge"):
+        # 主账本自身的条目（多为开户、余额断言等）在当前进程插值
+        entries.sort(key=data.entry_sortkey)
+        entries, booking_errors = booking.book(entries, options_map)
+        errors.extend(booking_errors)
+        if not options_map["plugin"]:
+            errors.extend(
+                validation.validate_check_transaction_balances(entries, options_map)
+            )
+
+        checked = {id(entry) for entry in entries}
+        other_options = []
+        for shard_entries, shard_errors, shard_options, _, _ in results:
+            entries.extend(shard_entries)
+            errors.extend(shard_errors)
+            other_options.append(shard_options)
+            checked.update(id(entry) for entry in shard_entries)
+        entries.sort(key=data.entry_sortkey)
+        options_map["include"] = sorted(seen)
+        options_map = loader.aggregate_options_map(options_map, other_options)
+
+        saved_path = list(sys.path)
+        try:
+            sys.path[0:0] = options_map["pythonpath"]
+            entries, errors = loader.run_transformations(
+                entries, errors, options_map, None
+            )
+        finally:
+            sys.path[:] = saved_path
+
+        # 没有插件时交易不会被改写，已在工作进程中检查过平衡的交易不再重复检查
+        for validator in validation.VALIDATIONS:
+            if (
+                validator is validation.validate_check_transaction_balances
+                and not options_map["plugin"]
+            ):
+                unchecked = [entry for entry in entries if id(entry) not in checked]
+                errors.extend(validator(unchecked, options_map))
+            else:
+                errors.extend(validator(entries, options_map))
+
+        options_map["input_hash"] = loader.compute_input_hash(options_map["include"])
+    return entries, errors, options_map
+
+
+def _load_sequential(main_path: str, extra_files: Sequence[str]) -> Tuple:
+    """
+    单进程加载账本。
+
+    有追加的文件时，在主账本目录下复制主账本（保留顶层的选项和插件）并引入这些文件后加载。
+    """
+    if not extra_files:
+        return loader.load_file(main_path)
+
+    with tempfile.NamedTemporaryFile(
+        mode="w",
+        delete=False,
+        suffix=".bean",
+        dir=os.path.dirname(main_path),
+        encoding="utf-8",
+    ) as check_file:
+        with open(main_path, "r", encoding="utf-8") as main_file:
+            check_file.write(main_file.read())
+        for path in extra_files:
+            check_file.write(f'\ninclude "{os.path.abspath(path)}"\n')
+    cache_path = loader.get_cache_filename(
+        loader.PICKLE_CACHE_FILENAME, check_file.name
+    )
+    try:
+        return loader.load_file(check_file.name)
+    finally:
+        for path in (check_file.name, cache_path):
+            if os.path.exists(path):
+                os.remove(path)
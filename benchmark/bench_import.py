@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : bench_import.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/16 10:48
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 导入流程分阶段基准测试
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import sys
+import copy
+import json
+import time
+import shutil
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "beancount_helper"))
+
+from config import configs
+from tool import sniff_bill
+from mapper import AccountMapper, BeancountMapper
+from conversion import BeancountHelper
+from synthetic import write_bill, write_rules, write_ledger
+
+STAGES = (
+    "sniff",
+    "bill_read",
+    "rule_load",
+    "rule_load_cached",
+    "account_map",
+    "beancount_map",
+    "render",
+    "ledger_load",
+    "commit",
+)
+
+
+@contextmanager
+def timed(timings: Dict[str, float], stage: str) -> Iterator[None]:
+    """记录代码块的耗时（秒）。"""
+    start = time.perf_counter()
+    yield
+    timings[stage] = time.perf_counter() - start
+
+
+def run_case(
+    source: str,
+    rows: int,
+    num_rules: int,
+    work_dir: Path,
+    commit: bool,
+) -> Dict[str, float]:
+    """
+    生成一组合成数据，并依次计时导入流程的各个阶段。
+
+    Args:
+        source (str): 数据源（"wechat" 或 "alipay"）。
+        rows (int): 账单行数。
+        num_rules (int): 费用规则数。
+        work_dir (Path): 存放合成数据的目录。
+        commit (bool): 是否计时账本加载和写入校验阶段。
+
+    Returns:
+        Dict[str, float]: 各阶段耗时（秒），未执行的阶段不出现。
+    """
+    case_dir = work_dir / f"{source}_{rows}_{num_rules}"
+    case_dir.mkdir(parents=True, exist_ok=True)
+    rules = copy.deepcopy(configs["rules"][source])
+    rules["mapping_file"] = str(case_dir / f"{source}_rule.xlsx")
+    bill_path = write_bill(case_dir / "bill.csv", source, rows, num_rules)
+    write_rules(Path(rules["mapping_file"]), rules, num_rules)
+    cache_dir = case_dir / "cache"
+    # 同一规模可能出现在两条曲线中，--work_dir 也可能沿用上次的目录，
+    # 清空缓存保证 rule_load 计时的是未命中缓存的编译
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    timings: Dict[str, float] = {}
+    with timed(timings, "sniff"):
+        bill_format = sniff_bill(
+            bill_path, {source: AccountMapper.bill_columns(rules)}
+        )
+
+    account_mapper = AccountMapper(
+        target_file=bill_path,
+        map=rules,
+        output_file=None,
+        cache_dir=cache_dir,
+        encoding=bill_format.encoding,
+        skiprows=bill_format.skiprows,
+    )
+    with timed(timings, "bill_read"):
+        target_df = account_mapper.read_target()
+    with timed(timings, "rule_load"):
+        account_mapper.load_rules()
+    with timed(timings, "rule_load_cached"):
+        expenses_mapping, assets_mapping = account_mapper.load_rules()
+    with timed(timings, "account_map"):
+        mapped_df = account_mapper.map_frame(
+            target_df, expenses_mapping, assets_mapping
+        )
+    with timed(timings, "beancount_map"):
+        batch = BeancountMapper(mapped_df, rules["pipeline"]).map_to_batch()
+    with timed(timings, "render"):
+        batch.prerender()
+
+    if commit:
+        bean_path = write_ledger(case_dir / "bean" / "moneybook.bean", rules, num_rules)
+        log_obj = logging.getLogger("benchmark")
+        with timed(timings, "ledger_load"):
+            beancount_helper = BeancountHelper(
+                bean_path, case_dir / "bean" / "import.bean", log_obj
+            )
+        with timed(timings, "commit"):
+            if not beancount_helper.write_transaction_list(batch):
+                raise RuntimeError(f"写入失败: {case_dir}")
+    return timings
+
+
+def best_of(
+    repeat: int, source: str, rows: int, num_rules: int, work_dir: Path, commit: bool
+) -> Dict[str, float]:
+    """重复执行 repeat 次，每个阶段取最短耗时。"""
+    runs = [
+        run_case(source, rows, num_rules, work_dir / f"run{number}", commit)
+        for number in range(repeat)
+    ]
+    return {stage: min(run[stage] for run in runs) for stage in runs[0]}
+
+
+def print_table(title: str, results: List[Dict]) -> None:
+    """按阶段打印一条扩展曲线。"""
+    print(f"\n{title}")
+    header = f"{'rows':>9} {'rules':>7} " + " ".join(
+        f"{stage:>16}" for stage in STAGES
+    )
+    print(header + f" {'rows/s':>10}")
+    for result in results:
+        timings = result["timings"]
+        cells = " ".join(
+            f"{timings[stage]:>16.4f}" if stage in timings else f"{'-':>16}"
+            for stage in STAGES
+        )
+        mapping = sum(
+            timings[stage]
+            for stage in ("bill_read", "account_map", "beancount_map", "render")
+        )
+        print(
+            f"{result['rows']:>9} {result['rules']:>7} {cells} "
+            f"{result['rows'] / mapping:>10.0f}"
+        )
+
+
+def parse_arguments() -> argparse.Namespace:
+    """解析命令行参数。"""
+    parser = argparse.ArgumentParser(description="导入流程分阶段基准测试")
+    parser.add_argument("-s", "--source", choices=["wechat", "alipay"], default="wechat")
+    parser.add_argument(
+        "--rows",
+        type=int,
+        nargs="+",
+        default=[1_000, 10_000, 100_000, 1_000_000],
+        help="行数扩展曲线的取值，规则数固定为 --base_rules",
+    )
+    parser.add_argument(
+        "--rules",
+        type=int,
+        nargs="+",
+        default=[10, 100, 1_000, 10_000],
+        help="规则数扩展曲线的取值，行数固定为 --base_rows",
+    )
+    parser.add_argument("--base_rows", type=int, default=10_000)
+    parser.add_argument("--base_rules", type=int, default=100)
+    parser.add_argument(
+        "--commit_limit",
+        type=int,
+        default=100_000,
+        help="行数超过该值时跳过账本加载和写入校验阶段",
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="每组重复次数，取最短耗时")
+    parser.add_argument("-o", "--output", type=str, help="将结果写入 JSON 文件")
+    parser.add_argument("--work_dir", type=str, help="合成数据目录，默认使用临时目录")
+    return parser.parse_args()
+
+
+def main() -> None:
+    """主函数"""
+    args = parse_arguments()
+    logging.getLogger("benchmark").setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = Path(args.work_dir or temp_dir)
+        curves = {
+            "rows": [(rows, args.base_rules) for rows in args.rows],
+            "rules": [(args.base_rows, num_rules) for num_rules in args.rules],
+        }
+        report = {"source": args.source, "curves": {}}
+        for name, cases in curves.items():
+            results = []
+            for rows, num_rules in cases:
+                timings = best_of(
+                    args.repeat,
+                    args.source,
+                    rows,
+                    num_rules,
+                    work_dir,
+                    rows <= args.commit_limit,
+                )
+                results.append({"rows": rows, "rules": num_rules, "timings": timings})
+            report["curves"][name] = results
+            label = "行数" if name == "rows" else "规则数"
+            print_table(f"[{args.source}] 按{label}扩展（秒）", results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入：{args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : bench_startup.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/18 20:15
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 命令行启动时间基准测试
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import os
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+MAIN = Path(__file__).resolve().parent.parent / "beancount_helper" / "main.py"
+
+# 简单命令不需要的较重依赖，出现在导入记录中即视为退化
+HEAVY_MODULES = ("pandas", "numpy", "beancount", "colorlog", "chardet", "openpyxl")
+
+COMMANDS = {
+    "python": ["-c", "pass"],
+    "--help": [str(MAIN), "--help"],
+    "-gc": [str(MAIN), "-gc"],
+    "-sc": [str(MAIN), "-sc"],
+}
+
+
+def measure(arguments: List[str], repeat: int, env: Dict[str, str]) -> List[float]:
+    """
+    多次启动解释器执行命令，返回每次的耗时（毫秒）。
+
+    Args:
+        arguments (List[str]): 解释器参数。
+        repeat (int): 执行次数。
+        env (Dict[str, str]): 环境变量。
+
+    Returns:
+        List[float]: 每次的耗时（毫秒）。
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, *arguments],
+            env=env,
+            check=True,
+            stdout=subprocess.DEVNULL,
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def heavy_imports(arguments: List[str], env: Dict[str, str]) -> List[str]:
+    """
+    使用 -X importtime 执行命令，返回被导入的较重依赖。
+
+    Args:
+        arguments (List[str]): 解释器参数。
+        env (Dict[str, str]): 环境变量。
+
+    Returns:
+        List[str]: 被导入的较重依赖的顶层包名。
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", *arguments],
+        env=env,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    loaded = set()
+    for line in result.stderr.splitlines():
+        module = line.rsplit("|", 1)[-1].strip()
+        if module.split(".")[0] in HEAVY_MODULES:
+            loaded.add(module.split(".")[0])
+    return sorted(loaded)
+
+
+def main() -> None:
+    """主函数"""
+    parser = argparse.ArgumentParser(description="命令行启动时间基准测试")
+    parser.add_argument("--repeat", type=int, default=10, help="每个命令的执行次数")
+    parser.add_argument(
+        "--target_ms",
+        type=float,
+        default=150.0,
+        help="简单命令启动时间（中位数）的目标上限，超过时以非零状态退出",
+    )
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as temp_dir:
+        env = dict(os.environ, LOCALAPPDATA=temp_dir)
+        print(f"{'command':>8} {'min(ms)':>9} {'median(ms)':>11}  heavy imports")
+        for name, arguments in COMMANDS.items():
+            timings = measure(arguments, args.repeat, env)
+            median = statistics.median(timings)
+            loaded = heavy_imports(arguments, env) if name != "python" else []
+            print(
+                f"{name:>8} {min(timings):>9.1f} {median:>11.1f}  "
+                f"{', '.join(loaded) or '-'}"
+            )
+            if name != "python" and (median > args.target_ms or loaded):
+                failed = True
+
+        if any(Path(temp_dir).iterdir()):
+            print("简单命令在应用数据目录中创建了文件")
+            failed = True
+
+    print(f"\n目标：{args.target_ms:.0f} ms，{'未达到' if failed else '已达到'}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
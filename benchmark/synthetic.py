@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : synthetic.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/16 10:05
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 合成账单、规则表和账本，供基准测试使用
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Dict, List
+
+# 各数据源的账单格式：表头前的说明行、列名、编码以及收/支取值
+BILL_FORMATS: Dict[str, Dict] = {
+    "wechat": {
+        "encoding": "utf8",
+        "preamble": ["微信支付账单明细"]
+        + [f"微信昵称：[bench],导出信息{i}" for i in range(14)]
+        + ["----------------------微信支付账单明细列表--------------------"],
+        "columns": [
+            "交易时间",
+            "交易类型",
+            "交易对方",
+            "商品",
+            "收/支",
+            "金额(元)",
+            "支付方式",
+            "当前状态",
+            "交易单号",
+            "商户单号",
+            "备注",
+        ],
+        "type_column": "交易类型",
+        "goods_column": "商品",
+        "payment_column": "支付方式",
+        "amount_prefix": "¥",
+        "directions": ["支出", "支出", "支出", "收入", "/"],
+    },
+    "alipay": {
+        "encoding": "gb18030",
+        "preamble": ["支付宝交易明细"]
+        + [f"导出信息{i}" for i in range(22)]
+        + ["-" * 84],
+        "columns": [
+            "交易时间",
+            "交易分类",
+            "交易对方",
+            "对方账号",
+            "商品说明",
+            "收/支",
+            "金额",
+            "收/付款方式",
+            "交易状态",
+            "交易订单号",
+            "商家订单号",
+            "备注",
+        ],
+        "type_column": "交易分类",
+        "goods_column": "商品说明",
+        "payment_column": "收/付款方式",
+        "amount_prefix": "",
+        "directions": ["支出", "支出", "支出", "收入", "不计收支"],
+    },
+}
+
+TRANSACTION_TYPES = ["商户消费", "扫二维码付款", "转账", "微信红包", "退款", "餐饮美食"]
+GOODS = ["/", "午餐", "晚餐", "打车", "咖啡", "日用品", "话费充值"]
+EXPENSE_CATEGORIES = 50
+
+
+def merchant_name(number: int) -> str:
+    """第 number 个合成商户的名称。"""
+    return f"商户{number:05d}"
+
+
+def payment_name(number: int) -> str:
+    """第 number 个合成支付方式的名称。"""
+    return f"银行{number}({1000 + number})"
+
+
+def payment_count(num_rules: int) -> int:
+    """规则数为 num_rules 时的支付方式数量。"""
+    return max(4, num_rules // 10)
+
+
+def write_bill(
+    path: Path, source: str, rows: int, num_rules: int, seed: int = 0
+) -> Path:
+    """
+    生成合成账单，格式与微信/支付宝导出的账单一致（含表头前的说明行）。
+
+    交易对方从比规则数多 25% 的商户中抽取，因此大约 80% 的交易能命中费用规则。
+
+    Args:
+        path (Path): 输出文件路径。
+        source (str): 数据源（"wechat" 或 "alipay"）。
+        rows (int): 交易行数。
+        num_rules (int): 规则表的费用规则数，决定商户和支付方式的数量。
+        seed (int): 随机数种子。
+
+    Returns:
+        Path: 输出文件路径。
+    """
+    bill_format = BILL_FORMATS[source]
+    rng = np.random.default_rng(seed)
+
+    seconds = np.sort(rng.integers(0, 365 * 24 * 3600, rows))[::-1]
+    times = pd.Timestamp("2025-01-01") + pd.to_timedelta(seconds, unit="s")
+    merchants = rng.integers(0, max(num_rules * 5 // 4, 1), rows)
+    payments = rng.integers(0, payment_count(num_rules), rows)
+    cents = rng.integers(1, 100000, rows)
+    ids = np.arange(rows) + seed * rows
+
+    columns = bill_format["columns"]
+    frame = pd.DataFrame(
+        {
+            "交易时间": times.strftime("%Y-%m-%d %H:%M:%S"),
+            bill_format["type_column"]: np.array(TRANSACTION_TYPES)[
+                rng.integers(0, len(TRANSACTION_TYPES), rows)
+            ],
+            "交易对方": [merchant_name(number) for number in merchants],
+            bill_format["goods_column"]: np.array(GOODS)[
+                rng.integers(0, len(GOODS), rows)
+            ],
+            "收/支": np.array(bill_format["directions"])[
+                rng.integers(0, len(bill_format["directions"]), rows)
+            ],
+            columns[columns.index("收/支") + 1]: [
+                f"{bill_format['amount_prefix']}{cent // 100}.{cent % 100:02d}"
+                for cent in cents
+            ],
+            bill_format["payment_column"]: [
+                payment_name(number) for number in payments
+            ],
+            columns[-4]: "支付成功" if source == "wechat" else "交易成功",
+            columns[-3]: [f"4200{number:024d}\t" for number in ids],
+            columns[-2]: [f"1000{number:016d}\t" for number in ids],
+            "备注": "/",
+        }
+    )
+    if "对方账号" in columns:
+        frame["对方账号"] = "/"
+    frame = frame[columns]
+
+    with open(path, "w", encoding=bill_format["encoding"], newline="") as file:
+        separators = "," * (len(columns) - 1)
+        for line in bill_format["preamble"]:
+            file.write(f"{line}{separators}\n")
+        frame.to_csv(file, index=False, lineterminator="\n")
+    return path
+
+
+def expense_account(number: int) -> str:
+    """第 number 条费用规则映射到的账户。"""
+    return f"Expenses:Bench:Cat{number % EXPENSE_CATEGORIES:02d}"
+
+
+def asset_account(number: int) -> str:
+    """第 number 种支付方式映射到的账户。"""
+    return f"Assets:Bench:Card{number:04d}"
+
+
+def write_rules(path: Path, rules: Dict, num_rules: int) -> Path:
+    """
+    生成规则表，表头与 init.py 初始化的规则表一致。
+
+    费用规则轮流使用三种模式：只匹配交易对方、交易类型 + 交易对方、交易对方 + 商品，
+    资产规则按支付方式逐一映射。
+
+    Args:
+        path (Path): 输出文件路径。
+        rules (Dict): 数据源的规则配置（提供匹配列）。
+        num_rules (int): 费用规则数。
+
+    Returns:
+        Path: 输出文件路径。
+    """
+    type_column, peer_column, goods_column = rules["match_columns"]["expenses"][
+        "columns"
+    ]
+    expenses = [
+        {
+            "编号": number + 1,
+            type_column: TRANSACTION_TYPES[0] if number % 3 == 1 else None,
+            peer_column: merchant_name(number),
+            goods_column: GOODS[number % len(GOODS)] if number % 3 == 2 else None,
+            "值": expense_account(number),
+            "备注": None,
+        }
+        for number in range(num_rules)
+    ]
+
+    payment_column = rules["match_columns"]["assets"]["columns"][-1]
+    assets = [
+        {
+            "编号": number + 1,
+            payment_column: payment_name(number),
+            "值": asset_account(number),
+            "备注": None,
+        }
+        for number in range(payment_count(num_rules))
+    ]
+
+    with pd.ExcelWriter(path) as writer:
+        pd.DataFrame(expenses).to_excel(writer, sheet_name="Expenses", index=False)
+        pd.DataFrame(assets).to_excel(writer, sheet_name="Assets", index=False)
+    return path
+
+
+def write_ledger(path: Path, rules: Dict, num_rules: int) -> Path:
+    """
+    生成只包含开户条目的主账本，覆盖规则表和默认值中出现的全部账户。
+
+    Args:
+        path (Path): 输出文件路径。
+        rules (Dict): 数据源的规则配置（提供默认账户）。
+        num_rules (int): 费用规则数。
+
+    Returns:
+        Path: 输出文件路径。
+    """
+    accounts: List[str] = [
+        rules["match_columns"]["expenses"]["default"],
+        rules["match_columns"]["assets"]["default"],
+    ]
+    accounts += [expense_account(number) for number in range(EXPENSE_CATEGORIES)]
+    accounts += [asset_account(number) for number in range(payment_count(num_rules))]
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        file.write('option "operating_currency" "CNY"\n\n')
+        for account in dict.fromkeys(accounts):
+            file.write(f"2020-01-01 open {account}\n")
+    return path
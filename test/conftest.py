@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : conftest.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/26 20:10
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 测试公共配置
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import sys
+import random
+import itertools
+import pandas as pd
+import pytest
+from pathlib import Path
+
+# 各模块之间按顶层模块名互相引用，与直接运行 main.py 时一致
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "beancount_helper"))
+
+PEERS = ["美团", "美团外卖", "美团外卖-1店", "滴滴", "滴滴出行", "bb", None]
+REGEXES = [
+    "^美团",
+    "美团外卖",
+    "外卖-\\d店",
+    "\\d",
+    "滴滴|高德",
+    "(?i)BB",
+    "(b)\\1",
+    "出行$",
+    "美.*店",
+    "(?P<x>滴)",
+]
+
+
+@pytest.fixture
+def random_table():
+    """随机生成包含各种匹配方式和优先级的规则表（交易类型、交易对方、商品三列）。"""
+
+    def _random_table(seed: int, size: int = 300) -> pd.DataFrame:
+        rnd = random.Random(seed)
+        rows = []
+        for number in range(size):
+            match_type = rnd.choice([None, None, "包含", "前缀", "正则", "正则"])
+            peer = rnd.choice(REGEXES) if match_type == "正则" else rnd.choice(PEERS)
+            rows.append(
+                {
+                    "编号": number,
+                    "交易类型": rnd.choice(["消费", "转账", None]),
+                    "交易对方": peer,
+                    "商品": rnd.choice(["咖啡", "美团外卖", None]),
+                    "值": f"Expenses:R{number}",
+                    "匹配方式": match_type,
+                    "优先级": rnd.choice([None, 1]),
+                }
+            )
+        return pd.DataFrame(rows)
+
+    return _random_table
+
+
+@pytest.fixture
+def transactions() -> pd.DataFrame:
+    """交易类型、交易对方、商品三列取值的全部组合。"""
+    types = ["消费", "转账", "其他"]
+    peers = [
+        "美团",
+        "美团外卖",
+        "美团外卖-1店",
+        "美团外卖-2店",
+        "小美团",
+        "滴滴",
+        "滴滴出行",
+        "高德",
+        "BB",
+        "bb",
+        "z",
+    ]
+    goods = ["咖啡", "美团外卖", "x"]
+    return pd.DataFrame(
+        list(itertools.product(types, peers, goods)),
+        columns=["交易类型", "交易对方", "商品"],
+        dtype=object,
+    )
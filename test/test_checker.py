@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : test_checker.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/26 21:02
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 增量格式检查测试
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import pytest
+from beancount import loader
+from checker import LedgerChecker
+
+LEDGER = """\
+option "operating_currency" "CNY"
+
+2025-01-01 open Assets:Bank CNY
+2025-01-01 open Assets:Card CNY
+2025-01-01 open Expenses:Food
+2025-01-01 open Expenses:Old
+2025-02-01 close Expenses:Old
+
+2025-01-02 * "商户" "备注"
+\tExpenses:Food\t\t\t10.00 CNY
+\tAssets:Bank\t\t\t-10.00 CNY
+
+2025-03-01 balance Assets:Bank  -10.00 CNY
+"""
+
+TRANSACTIONS = {
+    "valid": """
+2025-01-10 * "商户" "备注"
+\tExpenses:Food\t\t\t10.00 CNY
+\tAssets:Card\t\t\t-10.00 CNY
+""",
+    "unknown_account": """
+2025-01-10 * "商户" "备注"
+\tExpenses:Unknown\t\t\t10.00 CNY
+\tAssets:Card\t\t\t-10.00 CNY
+""",
+    "closed_account": """
+2025-01-10 * "商户" "备注"
+\tExpenses:Food\t\t\t10.00 CNY
+\tAssets:Card\t\t\t-10.00 CNY
+
+2025-02-10 * "商户" "备注"
+\tExpenses:Old\t\t\t0.00 CNY
+\tAssets:Card\t\t\t-0.00 CNY
+""",
+    "currency": """
+2025-01-10 * "商户" "备注"
+\tExpenses:Food\t\t\t10.00 USD
+\tAssets:Card\t\t\t-10.00 USD
+""",
+    "unbalanced": """
+2025-01-10 * "商户" "备注"
+\tExpenses:Food\t\t\t10.00 CNY
+\tAssets:Card\t\t\t-9.00 CNY
+""",
+    "balance": """
+2025-01-10 * "商户" "备注"
+\tExpenses:Food\t\t\t20.00 CNY
+\tAssets:Bank\t\t\t-20.00 CNY
+""",
+    "syntax": """
+2025-01-10 * "商户" "备注
+\tExpenses:Food\t\t\t10.00 CNY
+\tAssets:Card\t\t\t-10.00 CNY
+""",
+}
+
+
+def _key(error, new_file) -> tuple:
+    """错误的比较键：是否位于新文件、行号、类型和信息。"""
+    source = error.source or {}
+    return (
+        source.get("filename") == str(new_file),
+        source.get("lineno"),
+        type(error).__name__,
+        error.message,
+    )
+
+
+@pytest.mark.parametrize("case", sorted(TRANSACTIONS))
+def test_check_matches_load_file(tmp_path, case):
+    """增量检查与加载整个账本报告的错误一致。"""
+    main_file = tmp_path / "main.bean"
+    main_file.write_text(LEDGER, encoding="utf-8")
+    new_file = tmp_path / "new.bean"
+    new_file.write_text(TRANSACTIONS[case], encoding="utf-8")
+    full_file = tmp_path / "full.bean"
+    full_file.write_text(f'{LEDGER}\ninclude "{new_file.name}"\n', encoding="utf-8")
+
+    entries, errors, options_map = loader.load_file(str(main_file))
+    assert not errors
+    checker = LedgerChecker(entries, options_map)
+    new_entries, parse_errors = checker.parse(str(new_file))
+    assert checker.can_check(new_entries)
+    errors = parse_errors + (checker.check(new_entries) if not parse_errors else [])
+
+    _, expected, _ = loader.load_file(str(full_file))
+    assert sorted(map(lambda error: _key(error, new_file), errors)) == sorted(
+        map(lambda error: _key(error, new_file), expected)
+    )
+    assert bool(errors) == (case != "valid")
+
+
+def test_pad_requires_full_check(tmp_path):
+    """受影响的余额断言之前有 pad 时不能增量检查。"""
+    main_file = tmp_path / "main.bean"
+    main_file.write_text(
+        LEDGER.replace(
+            "2025-03-01 balance Assets:Bank  -10.00 CNY",
+            "2025-01-05 open Equity:Opening\n"
+            "2025-02-15 pad Assets:Bank Equity:Opening\n"
+            "2025-03-01 balance Assets:Bank  -30.00 CNY",
+        ),
+        encoding="utf-8",
+    )
+    new_file = tmp_path / "new.bean"
+    new_file.write_text(TRANSACTIONS["balance"], encoding="utf-8")
+
+    entries, errors, options_map = loader.load_file(str(main_file))
+    assert not errors
+    checker = LedgerChecker(entries, options_map)
+    new_entries, _ = checker.parse(str(new_file))
+    assert not checker.can_check(new_entries)
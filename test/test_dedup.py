@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : test_dedup.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/27 20:15
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 跨数据源重复交易检测测试
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import logging
+import pandas as pd
+from decimal import Decimal
+from conversion import TransactionBatch
+from dedup import Deduplicator, TransactionHistory
+
+LOG = logging.getLogger("test_dedup")
+
+
+def _batch(source: str, rows: list) -> TransactionBatch:
+    """由 (时间, 金额, 收支, 交易单号) 列表创建交易批次。"""
+    return TransactionBatch(
+        {
+            "date": ["2025-01-01"] * len(rows),
+            "description": ["商户"] * len(rows),
+            "time": [row[0] for row in rows],
+            "amount": [Decimal(row[1]) for row in rows],
+            "direction": [row[2] for row in rows],
+            "index": [row[3] for row in rows],
+        },
+        source,
+    )
+
+
+def _import(history_dir, source: str, rows: list) -> list:
+    """以 suppress 模式导入一个批次并提交，返回写入的交易单号。"""
+    dedup = Deduplicator(TransactionHistory(history_dir), 120, "suppress", LOG)
+    batch = dedup.filter(_batch(source, rows))
+    dedup.commit()
+    return batch.columns["index"]
+
+
+def test_one_to_one_pairing(tmp_path):
+    """每笔已有交易只与时间最接近的一笔新交易配对，争用失败的改配其他交易。"""
+    _import(
+        tmp_path,
+        "alipay",
+        [(1000, "50.00", "支出", "a1"), (1100, "50.00", "支出", "a2")],
+    )
+    dedup = Deduplicator(TransactionHistory(tmp_path), 120, "report", LOG)
+    new = pd.DataFrame(
+        {
+            "time": [1010, 1020, 1500],
+            "amount": [5000, 5000, 5000],
+            "direction": ["支出", "支出", "支出"],
+        }
+    )
+    pool = dedup._pool("wechat", 900, 1600)
+    pairs = dedup.match(new, pool)
+    assert [(row, pool["index"][key]) for row, key in pairs] == [
+        (0, "a1"),
+        (1, "a2"),
+    ]
+
+
+def test_direction_and_window(tmp_path):
+    """收支方向不同或超出时间窗口的交易不配对。"""
+    _import(tmp_path, "alipay", [(1000, "50.00", "支出", "a1")])
+    assert _import(
+        tmp_path,
+        "wechat",
+        [(1010, "50.00", "收入", "w1"), (2000, "50.00", "支出", "w2")],
+    ) == ["w1", "w2"]
+    assert _import(tmp_path, "wechat", [(1005, "50.00", "支出", "w3")]) == []
+
+
+def test_matched_persisted(tmp_path):
+    """配对过的交易记录在 matched.csv 中，以后的导入不再与之配对。"""
+    _import(tmp_path, "alipay", [(1000, "50.00", "支出", "a1")])
+    assert _import(tmp_path, "wechat", [(1005, "50.00", "支出", "w1")]) == []
+
+    matched = pd.read_csv(tmp_path / "matched.csv", dtype=str)
+    assert matched["index"].tolist() == ["a1"]
+    assert len(TransactionHistory(tmp_path).matched) == 1
+
+    assert _import(tmp_path, "wechat", [(1006, "50.00", "支出", "w2")]) == ["w2"]
+    assert len(pd.read_csv(tmp_path / "matched.csv")) == 1
+
+
+def test_uncommitted_import_not_recorded(tmp_path):
+    """未提交（写入失败）的导入不更新记录文件。"""
+    _import(tmp_path, "alipay", [(1000, "50.00", "支出", "a1")])
+    dedup = Deduplicator(TransactionHistory(tmp_path), 120, "suppress", LOG)
+    assert len(dedup.filter(_batch("wechat", [(1005, "50.00", "支出", "w1")]))) == 0
+
+    assert not (tmp_path / "matched.csv").exists()
+    assert len(TransactionHistory(tmp_path)) == 1
+    assert _import(tmp_path, "wechat", [(1005, "50.00", "支出", "w1")]) == []
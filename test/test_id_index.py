@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : test_id_index.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/27 19:40
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 交易单号索引测试
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+from decimal import Decimal
+from beancount import loader
+from conversion import Transaction, TransactionBatch
+from id_index import TransactionIdIndex
+
+HEADER = """\
+2025-01-01 open Assets:Bank CNY
+2025-01-01 open Expenses:Food
+"""
+
+LEGACY = """
+2025-01-02 * "商户" "备注 | 4200000000000000000001 | wechat"
+\tExpenses:Food\t\t\t1.00 CNY
+\tAssets:Bank\t\t\t-1.00 CNY
+
+2025-01-03 * "商户" "a | b | 4200000000000000000002 | wechat"
+\tExpenses:Food\t\t\t1.00 CNY
+\tAssets:Bank\t\t\t-1.00 CNY
+
+2025-01-04 * "商户" "备注 | / | wechat"
+\tExpenses:Food\t\t\t1.00 CNY
+\tAssets:Bank\t\t\t-1.00 CNY
+
+2025-01-05 * "商户" "午餐 | wechat"
+\tExpenses:Food\t\t\t1.00 CNY
+\tAssets:Bank\t\t\t-1.00 CNY
+
+2025-01-06 * "商户" "2025000000000000000003 | alipay"
+\tExpenses:Food\t\t\t1.00 CNY
+\tAssets:Bank\t\t\t-1.00 CNY
+"""
+
+
+def _transaction(index: str, source: str = None) -> Transaction:
+    return Transaction(
+        date="2025-01-07",
+        status="*",
+        description="商户",
+        debit="Expenses:Food",
+        credit="Assets:Bank",
+        amount=Decimal("1.00"),
+        currency="CNY",
+        remark="备注 / 分账 | wechat",
+        index=index,
+        source=source,
+    )
+
+
+def _rebuild(tmp_path, text: str, source: str = "wechat") -> set:
+    ledger = tmp_path / "main.bean"
+    ledger.write_text(HEADER + text, encoding="utf-8")
+    entries, errors, _ = loader.load_file(str(ledger))
+    assert not errors
+    id_index = TransactionIdIndex(tmp_path / "index", source)
+    id_index.rebuild(entries)
+    return id_index.ids
+
+
+def test_rebuild_from_legacy_narration(tmp_path):
+    """没有元数据的旧账本从描述中取符合单号格式的一段。"""
+    assert _rebuild(tmp_path, LEGACY) == {
+        "4200000000000000000001",
+        "4200000000000000000002",
+    }
+    assert _rebuild(tmp_path, LEGACY, "alipay") == {"2025000000000000000003"}
+
+
+def test_rebuild_from_metadata(tmp_path):
+    """逐笔写入和按批次写入的交易记录相同的元数据，重建时都能取回。"""
+    single = _transaction("4200000000000000000004", "wechat")
+    batch = TransactionBatch.from_transactions(
+        [_transaction("4200000000000000000005")], "wechat"
+    )
+    other = TransactionBatch.from_transactions(
+        [_transaction("4200000000000000000006")], "alipay"
+    )
+    assert single.get_str() == TransactionBatch.from_transactions([single]).render()
+
+    text = single.get_str() + batch.render() + other.render()
+    assert _rebuild(tmp_path, text) == {
+        "4200000000000000000004",
+        "4200000000000000000005",
+    }
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : test_rule.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/26 20:14
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 规则索引测试
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import re
+import random
+import numpy as np
+import pandas as pd
+import pytest
+import rule
+from rule import (
+    RuleIndex,
+    combine_regexes,
+    parse_rules,
+    required_literal,
+    _verify_conditions,
+)
+
+COLUMNS = ["交易类型", "交易对方", "商品"]
+PATTERN_COLUMNS = ["交易对方", "商品"]
+
+
+def _brute_force(rules, frame: pd.DataFrame) -> np.ndarray:
+    """逐条规则按顺序校验，取第一条满足全部条件的规则。"""
+    return np.array(
+        [
+            next(
+                (
+                    position
+                    for position, rule in enumerate(rules)
+                    if rule.conditions and _verify_conditions(rule.conditions, row)
+                ),
+                len(rules),
+            )
+            for row in frame.to_dict(orient="records")
+        ]
+    )
+
+
+def _find_all(rule_index: RuleIndex, frame: pd.DataFrame) -> np.ndarray:
+    positions = [rule_index.find(row) for row in frame.to_dict(orient="records")]
+    return np.array(
+        [len(rule_index) if position is None else position for position in positions]
+    )
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_find_matches_brute_force(seed, random_table, transactions):
+    """find 和 find_frame 与逐条校验的首个匹配一致，按命中次数调整顺序后仍一致。"""
+    table = random_table(seed)
+    rules = parse_rules(table, COLUMNS, PATTERN_COLUMNS)
+    rule_index = RuleIndex(table, COLUMNS, PATTERN_COLUMNS)
+    frame = transactions
+    expected = _brute_force(rules, frame)
+
+    rnd = random.Random(seed)
+    for _ in range(3):
+        np.testing.assert_array_equal(rule_index.find_frame(frame), expected)
+        np.testing.assert_array_equal(_find_all(rule_index, frame), expected)
+        rule_index.reorder([rnd.randint(0, 50) for _ in range(len(rule_index))])
+
+
+def test_priority_before_table_order():
+    """优先级高的规则先于表格中靠前的规则。"""
+    table = pd.DataFrame(
+        {
+            "编号": [1, 2],
+            "值": ["Expenses:A", "Expenses:B"],
+            "交易对方": ["美团", "美团"],
+            "匹配方式": ["包含", None],
+            "优先级": [None, 1],
+        }
+    )
+    rule_index = RuleIndex(table, ["交易对方"], ["交易对方"])
+    assert rule_index.match({"交易对方": "美团"}) == (2, "Expenses:B")
+    assert rule_index.match({"交易对方": "小美团"}) == (1, "Expenses:A")
+
+
+@pytest.mark.parametrize(
+    "patterns, text, expected",
+    [
+        # 全局内联标志只能出现在表达式开头
+        (["(?i)abc", "xyz"], "ABC", 1),
+        # 两条规则使用相同的分组名
+        (["(?P<name>a)b", "(?P<name>c)d"], "cd", 2),
+        # 合并后分组编号会变化，反向引用必须按原表达式匹配
+        (["x(y)", "(b)\\1"], "bb", 2),
+        (["x(y)", "(b)\\1"], "ba", None),
+        # 可以合并的表达式
+        (["^ab", "cd$"], "xcd", 2),
+    ],
+)
+def test_regex_rules_edge_cases(patterns, text, expected):
+    """不能安全合并的正则仍按各自的含义匹配。"""
+    table = pd.DataFrame(
+        {
+            "编号": range(1, len(patterns) + 1),
+            "值": [f"Expenses:R{number}" for number in range(len(patterns))],
+            "交易对方": patterns,
+            "匹配方式": "正则",
+        }
+    )
+    rule_index = RuleIndex(table, ["交易对方"], ["交易对方"])
+    match = rule_index.match({"交易对方": text})
+    assert (match[0] if match else None) == expected
+    positions = rule_index.find_frame(pd.DataFrame({"交易对方": [text]}))
+    assert positions[0] == (len(rule_index) if expected is None else expected - 1)
+
+
+def test_numeric_exact_condition():
+    """模式规则中精确匹配列的数字单元格不作为锚点。"""
+    table = pd.DataFrame(
+        {
+            "编号": [1, 2],
+            "值": ["Expenses:A", "Expenses:B"],
+            "交易类型": [123, 456],
+            "交易对方": ["美团", "^滴"],
+            "匹配方式": ["包含", "正则"],
+        }
+    )
+    rule_index = RuleIndex(table, ["交易类型", "交易对方"], ["交易对方"])
+    assert rule_index.match({"交易类型": 123, "交易对方": "小美团"}) == (
+        1,
+        "Expenses:A",
+    )
+    assert rule_index.match({"交易类型": 456, "交易对方": "滴滴"}) == (2, "Expenses:B")
+    assert rule_index.match({"交易类型": 123, "交易对方": "滴滴"}) is None
+
+
+def test_combine_regexes():
+    """只合并没有分组和全局内联标志的正则。"""
+    assert combine_regexes([re.compile("a+"), re.compile("(?i:b)c")]) is not None
+    assert combine_regexes([re.compile("a"), re.compile("(?i)b")]) is None
+    assert combine_regexes([re.compile("(a)")]) is None
+    assert combine_regexes([re.compile("(?P<x>a)")]) is None
+    assert combine_regexes([]) is None
+
+
+def test_invalid_regex():
+    """无效的正则表达式抛出 ValueError。"""
+    table = pd.DataFrame(
+        {"编号": [1], "值": ["Expenses:A"], "交易对方": ["a("], "匹配方式": ["正则"]}
+    )
+    with pytest.raises(ValueError):
+        RuleIndex(table, ["交易对方"], ["交易对方"])
+
+
+@pytest.mark.parametrize(
+    "pattern, literal",
+    [
+        ("^商户12$", "商户12"),
+        ("商户1.*店", "商户1"),
+        ("ab*cd", "cd"),
+        ("x\\.y+", "x."),
+        ("a|bc", None),
+        ("(?i)abc", None),
+        ("a(?i:bc)d", "a"),
+        ("\\d+", None),
+    ],
+)
+def test_required_literal(pattern, literal):
+    """只取最外层连续的普通字符。"""
+    assert required_literal(re.compile(pattern)) == literal
+
+
+def test_required_literal_without_parser(monkeypatch):
+    """内部解析器不可用时不提取字面量，规则仍能匹配。"""
+    monkeypatch.setattr(rule, "_LITERAL", None)
+    assert required_literal(re.compile("^商户12$")) is None
+    table = pd.DataFrame(
+        {
+            "编号": [1],
+            "值": ["Expenses:A"],
+            "交易对方": ["商户1.*店"],
+            "匹配方式": "正则",
+        }
+    )
+    rule_index = RuleIndex(table, ["交易对方"], ["交易对方"])
+    assert rule_index.match({"交易对方": "商户12店"}) == (1, "Expenses:A")
+    assert rule_index.match({"交易对方": "商户2店"}) is None
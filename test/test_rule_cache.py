@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : test_rule_cache.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/26 20:31
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 规则缓存测试
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import pickle
+import pandas as pd
+import pytest
+from mapper import _valid_rules
+from rule import RuleIndex
+from rule_cache import RuleCache
+
+MATCH_COLUMNS = {"expenses": {"columns": ["交易对方"]}}
+
+
+def _rules():
+    table = pd.DataFrame(
+        {
+            "编号": [1, 2],
+            "值": ["Expenses:A", "Expenses:B"],
+            "交易对方": ["美团", "滴滴"],
+        }
+    )
+    return (
+        RuleIndex(table, ["交易对方"]),
+        RuleIndex(table, ["交易对方"]),
+    )
+
+
+@pytest.fixture
+def mapping_file(tmp_path):
+    path = tmp_path / "wechat_rule.xlsx"
+    path.write_bytes(b"rules")
+    return path
+
+
+def test_roundtrip(tmp_path, mapping_file):
+    """规则文件未变化时命中缓存。"""
+    cache = RuleCache(tmp_path / "cache")
+    cache.save(mapping_file, MATCH_COLUMNS, _rules())
+    rules = cache.load(mapping_file, MATCH_COLUMNS, _valid_rules)
+    assert rules is not None
+    assert rules[0].match({"交易对方": "滴滴"}) == (2, "Expenses:B")
+
+
+def test_changed_file_or_columns(tmp_path, mapping_file):
+    """规则文件内容或匹配列变化时缓存失效。"""
+    cache = RuleCache(tmp_path / "cache")
+    cache.save(mapping_file, MATCH_COLUMNS, _rules())
+    assert cache.load(mapping_file, {"expenses": {"columns": []}}) is None
+    mapping_file.write_bytes(b"changed rules")
+    assert cache.load(mapping_file, MATCH_COLUMNS) is None
+
+
+def test_stale_rule_index(tmp_path, mapping_file):
+    """版本号相同但缺少属性的旧规则索引视为未命中。"""
+    rules = _rules()
+    for rule_index in rules:
+        del rule_index.order
+        del rule_index.exclusive
+    cache = RuleCache(tmp_path / "cache")
+    cache.save(mapping_file, MATCH_COLUMNS, rules)
+    assert cache.load(mapping_file, MATCH_COLUMNS) is not None
+    assert cache.load(mapping_file, MATCH_COLUMNS, _valid_rules) is None
+
+
+def test_old_version(tmp_path, mapping_file):
+    """旧版本写入的缓存视为未命中。"""
+    cache = RuleCache(tmp_path / "cache")
+    cache.save(mapping_file, MATCH_COLUMNS, _rules())
+    cache_path = cache.get_path(mapping_file)
+    payload = pickle.loads(cache_path.read_bytes())
+    payload["version"] = RuleCache.VERSION - 1
+    cache_path.write_bytes(pickle.dumps(payload))
+    assert cache.load(mapping_file, MATCH_COLUMNS, _valid_rules) is None
+
+
+def test_corrupt_cache(tmp_path, mapping_file):
+    """损坏的缓存文件视为未命中。"""
+    cache = RuleCache(tmp_path / "cache")
+    cache.save(mapping_file, MATCH_COLUMNS, _rules())
+    cache.get_path(mapping_file).write_bytes(b"not a pickle")
+    assert cache.load(mapping_file, MATCH_COLUMNS, _valid_rules) is None
+    assert not _valid_rules(("not", "rules"))
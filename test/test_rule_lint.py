@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : test_rule_lint.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/26 20:46
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 规则检查测试
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import random
+import pandas as pd
+import pytest
+import rule_lint
+from rule import RuleIndex, parse_rules
+from rule_lint import lint_rules, _covers, _signature
+
+COLUMNS = ["交易类型", "交易对方", "商品"]
+PATTERN_COLUMNS = ["交易对方", "商品"]
+
+
+def _brute_force_shadowed(table: pd.DataFrame) -> set:
+    """两两比较，找出被前面的规则覆盖的规则编号。"""
+    rules = parse_rules(table, COLUMNS, PATTERN_COLUMNS)
+    signatures = {}
+    shadowed = set()
+    for position, rule in enumerate(rules):
+        if not rule.conditions:
+            continue
+        if signatures.setdefault(_signature(rule.conditions), position) != position:
+            continue
+        if any(
+            rules[other].conditions
+            and _covers(rules[other].conditions, rule.conditions)
+            for other in range(position)
+        ):
+            shadowed.add(rule.id)
+    return shadowed
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_shadowed_matches_brute_force(seed, random_table):
+    """索引找出的被覆盖规则与两两比较的结果一致。"""
+    table = random_table(seed, 600)
+    issues = lint_rules(table, COLUMNS, PATTERN_COLUMNS, "Expenses")
+    shadowed = {issue.rule_id for issue in issues if issue.kind == "shadowed"}
+    assert shadowed == _brute_force_shadowed(table)
+
+
+def test_issues_never_match(random_table, transactions):
+    """报告为永远不会生效的规则确实不会被匹配到。"""
+    table = random_table(7, 600)
+    issues = lint_rules(table, COLUMNS, PATTERN_COLUMNS, "Expenses")
+    dead = {
+        issue.rule_id
+        for issue in issues
+        if issue.kind in ("conflict", "shadowed") and "永远不会生效" in issue.message
+    }
+    rule_index = RuleIndex(table, COLUMNS, PATTERN_COLUMNS)
+    hits = {
+        rule_index.ids[position]
+        for position in rule_index.find_frame(transactions)
+        if position < len(rule_index)
+    }
+    assert dead and not dead & hits
+
+
+def test_large_rule_table(monkeypatch):
+    """2 万条规则（约 4 千条正则规则）只与索引给出的少量候选规则比较。"""
+    rnd = random.Random(5)
+    size = 20000
+    rows = []
+    for number in range(size):
+        if number % 5 == 0:
+            peer = (
+                f"^商户{rnd.randint(0, size)}$" if number % 10 else f"商户{number}.*店"
+            )
+            rows.append(
+                {
+                    "编号": number,
+                    "交易类型": None,
+                    "交易对方": peer,
+                    "商品": None,
+                    "值": "Expenses:Regex",
+                    "匹配方式": "正则",
+                }
+            )
+            continue
+        rows.append(
+            {
+                "编号": number,
+                "交易类型": rnd.choice(["商户消费", "转账"]),
+                "交易对方": f"商户{rnd.randint(0, size)}",
+                "商品": None if number % 3 else f"商品{number % 500}",
+                "值": "Expenses:Exact",
+                "匹配方式": "包含" if number % 7 == 0 else None,
+            }
+        )
+    table = pd.DataFrame(rows)
+
+    comparisons = 0
+
+    def _counting_covers(covering, covered):
+        nonlocal comparisons
+        comparisons += 1
+        return _covers(covering, covered)
+
+    monkeypatch.setattr(rule_lint, "_covers", _counting_covers)
+    issues = lint_rules(table, COLUMNS, PATTERN_COLUMNS, "Expenses")
+    assert issues
+    # 两两比较约需 2 亿次
+    assert comparisons < 5 * size, f"比较了 {comparisons} 次"
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- encoding: utf-8 -*-
+"""
+@Filename : test_shard.py
+@Author : ZouZhao
+@Contact : wszwc3721@163.com
+@Time : 2025/03/27 21:05
+@License : Copyright (c) 2025 by ZouZhao, All Rights Reserved.
+@Description : 按月分片的账本布局测试
+"""
+
+__copyright__ = "Copyright (c) 2025 by ZouZhao, All Rights Reserved."
+__license__ = None
+
+import logging
+from beancount import loader
+from beancount.parser import parser
+from shard import INCLUDE_COMMENT, compact_ledger, read_includes, split_by_month
+
+LOG = logging.getLogger("test_shard")
+
+MAIN = f"""\
+option "operating_currency" "CNY"
+
+2025-01-01 open Assets:Bank CNY
+2025-01-01 open Expenses:Food
+
+{INCLUDE_COMMENT}
+include "2025-02-01_10-00-00_1234.bean"
+
+{INCLUDE_COMMENT}
+include "2025-03-01_10-00-00_5678.bean"
+"""
+
+FIRST = """
+2025-01-10 * "商户" "一月"
+\tExpenses:Food\t\t\t10.00 CNY
+\tAssets:Bank\t\t\t-10.00 CNY
+
+2025-02-10 * "商户" "二月"
+\tExpenses:Food\t\t\t20.00 CNY
+\tAssets:Bank\t\t\t-20.00 CNY
+"""
+
+SECOND = """
+2025-02-20 * "商户" "二月"
+\tExpenses:Food\t\t\t30.00 CNY
+\tAssets:Bank\t\t\t-30.00 CNY
+"""
+
+
+def _ledger(tmp_path):
+    main_path = tmp_path / "main.bean"
+    main_path.write_text(MAIN, encoding="utf-8")
+    (tmp_path / "2025-02-01_10-00-00_1234.bean").write_text(FIRST, encoding="utf-8")
+    (tmp_path / "2025-03-01_10-00-00_5678.bean").write_text(SECOND, encoding="utf-8")
+    return main_path
+
+
+def test_split_by_month(tmp_path):
+    """条目按日期切分到各月，第一个条目之前的内容归入第一个条目。"""
+    file_path = tmp_path / "2025-02-01_10-00-00_1234.bean"
+    file_path.write_text("; 注释\n" + FIRST, encoding="utf-8")
+    entries, errors, _ = parser.parse_file(str(file_path))
+    assert not errors
+    months = split_by_month(str(file_path), entries)
+    assert sorted(months) == ["2025-01", "2025-02"]
+    assert months["2025-01"].startswith("; 注释\n")
+    assert '"二月"' in months["2025-02"] and '"二月"' not in months["2025-01"]
+
+
+def test_compact_ledger(tmp_path):
+    """迁移后条目数不变，原有交易文件及其 include 和注释被删除。"""
+    main_path = _ledger(tmp_path)
+    entries, errors, _ = loader.load_file(str(main_path))
+    assert not errors
+
+    assert compact_ledger(str(main_path), LOG) == 2
+
+    new_entries, new_errors, _ = loader.load_file(str(main_path))
+    assert not new_errors
+    assert len(new_entries) == len(entries)
+    assert read_includes(str(main_path)) == ["2025/2025-01.bean", "2025/2025-02.bean"]
+    assert INCLUDE_COMMENT not in main_path.read_text(encoding="utf-8")
+    assert not list(tmp_path.glob("2025-0*_*.bean"))
+    february = (tmp_path / "2025" / "2025-02.bean").read_text(encoding="utf-8")
+    assert february.count('"二月"') == 2
+
+    assert compact_ledger(str(main_path), LOG) == 0
+
+
+def test_compact_ledger_rollback(tmp_path):
+    """迁移后账本加载出错时恢复主账本和分片，保留原有交易文件。"""
+    main_path = _ledger(tmp_path)
+    # 未被引入的同名分片中有未开户的账户，迁移后引入该分片导致账本出错
+    stray = tmp_path / "2025" / "2025-01.bean"
+    stray.parent.mkdir()
+    stray_text = """
+2025-01-05 * "商户" "未开户"
+\tExpenses:Unknown\t\t\t1.00 CNY
+\tAssets:Bank\t\t\t-1.00 CNY
+"""
+    stray.write_text(stray_text, encoding="utf-8")
+
+    assert compact_ledger(str(main_path), LOG) == -1
+
+    assert main_path.read_text(encoding="utf-8") == MAIN
+    assert stray.read_text(encoding="utf-8") == stray_text
+    assert not (tmp_path / "2025" / "2025-02.bean").exists()
+    assert (tmp_path / "2025-02-01_10-00-00_1234.bean").read_text(
+        encoding="utf-8"
+    ) == FIRST
+    assert (tmp_path / "2025-03-01_10-00-00_5678.bean").exists()
+    _, errors, _ = loader.load_file(str(main_path))
+    assert not errors